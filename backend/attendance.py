@@ -0,0 +1,90 @@
+import asyncio
+import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, List, Tuple
+
+from circuit_breaker import STALE_MARKER
+
+Window = Tuple[datetime.date, datetime.date]
+
+
+def month_windows(start: datetime.date, end: datetime.date) -> List[Window]:
+    """Split [start, end] into calendar-month windows (first and last may be partial)."""
+    windows = []
+    cur = start
+    while cur <= end:
+        next_month = (cur.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+        window_end = min(end, next_month - datetime.timedelta(days=1))
+        windows.append((cur, window_end))
+        cur = window_end + datetime.timedelta(days=1)
+    return windows
+
+
+async def fetch_windows(windows: List[Window], fetch: Callable[[Window], Awaitable[Any]],
+                        concurrency: int = 4) -> AsyncIterator[Tuple[Window, Any]]:
+    """
+    Fetch every window with at most ``concurrency`` requests in flight and
+    yield (window, payload or exception) in window order, each as soon as it
+    and all earlier windows are done. Unfinished fetches are cancelled if the
+    consumer stops early (e.g. the client disconnects mid-stream).
+    """
+    sem = asyncio.Semaphore(concurrency)
+
+    async def run(window: Window):
+        async with sem:
+            return await fetch(window)
+
+    tasks = [asyncio.ensure_future(run(w)) for w in windows]
+    try:
+        for window, task in zip(windows, tasks):
+            try:
+                yield window, await task
+            except Exception as e:
+                yield window, e
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def attendance_records(payload: Any) -> Iterator[Tuple[Any, Any]]:
+    """
+    (date, record) pairs from a getUserReport payload, in upstream order.
+
+    Zoho returns the days as a dict keyed by date, either at the top level
+    or under "result"; list-shaped results are passed through with no date.
+    """
+    body = payload.get("result", payload) if isinstance(payload, dict) else payload
+    if isinstance(body, dict):
+        yield from body.items()
+    elif isinstance(body, list):
+        for record in body:
+            yield None, record
+
+
+def _stale_marker(payloads: List[Any]) -> Any:
+    """The staleness marker of the oldest last-known-good window, or None if every window is fresh."""
+    markers = [p[STALE_MARKER] for p in payloads if isinstance(p, dict) and STALE_MARKER in p]
+    return min(markers, key=lambda m: str(m.get("as_of", "")) if isinstance(m, dict) else "", default=None)
+
+
+def merge_payloads(payloads: List[Any]) -> Any:
+    """
+    Combine per-window payloads (already in date order) into one. The result
+    is marked stale if any window was served from the last-known-good store.
+    """
+    if len(payloads) == 1:
+        return payloads[0]
+    if all(isinstance(p, dict) and isinstance(p.get("result"), dict) for p in payloads):
+        merged = {}
+        for p in payloads:
+            merged.update(p["result"])
+        combined = {k: v for k, v in payloads[-1].items() if k != STALE_MARKER}
+        combined["result"] = merged
+    else:
+        records = []
+        for p in payloads:
+            records.extend(record for _, record in attendance_records(p))
+        combined = {"result": records}
+    stale = _stale_marker(payloads)
+    if stale is not None:
+        combined[STALE_MARKER] = stale
+    return combined
@@ -0,0 +1,138 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from logger_config import get_logger
+
+logger = get_logger("bulk_leave")
+
+# Outcomes of IdempotencyStore.claim
+CLAIMED = "claimed"
+DONE = "done"
+IN_PROGRESS = "in_progress"
+
+
+class IdempotencyStore:
+    """
+    Client-supplied idempotency keys for leave writes, in SQLite so a retry
+    is recognised by every worker and across restarts.
+
+    A key is claimed before the Zoho call and completed with its result
+    afterwards. Failed calls release the key so the client can retry; claims
+    left behind by a crashed worker expire after ``claim_ttl`` seconds.
+    Completed keys are kept for ``ttl`` seconds. Methods are synchronous and
+    meant to be run via asyncio.to_thread.
+    """
+
+    def __init__(self, path: str, ttl: float = 86400, claim_ttl: float = 300):
+        self.ttl = ttl
+        self.claim_ttl = claim_ttl
+        self.path = path
+        self._lock = threading.Lock()
+        self._open_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Opened on first use, so importing the app doesn't create or migrate the database
+        if self._db is None:
+            with self._open_lock:
+                if self._db is None:
+                    self._db = self._open()
+        return self._db
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS idempotency ("
+            " key TEXT PRIMARY KEY,"
+            " state TEXT NOT NULL,"
+            " result TEXT,"
+            " updated REAL NOT NULL)"
+        )
+        return conn
+
+    def claim(self, key: str) -> Tuple[str, Any]:
+        """(CLAIMED, None), (DONE, stored result) or (IN_PROGRESS, None)."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute(
+                "DELETE FROM idempotency WHERE (state = 'done' AND updated < ?) OR (state = 'pending' AND updated < ?)",
+                (now - self.ttl, now - self.claim_ttl),
+            )
+            row = self._conn.execute("SELECT state, result FROM idempotency WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._conn.execute("INSERT INTO idempotency VALUES (?, 'pending', NULL, ?)", (key, now))
+                return CLAIMED, None
+        if row[0] == "done":
+            return DONE, json.loads(row[1])
+        return IN_PROGRESS, None
+
+    def complete(self, key: str, result: Any):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE idempotency SET state = 'done', result = ?, updated = ? WHERE key = ?",
+                (json.dumps(result, default=str), time.time(), key),
+            )
+
+    def release(self, key: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM idempotency WHERE key = ? AND state = 'pending'", (key,))
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+async def run_idempotent(store: Optional[IdempotencyStore], key: Optional[str],
+                         fn: Callable[[], Awaitable[Any]]) -> Tuple[str, Any]:
+    """
+    Run ``fn`` at most once per ``key``. Returns ("ok", result),
+    ("duplicate", stored result) or ("in_progress", None). Without a key
+    ``fn`` simply runs. Exceptions propagate after releasing the key.
+    """
+    if store is None or not key:
+        return "ok", await fn()
+    state, stored = await asyncio.to_thread(store.claim, key)
+    if state == DONE:
+        return "duplicate", stored
+    if state == IN_PROGRESS:
+        return "in_progress", None
+    try:
+        result = await fn()
+    except BaseException:
+        await asyncio.to_thread(store.release, key)
+        raise
+    await asyncio.to_thread(store.complete, key, result)
+    return "ok", result
+
+
+async def run_bulk(items: List[Any], fn: Callable[[int, Any], Awaitable[Dict]],
+                   concurrency: int = 4) -> AsyncIterator[Dict]:
+    """
+    Run ``fn(index, item)`` for every item with at most ``concurrency`` in
+    flight and yield each result as soon as it finishes (completion order).
+    ``fn`` reports its own failures in the returned dict. Unfinished items
+    are cancelled if the consumer stops early.
+    """
+    sem = asyncio.Semaphore(concurrency)
+
+    async def run(index: int, item: Any):
+        async with sem:
+            return await fn(index, item)
+
+    tasks = [asyncio.ensure_future(run(i, item)) for i, item in enumerate(items)]
+    try:
+        for done in asyncio.as_completed(tasks):
+            yield await done
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,230 @@
+import copy
+import functools
+import os
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Hashable, Optional, Tuple
+
+from logger_config import get_logger
+
+logger = get_logger("circuit_breaker")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Key added to read payloads served from the last-known-good store
+STALE_MARKER = "_stale"
+
+
+class CircuitOpenError(Exception):
+    """The breaker for an upstream endpoint is open; the call was not sent."""
+
+    def __init__(self, endpoint: str, retry_after: float):
+        super().__init__(f"Circuit for '{endpoint}' is open, retry in {retry_after:.0f}s")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+@dataclass
+class BreakerConfig:
+    window: float = 60.0              # seconds of outcomes considered
+    min_calls: int = 10               # don't judge an endpoint on fewer calls
+    failure_rate: float = 0.5         # open when this share of calls fail...
+    slow_call_seconds: float = 5.0
+    slow_rate: float = 0.8            # ...or this share are slower than slow_call_seconds
+    open_seconds: float = 30.0
+    half_open_calls: int = 2          # probes allowed (and needed) to close again
+
+    @classmethod
+    def from_env(cls) -> "BreakerConfig":
+        return cls(
+            window=float(os.getenv("BREAKER_WINDOW", cls.window)),
+            min_calls=int(os.getenv("BREAKER_MIN_CALLS", cls.min_calls)),
+            failure_rate=float(os.getenv("BREAKER_FAILURE_RATE", cls.failure_rate)),
+            slow_call_seconds=float(os.getenv("BREAKER_SLOW_CALL_SECONDS", cls.slow_call_seconds)),
+            slow_rate=float(os.getenv("BREAKER_SLOW_RATE", cls.slow_rate)),
+            open_seconds=float(os.getenv("BREAKER_OPEN_SECONDS", cls.open_seconds)),
+            half_open_calls=int(os.getenv("BREAKER_HALF_OPEN_CALLS", cls.half_open_calls)),
+        )
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open breaker for one upstream endpoint.
+
+    While closed, outcomes over the last ``window`` seconds are tracked and
+    the breaker opens once the failure or slow-call rate crosses its
+    threshold. While open, calls fail immediately. After ``open_seconds`` it
+    goes half-open and lets ``half_open_calls`` probes through; they all have
+    to succeed to close it again, and any failure re-opens it. A probe that
+    ends without an outcome (cancelled) hands its slot back via release(),
+    and probes that never report at all are written off after
+    ``open_seconds`` so the breaker can't stay half-open for good.
+    """
+
+    def __init__(self, name: str, config: BreakerConfig):
+        self.name = name
+        self.config = config
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.half_opened_at = 0.0
+        self._round = 0
+        self._outcomes: Deque[Tuple[float, bool, bool]] = deque()  # (time, failed, slow)
+        self._failures = 0
+        self._slow = 0
+        self._probes = 0
+        self._probe_successes = 0
+        self.times_opened = 0
+        self.rejected = 0
+
+    def _transition(self, state: str):
+        logger.warning(f"Circuit '{self.name}': {self.state} -> {state}")
+        self.state = state
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+            self.times_opened += 1
+        elif state == HALF_OPEN:
+            self.half_opened_at = time.monotonic()
+        self._round += 1
+        self._outcomes.clear()
+        self._failures = self._slow = 0
+        self._probes = self._probe_successes = 0
+
+    def allow(self) -> Optional[int]:
+        """
+        Raise CircuitOpenError unless a call may go out now. Returns the
+        half-open round a probe belongs to (None when closed), for release().
+        """
+        if self.state == OPEN:
+            remaining = self.opened_at + self.config.open_seconds - time.monotonic()
+            if remaining > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, remaining)
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._probes >= self.config.half_open_calls:
+                if time.monotonic() - self.half_opened_at < self.config.open_seconds:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, 1.0)
+                logger.warning(f"Circuit '{self.name}': half-open probes never reported, probing again")
+                self._transition(HALF_OPEN)
+            self._probes += 1
+            return self._round
+        return None
+
+    def release(self, probe: Optional[int]):
+        """Give back the slot of a probe that ended without an outcome, e.g. because it was cancelled."""
+        if probe is not None and probe == self._round and self.state == HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def record(self, success: bool, duration: float):
+        slow = duration >= self.config.slow_call_seconds
+        if self.state == HALF_OPEN:
+            if not success or slow:
+                self._transition(OPEN)
+            else:
+                self._probe_successes += 1
+                if self._probe_successes >= self.config.half_open_calls:
+                    self._transition(CLOSED)
+            return
+        if self.state == OPEN:
+            return
+
+        now = time.monotonic()
+        self._outcomes.append((now, not success, slow))
+        self._failures += not success
+        self._slow += slow
+        cutoff = now - self.config.window
+        while self._outcomes and self._outcomes[0][0] < cutoff:
+            _, failed, was_slow = self._outcomes.popleft()
+            self._failures -= failed
+            self._slow -= was_slow
+
+        calls = len(self._outcomes)
+        if calls >= self.config.min_calls and (
+            self._failures / calls >= self.config.failure_rate or self._slow / calls >= self.config.slow_rate
+        ):
+            self._transition(OPEN)
+
+    def stats(self) -> Dict:
+        calls = len(self._outcomes)
+        return {
+            "state": self.state,
+            "calls_in_window": calls,
+            "failure_rate": round(self._failures / calls, 3) if calls else 0.0,
+            "slow_rate": round(self._slow / calls, 3) if calls else 0.0,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+
+class BreakerRegistry:
+    """Per-endpoint breakers plus the last good payload of each read."""
+
+    def __init__(self, config: BreakerConfig, max_fallbacks: int = 1000):
+        self.config = config
+        self.max_fallbacks = max_fallbacks
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._last_good: "OrderedDict[Hashable, Tuple[Any, str]]" = OrderedDict()
+        self.fallbacks_served = 0
+
+    def get(self, endpoint: str) -> CircuitBreaker:
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            breaker = self._breakers[endpoint] = CircuitBreaker(endpoint, self.config)
+        return breaker
+
+    def remember(self, key: Hashable, value: Any):
+        self._last_good[key] = (value, datetime.now(timezone.utc).isoformat())
+        self._last_good.move_to_end(key)
+        while len(self._last_good) > self.max_fallbacks:
+            self._last_good.popitem(last=False)
+
+    def fallback(self, key: Hashable, error: CircuitOpenError) -> Any:
+        """Last good payload for ``key`` marked stale, or re-raise ``error``."""
+        if key not in self._last_good:
+            raise error
+        value, as_of = self._last_good[key]
+        self.fallbacks_served += 1
+        stale = copy.copy(value)
+        if isinstance(stale, dict):
+            stale[STALE_MARKER] = {"as_of": as_of, "reason": f"circuit '{error.endpoint}' open"}
+        return stale
+
+    def stats(self) -> Dict:
+        return {
+            "breakers": {name: b.stats() for name, b in self._breakers.items()},
+            "fallback_entries": len(self._last_good),
+            "fallbacks_served": self.fallbacks_served,
+        }
+
+
+def is_stale(value: Any) -> bool:
+    return isinstance(value, dict) and STALE_MARKER in value
+
+
+def last_known_good(registry: BreakerRegistry):
+    """
+    Decorator for zoho_client reads: remember each successful result and,
+    while the endpoint's breaker is open, return it with a staleness marker.
+    The first positional argument (the access token) is left out of the key
+    so a refreshed token still finds the old payload.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            key = (fn.__name__, args[1:], tuple(sorted((k, v) for k, v in kwargs.items() if k != "pool")))
+            try:
+                result = await fn(*args, **kwargs)
+            except CircuitOpenError as e:
+                logger.warning(f"{fn.__name__}: serving last known good payload ({e})")
+                return registry.fallback(key, e)
+            registry.remember(key, result)
+            return result
+        return wrapper
+
+    return decorator
@@ -0,0 +1,188 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from logger_config import get_logger
+from zoho_client import list_employees
+from zoho_regions import Endpoints
+
+logger = get_logger("employee_directory")
+
+# Returns (endpoints, access_token) of a session allowed to read P_EmployeeView,
+# or None when nobody is logged in yet.
+TokenProvider = Callable[[], Awaitable[Optional[Tuple[Endpoints, str]]]]
+
+
+def _first(record: Dict, *keys):
+    for key in keys:
+        if record.get(key) not in (None, ""):
+            return record[key]
+    return None
+
+
+def _norm(value) -> Optional[str]:
+    return str(value).strip().lower() if value not in (None, "") else None
+
+
+class EmployeeDirectory:
+    """
+    In-memory copy of P_EmployeeView, indexed by email, employee ID,
+    department and reporting manager.
+
+    A background task pages through the whole view on the first sync and
+    every ``full_interval`` seconds; in between it asks only for records
+    modified since the last sync. Lookups are dict reads.
+    """
+
+    def __init__(self, token_provider: TokenProvider, interval: float = 900, full_interval: float = 86400,
+                 page_size: int = 200):
+        self.token_provider = token_provider
+        self.interval = interval
+        self.full_interval = full_interval
+        self.page_size = page_size
+        self._by_id: Dict[str, Dict] = {}
+        self._by_email: Dict[str, str] = {}
+        self._by_department: Dict[str, Set[str]] = {}
+        self._by_manager: Dict[str, Set[str]] = {}
+        self.last_sync: Optional[float] = None
+        self.last_full_sync: Optional[float] = None
+        self.hits = 0
+        self.misses = 0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    # ---------------- index ----------------
+    def upsert(self, emp: Dict):
+        emp_id = _norm(_first(emp, "EMPLOYEEID", "EmployeeID"))
+        if emp_id is None:
+            return
+        self._unindex(emp_id)
+        self._by_id[emp_id] = emp
+        email = _norm(_first(emp, "EMPLOYEEMAILALIAS", "EMAILID", "EmailID"))
+        if email:
+            self._by_email[email] = emp_id
+        department = _norm(_first(emp, "DEPARTMENTNAME", "Department"))
+        if department:
+            self._by_department.setdefault(department, set()).add(emp_id)
+        manager = _norm(_first(emp, "REPORTINGTO", "Reporting_To", "ReportingTo"))
+        if manager:
+            self._by_manager.setdefault(manager, set()).add(emp_id)
+
+    def _unindex(self, emp_id: str):
+        old = self._by_id.pop(emp_id, None)
+        if old is None:
+            return
+        email = _norm(_first(old, "EMPLOYEEMAILALIAS", "EMAILID", "EmailID"))
+        if email and self._by_email.get(email) == emp_id:
+            del self._by_email[email]
+        for index, value in (
+            (self._by_department, _norm(_first(old, "DEPARTMENTNAME", "Department"))),
+            (self._by_manager, _norm(_first(old, "REPORTINGTO", "Reporting_To", "ReportingTo"))),
+        ):
+            members = index.get(value)
+            if members is not None:
+                members.discard(emp_id)
+                if not members:
+                    del index[value]
+
+    # ---------------- lookups ----------------
+    def by_email(self, email: str) -> Optional[Dict]:
+        emp_id = self._by_email.get(_norm(email))
+        if emp_id is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._by_id[emp_id]
+
+    def by_id(self, emp_id: str) -> Optional[Dict]:
+        return self._by_id.get(_norm(emp_id))
+
+    def department(self, name: str) -> List[Dict]:
+        return [self._by_id[i] for i in sorted(self._by_department.get(_norm(name), ()))]
+
+    def team(self, manager: str) -> List[Dict]:
+        """Direct reports of a manager, matched on whatever REPORTINGTO holds (ID, email or name)."""
+        return [self._by_id[i] for i in sorted(self._by_manager.get(_norm(manager), ()))]
+
+    def reports_to(self, emp_id: str, managers: List[str]) -> bool:
+        """Whether ``emp_id``'s REPORTINGTO is any of ``managers`` (IDs, emails or names)."""
+        emp = self.by_id(emp_id)
+        manager = _norm(_first(emp, "REPORTINGTO", "Reporting_To", "ReportingTo")) if emp else None
+        return manager is not None and manager in {_norm(m) for m in managers if m}
+
+    def departments(self) -> Dict[str, int]:
+        return {name: len(ids) for name, ids in sorted(self._by_department.items())}
+
+    # ---------------- sync ----------------
+    async def sync(self, full: bool = False) -> int:
+        """Page through P_EmployeeView (or only recent changes) and index the results."""
+        async with self._lock:
+            creds = await self.token_provider()
+            if creds is None:
+                logger.info("Employee directory sync skipped: no session to sync with yet")
+                return 0
+            endpoints, token = creds
+            full = full or self.last_full_sync is None
+            started = time.time()
+            # Overlap incremental windows a little so clock skew can't drop an edit
+            since_ms = None if full else int((self.last_sync - 60) * 1000)
+
+            fetched = 0
+            s_index = 1
+            seen: Set[str] = set()
+            while True:
+                page = await list_employees(token, s_index, self.page_size, modified_since_ms=since_ms,
+                                            endpoints=endpoints)
+                for emp in page:
+                    self.upsert(emp)
+                    emp_id = _norm(_first(emp, "EMPLOYEEID", "EmployeeID"))
+                    if emp_id:
+                        seen.add(emp_id)
+                fetched += len(page)
+                if len(page) < self.page_size:
+                    break
+                s_index += self.page_size
+
+            if full:
+                for emp_id in set(self._by_id) - seen:
+                    self._unindex(emp_id)
+                self.last_full_sync = started
+            self.last_sync = started
+            logger.info(f"{'Full' if full else 'Incremental'} directory sync: {fetched} records, "
+                        f"{len(self._by_id)} employees indexed")
+            return fetched
+
+    async def _run(self):
+        while True:
+            try:
+                due_full = self.last_full_sync is None or time.time() - self.last_full_sync > self.full_interval
+                await self.sync(full=due_full)
+            except Exception:
+                logger.exception("Employee directory sync failed")
+            await asyncio.sleep(self.interval if self.last_full_sync else min(self.interval, 60))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def freshness(self) -> Dict:
+        def iso(ts):
+            return datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts else None
+        return {
+            "employees": len(self._by_id),
+            "departments": len(self._by_department),
+            "last_sync": iso(self.last_sync),
+            "last_full_sync": iso(self.last_full_sync),
+            "age_seconds": round(time.time() - self.last_sync, 1) if self.last_sync else None,
+            "lookup_hits": self.hits,
+            "lookup_misses": self.misses,
+        }
@@ -0,0 +1,123 @@
+import asyncio
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+from logger_config import get_logger
+
+logger = get_logger("http_pool")
+
+try:
+    import h2  # noqa: F401  (httpx needs it for HTTP/2)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+@dataclass
+class PoolConfig:
+    """Connection-pool tuning for upstream Zoho traffic."""
+    max_connections: int = 100
+    max_connections_per_host: int = 20
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+    connect_timeout: float = 5.0
+    read_timeout: float = 30.0
+    write_timeout: float = 30.0
+    pool_timeout: float = 10.0
+
+    @classmethod
+    def from_env(cls) -> "PoolConfig":
+        return cls(
+            max_connections=_env_int("ZOHO_HTTP_MAX_CONNECTIONS", cls.max_connections),
+            max_connections_per_host=_env_int("ZOHO_HTTP_MAX_CONNECTIONS_PER_HOST", cls.max_connections_per_host),
+            max_keepalive_connections=_env_int("ZOHO_HTTP_MAX_KEEPALIVE", cls.max_keepalive_connections),
+            keepalive_expiry=_env_float("ZOHO_HTTP_KEEPALIVE_EXPIRY", cls.keepalive_expiry),
+            http2=os.getenv("ZOHO_HTTP2", "0").lower() in ("1", "true", "yes"),
+            connect_timeout=_env_float("ZOHO_HTTP_CONNECT_TIMEOUT", cls.connect_timeout),
+            read_timeout=_env_float("ZOHO_HTTP_READ_TIMEOUT", cls.read_timeout),
+            write_timeout=_env_float("ZOHO_HTTP_WRITE_TIMEOUT", cls.write_timeout),
+            pool_timeout=_env_float("ZOHO_HTTP_POOL_TIMEOUT", cls.pool_timeout),
+        )
+
+
+class HTTPPool:
+    """
+    One keep-alive httpx.AsyncClient shared by every upstream call.
+
+    httpx only caps connections for the whole client, so a per-host semaphore
+    is held around each request to stop one slow Zoho host from taking every
+    connection in the pool.
+    """
+
+    def __init__(self, config: Optional[PoolConfig] = None, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.config = config or PoolConfig.from_env()
+        http2 = self.config.http2
+        if http2 and not HTTP2_AVAILABLE:
+            logger.warning("ZOHO_HTTP2 is set but the 'h2' package is not installed, falling back to HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+
+        self.client = httpx.AsyncClient(
+            http2=http2,
+            transport=transport,
+            limits=httpx.Limits(
+                max_connections=self.config.max_connections,
+                max_keepalive_connections=self.config.max_keepalive_connections,
+                keepalive_expiry=self.config.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(
+                connect=self.config.connect_timeout,
+                read=self.config.read_timeout,
+                write=self.config.write_timeout,
+                pool=self.config.pool_timeout,
+            ),
+        )
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self.requests_total = 0
+        self.in_flight = 0
+
+    def _slot(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        sem = self._host_slots.get(host)
+        if sem is None:
+            sem = asyncio.Semaphore(self.config.max_connections_per_host)
+            self._host_slots[host] = sem
+        return sem
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        async with self._slot(url):
+            self.in_flight += 1
+            self.requests_total += 1
+            try:
+                return await self.client.request(method, url, **kwargs)
+            finally:
+                self.in_flight -= 1
+
+    @property
+    def closed(self) -> bool:
+        return self.client.is_closed
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    def stats(self) -> Dict:
+        return {
+            "requests_total": self.requests_total,
+            "in_flight": self.in_flight,
+            "hosts": sorted(self._host_slots),
+            "http2": self.http2,
+        }
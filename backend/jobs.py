@@ -0,0 +1,360 @@
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from logger_config import get_logger
+
+logger = get_logger("jobs")
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+TERMINAL = (SUCCEEDED, FAILED)
+
+Handler = Callable[[str, Dict], Awaitable[Any]]
+
+
+class JobInterrupted(Exception):
+    """A job's run stopped part-way (shutdown, crash), so whether its write reached Zoho is unknown."""
+
+
+INTERRUPTED = {"type": JobInterrupted.__name__,
+               "detail": "The job stopped before finishing; the write may or may not have reached Zoho"}
+
+
+class JobQueue:
+    """
+    Persistent queue of Zoho writes, worked by background tasks.
+
+    Jobs live in SQLite, so they survive restarts and any worker process can
+    pick them up; a claim is a single BEGIN IMMEDIATE transaction. A job
+    whose handler raises a retryable error goes back to the queue with
+    jittered exponential backoff until ``max_attempts``; anything else fails
+    it. A running job renews its ``lease`` every third of it. A job whose lease
+    runs out (its process crashed) or whose worker is stopped mid-run is
+    treated like any other failure with :class:`JobInterrupted`: re-queued
+    only if ``retryable`` allows it and attempts remain, failed otherwise, so
+    a write Zoho may already have taken is never sent twice behind the
+    caller's back.
+    """
+
+    def __init__(self, path: str, workers: int = 2, max_attempts: int = 5, base_delay: float = 2.0,
+                 max_delay: float = 60.0, lease: float = 300.0, retention: float = 7 * 86400,
+                 poll_interval: float = 0.5, retryable: Callable[[BaseException], bool] = lambda e: False):
+        self.path = path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease = lease
+        self.retention = retention
+        self.poll_interval = poll_interval
+        self.retryable = retryable
+        self._handlers: Dict[str, Handler] = {}
+        self._lock = threading.Lock()
+        self._open_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._changed: Dict[str, asyncio.Event] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._workers_started = False
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Opened on first use, so importing the app doesn't create or migrate the database
+        if self._db is None:
+            with self._open_lock:
+                if self._db is None:
+                    self._db = self._open()
+        return self._db
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " kind TEXT NOT NULL,"
+            " session_id TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " state TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " result TEXT,"
+            " error TEXT,"
+            " run_after REAL NOT NULL,"
+            " created REAL NOT NULL,"
+            " updated REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (state, run_after)")
+        return conn
+
+    @classmethod
+    def from_env(cls, default_path: str, retryable: Callable[[BaseException], bool]) -> "JobQueue":
+        return cls(
+            os.getenv("JOBS_DB", default_path),
+            workers=int(os.getenv("JOB_WORKERS", "2")),
+            max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "5")),
+            base_delay=float(os.getenv("JOB_RETRY_BASE_DELAY", "2")),
+            max_delay=float(os.getenv("JOB_RETRY_MAX_DELAY", "60")),
+            retention=float(os.getenv("JOB_RETENTION", str(7 * 86400))),
+            retryable=retryable,
+        )
+
+    def register(self, kind: str, handler: Handler):
+        """``handler(session_id, payload)`` runs one job of ``kind``; its return value is the job result."""
+        self._handlers[kind] = handler
+
+    # ---------------- storage (blocking; called via asyncio.to_thread) ----------------
+    def _row(self, row) -> Dict:
+        job_id, kind, session_id, payload, state, attempts, result, error, run_after, created, updated = row
+        return {
+            "id": job_id,
+            "kind": kind,
+            "session_id": session_id,
+            "payload": json.loads(payload),
+            "state": state,
+            "attempts": attempts,
+            "result": json.loads(result) if result is not None else None,
+            "error": json.loads(error) if error is not None else None,
+            "run_after": run_after,
+            "created": created,
+            "updated": updated,
+        }
+
+    def _insert(self, job_id: str, kind: str, session_id: str, payload: Dict) -> Dict:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            # A failed job may be submitted again under the same ID
+            self._conn.execute("DELETE FROM jobs WHERE id = ? AND state = ?", (job_id, FAILED))
+            self._conn.execute(
+                "INSERT OR IGNORE INTO jobs (id, kind, session_id, payload, state, run_after, created, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, session_id, json.dumps(payload), QUEUED, now, now, now),
+            )
+            return self._row(self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def _has_pending(self) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM jobs WHERE state IN (?, ?) LIMIT 1", (QUEUED, RUNNING)
+            ).fetchone() is not None
+
+    def _claim(self) -> Optional[Dict]:
+        now = time.time()
+        # Plain read first, so an idle poll doesn't take the write lock
+        with self._lock:
+            ready = self._conn.execute(
+                "SELECT 1 FROM jobs WHERE (state = ? AND run_after <= ?) OR (state = ? AND updated < ?) LIMIT 1",
+                (QUEUED, now, RUNNING, now - self.lease),
+            ).fetchone()
+        if ready is None:
+            return None
+        requeue = self.retryable(JobInterrupted())
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            # Running jobs whose process died without finishing them
+            if requeue:
+                self._conn.execute(
+                    "UPDATE jobs SET state = ?, error = ?, updated = ? WHERE state = ? AND updated < ? AND attempts < ?",
+                    (QUEUED, json.dumps(INTERRUPTED), now, RUNNING, now - self.lease, self.max_attempts),
+                )
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, error = ?, updated = ? WHERE state = ? AND updated < ?",
+                (FAILED, json.dumps(INTERRUPTED), now, RUNNING, now - self.lease),
+            )
+            # Out of attempts (e.g. JOB_MAX_ATTEMPTS lowered since they were queued)
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, updated = ? WHERE state = ? AND attempts >= ?",
+                (FAILED, now, QUEUED, self.max_attempts),
+            )
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE state = ? AND run_after <= ? ORDER BY run_after LIMIT 1", (QUEUED, now)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, attempts = attempts + 1, updated = ? WHERE id = ?",
+                (RUNNING, now, row[0]),
+            )
+        job = self._row(row)
+        job.update(state=RUNNING, attempts=job["attempts"] + 1)
+        return job
+
+    def _finish(self, job_id: str, state: str, result: Any = None, error: Any = None, run_after: float = 0):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, result = ?, error = ?, run_after = MAX(run_after, ?), updated = ? "
+                "WHERE id = ?",
+                (state, json.dumps(result, default=str) if result is not None else None,
+                 json.dumps(error, default=str) if error is not None else None, run_after, now, job_id),
+            )
+
+    def _renew(self, job_id: str):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET updated = ? WHERE id = ? AND state = ?", (time.time(), job_id, RUNNING))
+
+    def _purge(self):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM jobs WHERE state IN (?, ?) AND updated < ?", (*TERMINAL, time.time() - self.retention)
+            )
+
+    def stats(self) -> Dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        return {"workers": self.workers if self._tasks else 0, "jobs": dict(rows)}
+
+    # ---------------- async API ----------------
+    async def enqueue(self, kind: str, session_id: str, payload: Dict, job_id: Optional[str] = None) -> Dict:
+        """
+        Queue a job and return it. Passing the same ``job_id`` again returns
+        the existing job instead of queueing a second one, unless it failed.
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        job = await asyncio.to_thread(self._insert, job_id or uuid.uuid4().hex, kind, session_id, payload)
+        if self._wake is not None:
+            self._start_workers()
+            self._wake.set()
+        return job
+
+    async def wait_for_change(self, job_id: str, timeout: float):
+        """Return when this process updates the job, or after ``timeout`` (other processes are polled)."""
+        event = self._changed.setdefault(job_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            # Nothing changed here; drop the event so unwatched jobs don't accumulate
+            if self._changed.get(job_id) is event:
+                del self._changed[job_id]
+
+    def _notify(self, job_id: str):
+        event = self._changed.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    async def _heartbeat(self, job_id: str):
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                await asyncio.to_thread(self._renew, job_id)
+            except sqlite3.Error:
+                logger.exception(f"Job {job_id} lease renewal failed")
+
+    async def _run_one(self, job: Dict):
+        handler = self._handlers.get(job["kind"])
+        try:
+            if handler is None:
+                raise ValueError(f"No handler registered for job kind '{job['kind']}'")
+            heartbeat = asyncio.create_task(self._heartbeat(job["id"]))
+            try:
+                result = await handler(job["session_id"], job["payload"])
+            finally:
+                heartbeat.cancel()
+        except asyncio.CancelledError:
+            # Stopped mid-job (shutdown). Recorded right here rather than via
+            # the lease, so pollers don't see it running until the lease expires.
+            retry = self.retryable(JobInterrupted()) and job["attempts"] < self.max_attempts
+            logger.warning(f"Job {job['id']} ({job['kind']}) interrupted on attempt {job['attempts']}")
+            try:
+                self._finish(job["id"], QUEUED if retry else FAILED, None, INTERRUPTED)
+            except sqlite3.Error:
+                logger.exception(f"Job {job['id']} could not be marked interrupted; its lease will")
+            raise
+        except Exception as e:
+            error = {"type": type(e).__name__, "detail": str(e)}
+            if self.retryable(e) and job["attempts"] < self.max_attempts:
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (job["attempts"] - 1)))
+                logger.warning(f"Job {job['id']} ({job['kind']}) attempt {job['attempts']} failed, "
+                               f"retrying in {delay:.1f}s: {e}")
+                await asyncio.to_thread(self._finish, job["id"], QUEUED, None, error, time.time() + delay)
+            else:
+                logger.error(f"Job {job['id']} ({job['kind']}) failed after {job['attempts']} attempt(s): {e}")
+                await asyncio.to_thread(self._finish, job["id"], FAILED, None, error)
+        else:
+            logger.info(f"Job {job['id']} ({job['kind']}) succeeded")
+            await asyncio.to_thread(self._finish, job["id"], SUCCEEDED, result)
+        self._notify(job["id"])
+
+    async def _worker(self):
+        while True:
+            try:
+                job = await asyncio.to_thread(self._claim)
+            except sqlite3.Error:
+                logger.exception("Job queue claim failed")
+                job = None
+            if job is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self._notify(job["id"])
+            try:
+                await self._run_one(job)
+            except Exception:
+                # Most likely recording the outcome failed; the job's lease re-queues it
+                logger.exception(f"Job {job['id']} ({job['kind']}) could not be completed")
+
+    async def _janitor(self):
+        while True:
+            try:
+                await asyncio.to_thread(self._purge)
+            except sqlite3.Error:
+                logger.exception("Job queue purge failed")
+            await asyncio.sleep(3600)
+
+    def start(self, eager: bool = True):
+        """
+        Start the workers, or with ``eager=False`` (async writes off by
+        default) hold them back until the first enqueue() or until jobs
+        left from an earlier run are found.
+        """
+        self._wake = asyncio.Event()
+        if eager:
+            self._start_workers()
+        elif os.path.exists(self.path):
+            self._tasks.append(asyncio.create_task(self._start_if_pending()))
+
+    def _start_workers(self):
+        if self._workers_started:
+            return
+        self._workers_started = True
+        self._tasks += [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._janitor()))
+
+    async def _start_if_pending(self):
+        try:
+            if await asyncio.to_thread(self._has_pending):
+                self._start_workers()
+        except sqlite3.Error:
+            logger.exception("Job queue check for pending jobs failed")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._workers_started = False
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,311 @@
+import bisect
+import datetime
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from circuit_breaker import is_stale
+from leave_store import parse_date
+from logger_config import get_logger
+
+logger = get_logger("leave_balance")
+
+# Statuses that consume balance; anything else (rejected, cancelled) is ignored
+TAKEN_STATUSES = {"approved"}
+PENDING_STATUSES = {"pending", "pending approval", "submitted"}
+
+
+def _first(record: Dict, *keys) -> Any:
+    for key in keys:
+        if record.get(key) not in (None, ""):
+            return record[key]
+    return None
+
+
+def _norm(value) -> str:
+    return str(value or "").strip().lower()
+
+
+class WorkCalendar:
+    """
+    Working days = not a weekend day and not a holiday.
+
+    Counting is arithmetic over whole weeks plus a bisect into the sorted
+    holiday list, so a range costs the same whether it spans a day or a year.
+    """
+
+    def __init__(self, holidays: Iterable[datetime.date] = (), weekend: Iterable[int] = (5, 6)):
+        self.weekend = frozenset(weekend)
+        # Holidays that fall on a weekend don't reduce the count twice
+        self.holidays = sorted({d for d in holidays if d.weekday() not in self.weekend})
+
+    @classmethod
+    def from_env(cls) -> "WorkCalendar":
+        # LEAVE_HOLIDAYS="2026-01-26,2026-08-15"; LEAVE_HOLIDAYS_FILE holds one date per line (or a JSON list)
+        values = [v for v in os.getenv("LEAVE_HOLIDAYS", "").split(",") if v.strip()]
+        path = os.getenv("LEAVE_HOLIDAYS_FILE")
+        if path:
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+            values += json.loads(text) if text.lstrip().startswith("[") else text.split()
+        holidays = [datetime.date.fromisoformat(parse_date(v) or v.strip()) for v in values]
+        weekend = [int(d) for d in os.getenv("LEAVE_WEEKEND_DAYS", "5,6").split(",") if d.strip()]
+        return cls(holidays, weekend)
+
+    def working_days(self, start: datetime.date, end: datetime.date) -> int:
+        """Working days in [start, end], inclusive."""
+        if end < start:
+            return 0
+        days = (end - start).days + 1
+        weeks, rest = divmod(days, 7)
+        count = weeks * (7 - len(self.weekend))
+        first = start.weekday()
+        count += sum(1 for i in range(rest) if (first + i) % 7 not in self.weekend)
+        count -= bisect.bisect_right(self.holidays, end) - bisect.bisect_left(self.holidays, start)
+        return count
+
+
+@dataclass
+class LeavePolicy:
+    name: str
+    annual: float                 # days granted per calendar year
+    accrual: str = "yearly"       # "yearly": all on 1 January; "monthly": annual/12 at each month start
+
+    def accrued(self, on: datetime.date) -> float:
+        if self.accrual == "monthly":
+            return round(self.annual * on.month / 12, 2)
+        return self.annual
+
+
+def policies_from_env() -> Dict[str, LeavePolicy]:
+    # LEAVE_POLICIES="Casual Leave=12:monthly,Sick Leave=6" (days per year : accrual)
+    policies = {}
+    for item in filter(None, os.getenv("LEAVE_POLICIES", "").split(",")):
+        name, spec = item.split("=", 1)
+        annual, _, accrual = spec.partition(":")
+        policies[_norm(name)] = LeavePolicy(name.strip(), float(annual), accrual.strip() or "yearly")
+    return policies
+
+
+def report_balances(payload: Any) -> Dict[str, float]:
+    """
+    {leave type: available days} from a leavetracker/reports/user payload.
+
+    The report nests per-type entries differently across Zoho versions, so
+    any dict carrying a leave type name and a balance figure is picked up.
+    """
+    found: Dict[str, float] = {}
+
+    def walk(node):
+        if isinstance(node, dict):
+            name = _first(node, "leavetype", "Leavetype", "LeaveType", "leaveTypeName", "name", "Name")
+            balance = _first(node, "balance", "Balance", "availableCount", "available", "Available", "balanceCount")
+            if isinstance(name, str) and balance is not None:
+                try:
+                    found[_norm(name)] = float(balance)
+                except (TypeError, ValueError):
+                    pass
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(payload)
+    return found
+
+
+class LeaveBalances:
+    """
+    Per-type leave balances computed locally from LeaveStore records.
+
+    Each employee's usage is rebuilt from the store when its leave sync
+    moves on, and adjusted in place when a leave is applied or deleted
+    through the backend, so neither needs a Zoho report call. Zoho's report
+    is still fetched every ``reconcile_interval`` seconds per employee; the
+    difference per leave type (opening balances, carry-forward, manual HR
+    adjustments) is kept as an offset on top of the local figure. Leave
+    types without a configured policy start from the balance Zoho last
+    reported and move with local usage since then.
+    """
+
+    def __init__(self, store, calendar: WorkCalendar, policies: Dict[str, LeavePolicy],
+                 reconcile_interval: float = 21600):
+        self.store = store
+        self.calendar = calendar
+        self.policies = policies
+        self.reconcile_interval = reconcile_interval
+        # employee -> record_id -> (leave type, "taken" | "pending", days)
+        self._usage: Dict[str, Dict[str, Tuple[str, str, float]]] = {}
+        self._version: Dict[str, Any] = {}
+        self._adjustments: Dict[str, Dict[str, float]] = {}
+        # employee -> leave type -> (Zoho's available, local taken + pending when it was reported)
+        self._reported: Dict[str, Dict[str, Tuple[float, float]]] = {}
+        self._reconciled: Dict[str, float] = {}
+        self.rebuilds = 0
+        self.reconciles = 0
+
+    # ---------------- usage ----------------
+    def record_days(self, record: Dict) -> float:
+        """Days a leave record consumes: Zoho's own count when present, else working days in its range."""
+        days = _first(record, "Days", "days", "DaysTaken", "daysTaken", "Days_Taken", "totalDays")
+        if days is not None:
+            try:
+                return float(days)
+            except (TypeError, ValueError):
+                pass
+        start = parse_date(_first(record, "From", "from", "FromDate", "fromDate"))
+        end = parse_date(_first(record, "To", "to", "ToDate", "toDate")) or start
+        if start is None:
+            return 0.0
+        return float(self.calendar.working_days(datetime.date.fromisoformat(start), datetime.date.fromisoformat(end)))
+
+    def _usage_entry(self, record: Dict) -> Optional[Tuple[str, str, float]]:
+        status = _norm(_first(record, "ApprovalStatus", "approvalStatus", "Status", "status"))
+        bucket = "taken" if status in TAKEN_STATUSES else "pending" if status in PENDING_STATUSES else None
+        if bucket is None:
+            return None
+        leave_type = _norm(_first(record, "Leavetype", "LeaveType", "leaveType", "Leave_Type"))
+        return leave_type, bucket, self.record_days(record)
+
+    def rebuild(self, employee_id: str, version: Any, today: Optional[datetime.date] = None):
+        """Recompute usage from the store (blocking; run via asyncio.to_thread)."""
+        today = today or datetime.date.today()
+        records = self.store.records_between(
+            employee_id, datetime.date(today.year, 1, 1).isoformat(), datetime.date(today.year, 12, 31).isoformat()
+        )
+        usage = {}
+        for record_id, record in records:
+            entry = self._usage_entry(record)
+            if entry:
+                usage[record_id] = entry
+        self._usage[employee_id] = usage
+        self._version[employee_id] = version
+        self.rebuilds += 1
+
+    def is_current(self, employee_id: str, version: Any) -> bool:
+        return employee_id in self._usage and self._version.get(employee_id) == version
+
+    def applied(self, employee_id: str, leave_type: str, from_date: str, to_date: str):
+        """Count a just-applied leave as pending until the next sync brings in Zoho's record."""
+        start, end = parse_date(from_date), parse_date(to_date) or parse_date(from_date)
+        if employee_id not in self._usage or start is None:
+            return
+        days = self.calendar.working_days(datetime.date.fromisoformat(start), datetime.date.fromisoformat(end))
+        self._usage[employee_id][f"local:{uuid.uuid4().hex}"] = (_norm(leave_type), "pending", float(days))
+
+    def removed(self, employee_id: str, record_id: str):
+        usage = self._usage.get(employee_id)
+        if usage is not None:
+            usage.pop(record_id, None)
+
+    # ---------------- balances ----------------
+    def balances(self, employee_id: str, today: Optional[datetime.date] = None) -> Dict[str, Dict]:
+        today = today or datetime.date.today()
+        totals: Dict[str, Dict[str, float]] = {}
+        for leave_type, bucket, days in self._usage.get(employee_id, {}).values():
+            entry = totals.setdefault(leave_type, {"taken": 0.0, "pending": 0.0})
+            entry[bucket] += days
+        adjustments = self._adjustments.get(employee_id, {})
+        reported = self._reported.get(employee_id, {})
+
+        result = {}
+        for key in sorted(set(totals) | set(self.policies) | set(reported)):
+            used = totals.get(key, {"taken": 0.0, "pending": 0.0})
+            policy = self.policies.get(key)
+            row = {
+                "leave_type": policy.name if policy else key,
+                "taken": used["taken"],
+                "pending": used["pending"],
+                "accrued": None,
+                "available": None,
+                "basis": None,
+            }
+            if policy:
+                row["accrued"] = policy.accrued(today)
+                row["available"] = round(
+                    row["accrued"] + adjustments.get(key, 0.0) - used["taken"] - used["pending"], 2
+                )
+                row["basis"] = "policy"
+            elif key in reported:
+                zoho_available, used_then = reported[key]
+                row["available"] = round(zoho_available - (used["taken"] + used["pending"] - used_then), 2)
+                row["basis"] = "zoho"
+            result[key] = row
+        return result
+
+    def preview(self, employee_id: str, leave_type: str, from_date: str, to_date: str,
+                today: Optional[datetime.date] = None) -> Dict:
+        """Balance impact of applying ``leave_type`` over [from_date, to_date], without applying it."""
+        start, end = parse_date(from_date), parse_date(to_date)
+        if start is None or end is None:
+            raise ValueError("from_date and to_date must be dates")
+        days = self.calendar.working_days(datetime.date.fromisoformat(start), datetime.date.fromisoformat(end))
+        current = self.balances(employee_id, today).get(_norm(leave_type))
+        available = current["available"] if current else None
+        return {
+            "leave_type": current["leave_type"] if current else leave_type,
+            "from_date": start,
+            "to_date": end,
+            "working_days": days,
+            "available_before": available,
+            "available_after": None if available is None else round(available - days, 2),
+            "sufficient": None if available is None else available >= days,
+        }
+
+    # ---------------- reconcile ----------------
+    def has_report(self, employee_id: str) -> bool:
+        return employee_id in self._reported
+
+    def reconcile_due(self, employee_id: str) -> bool:
+        return time.time() - self._reconciled.get(employee_id, 0) > self.reconcile_interval
+
+    async def reconcile_with(self, employee_id: str, fetch: Callable[[], Awaitable[Any]]):
+        """Fetch Zoho's report via ``fetch()`` and reconcile; failures wait for the next interval."""
+        self._reconciled[employee_id] = time.time()
+        try:
+            report = await fetch()
+        except Exception as e:
+            logger.warning(f"Leave balance reconcile for {employee_id} failed: {e}")
+            return
+        if not is_stale(report):
+            self.reconcile(employee_id, report)
+
+    def reconcile(self, employee_id: str, report: Any, today: Optional[datetime.date] = None) -> Dict[str, float]:
+        """
+        Compare local balances with Zoho's report and adopt Zoho's figure
+        for every leave type it lists; types without a policy take it as
+        their new starting point. Returns {leave type: drift} for policy types.
+        """
+        upstream = report_balances(report)
+        local = self.balances(employee_id, today)
+        adjustments = self._adjustments.setdefault(employee_id, {})
+        reported = {}
+        drift = {}
+        for key, zoho_available in upstream.items():
+            row = local.get(key)
+            if key not in self.policies:
+                reported[key] = (zoho_available, row["taken"] + row["pending"] if row else 0.0)
+                continue
+            delta = round(zoho_available - row["available"], 2)
+            if delta:
+                drift[key] = delta
+                adjustments[key] = adjustments.get(key, 0.0) + delta
+        self._reported[employee_id] = reported
+        self._reconciled[employee_id] = time.time()
+        self.reconciles += 1
+        if drift:
+            logger.warning(f"Leave balances for {employee_id} drifted from Zoho: {drift}")
+        return drift
+
+    def stats(self) -> Dict:
+        return {
+            "employees": len(self._usage),
+            "policies": sorted(p.name for p in self.policies.values()),
+            "holidays": len(self.calendar.holidays),
+            "rebuilds": self.rebuilds,
+            "reconciles": self.reconciles,
+        }
@@ -0,0 +1,308 @@
+import asyncio
+import datetime
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from circuit_breaker import CircuitOpenError, is_stale
+from logger_config import get_logger
+
+logger = get_logger("leave_store")
+
+_DATE_FORMATS = ("%Y-%m-%d", "%d-%b-%Y", "%d-%m-%Y", "%d/%m/%Y", "%Y/%m/%d")
+
+
+def parse_date(value: Any) -> Optional[str]:
+    """ISO date string for the date formats Zoho uses, or None."""
+    if not isinstance(value, str):
+        return None
+    value = value.strip().split(" ")[0]
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def _first(record: Dict, *keys) -> Any:
+    for key in keys:
+        if record.get(key) not in (None, ""):
+            return record[key]
+    return None
+
+
+def leave_records(payload: Any) -> Iterator[Tuple[str, Dict]]:
+    """
+    (record_id, record) pairs from a leavetracker/leaves/records payload.
+
+    Zoho keys records by ID under "records"; list-shaped payloads carrying
+    the ID inside each record are accepted too.
+    """
+    body = payload.get("records", payload.get("data", payload)) if isinstance(payload, dict) else payload
+    if isinstance(body, dict):
+        for record_id, record in body.items():
+            if isinstance(record, dict):
+                yield str(record_id), record
+    elif isinstance(body, list):
+        for record in body:
+            if isinstance(record, dict):
+                record_id = _first(record, "recordId", "RecordId", "id", "Zoho_ID", "Zoho.ID")
+                if record_id is not None:
+                    yield str(record_id), record
+
+
+class LeaveStore:
+    """
+    Per-employee leave records in SQLite, plus each employee's sync state.
+
+    All methods are synchronous and meant to be run via asyncio.to_thread.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._open_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Opened on first use, so importing the app doesn't create or migrate the database
+        if self._db is None:
+            with self._open_lock:
+                if self._db is None:
+                    self._db = self._open()
+        return self._db
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS leaves ("
+            " employee_id TEXT NOT NULL,"
+            " record_id TEXT NOT NULL,"
+            " from_date TEXT,"
+            " to_date TEXT,"
+            " status TEXT,"
+            " leave_type TEXT,"
+            " data TEXT NOT NULL,"
+            " PRIMARY KEY (employee_id, record_id))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS leaves_by_date ON leaves (employee_id, from_date)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS leave_sync ("
+            " employee_id TEXT PRIMARY KEY,"
+            " watermark TEXT,"
+            " last_sync REAL,"
+            " last_full_sync REAL)"
+        )
+        return conn
+
+    def replace_window(self, employee_id: str, start: str, end: str, records: List[Tuple[str, Dict]],
+                       watermark: str, full: bool = False):
+        """
+        Make the store match upstream for leaves starting in [start, end]:
+        upsert every returned record and drop local ones Zoho no longer has.
+        ``watermark`` is the date this sync covers changes up to.
+        """
+        rows = [
+            (
+                employee_id,
+                record_id,
+                parse_date(_first(record, "From", "from", "FromDate", "fromDate")),
+                parse_date(_first(record, "To", "to", "ToDate", "toDate")),
+                _first(record, "ApprovalStatus", "approvalStatus", "Status", "status"),
+                _first(record, "Leavetype", "LeaveType", "leaveType", "Leave_Type"),
+                json.dumps(record),
+            )
+            for record_id, record in records
+        ]
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS seen (record_id TEXT PRIMARY KEY)"
+            )
+            self._conn.execute("DELETE FROM seen")
+            self._conn.executemany("INSERT OR IGNORE INTO seen VALUES (?)", [(r[1],) for r in rows])
+            self._conn.execute(
+                "DELETE FROM leaves WHERE employee_id = ? AND from_date BETWEEN ? AND ? "
+                "AND record_id NOT IN (SELECT record_id FROM seen)",
+                (employee_id, start, end),
+            )
+            self._conn.executemany(
+                "INSERT INTO leaves (employee_id, record_id, from_date, to_date, status, leave_type, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(employee_id, record_id) DO UPDATE SET "
+                "from_date = excluded.from_date, to_date = excluded.to_date, status = excluded.status, "
+                "leave_type = excluded.leave_type, data = excluded.data",
+                rows,
+            )
+            self._conn.execute(
+                "INSERT INTO leave_sync (employee_id, watermark, last_sync, last_full_sync) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(employee_id) DO UPDATE SET watermark = excluded.watermark, "
+                "last_sync = excluded.last_sync, "
+                "last_full_sync = COALESCE(excluded.last_full_sync, leave_sync.last_full_sync)",
+                (employee_id, watermark, now, now if full else None),
+            )
+
+    def remove(self, employee_id: str, record_id: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM leaves WHERE employee_id = ? AND record_id = ?", (employee_id, record_id)
+            )
+
+    def sync_state(self, employee_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT watermark, last_sync, last_full_sync FROM leave_sync WHERE employee_id = ?",
+                (employee_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"watermark": row[0], "last_sync": row[1], "last_full_sync": row[2]}
+
+    def query(self, employee_id: str, from_date: Optional[str] = None, to_date: Optional[str] = None,
+              status: Optional[str] = None, limit: int = 100, offset: int = 0) -> Dict:
+        """Leaves overlapping [from_date, to_date], newest first, optionally filtered by status."""
+        where = ["employee_id = ?"]
+        args: List[Any] = [employee_id]
+        if from_date:
+            where.append("COALESCE(to_date, from_date) >= ?")
+            args.append(from_date)
+        if to_date:
+            where.append("from_date <= ?")
+            args.append(to_date)
+        if status:
+            where.append("status = ? COLLATE NOCASE")
+            args.append(status)
+        clause = " AND ".join(where)
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM leaves WHERE {clause}", args).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT record_id, data FROM leaves WHERE {clause} "
+                "ORDER BY from_date DESC, record_id LIMIT ? OFFSET ?",
+                args + [limit, offset],
+            ).fetchall()
+        return {
+            "records": [{"record_id": record_id, **json.loads(data)} for record_id, data in rows],
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+        }
+
+    def records_between(self, employee_id: str, start: str, end: str) -> List[Tuple[str, Dict]]:
+        """(record_id, record) for every leave starting in [start, end], unpaginated."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT record_id, data FROM leaves WHERE employee_id = ? AND from_date BETWEEN ? AND ?",
+                (employee_id, start, end),
+            ).fetchall()
+        return [(record_id, json.loads(data)) for record_id, data in rows]
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+_CLEAN = object()
+
+
+def _widen(a: Optional[Tuple[datetime.date, datetime.date]], b: Optional[Tuple[datetime.date, datetime.date]]):
+    if a is None or b is None:
+        return a or b
+    return min(a[0], b[0]), max(a[1], b[1])
+
+
+class LeaveSync:
+    """
+    Keeps LeaveStore current for each employee.
+
+    The first read does a full sync from 1 January to ``full_horizon_days``
+    ahead. After that, reads older than ``interval`` trigger an incremental
+    sync of the recent window only: ``lookback_days`` before the last sync
+    date (the watermark) to ``horizon_days`` ahead, widened to cover the
+    dates of any leave written through the backend since. Every
+    ``full_interval`` a full reconcile catches anything the incremental
+    windows missed. Syncs for one employee are single-flight.
+    """
+
+    def __init__(self, store: LeaveStore, interval: float = 60, lookback_days: int = 7,
+                 horizon_days: int = 60, full_horizon_days: int = 365, full_interval: float = 86400):
+        self.store = store
+        self.interval = interval
+        self.lookback_days = lookback_days
+        self.horizon_days = horizon_days
+        self.full_horizon_days = full_horizon_days
+        self.full_interval = full_interval
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # employee -> dates written since the last sync ((first, last), or None if unknown)
+        self._dirty: Dict[str, Optional[Tuple[datetime.date, datetime.date]]] = {}
+
+    def mark_dirty(self, employee_id: str, from_date: Optional[str] = None, to_date: Optional[str] = None):
+        """Force an incremental sync on the next read (after a local write), covering the written dates."""
+        start, end = parse_date(from_date), parse_date(to_date) or parse_date(from_date)
+        span = (datetime.date.fromisoformat(start), datetime.date.fromisoformat(end)) if start else None
+        if employee_id in self._dirty:
+            span = _widen(self._dirty[employee_id], span)
+        self._dirty[employee_id] = span
+
+    async def remove(self, employee_id: str, record_id: str):
+        await asyncio.to_thread(self.store.remove, employee_id, record_id)
+        self.mark_dirty(employee_id)
+
+    async def ensure_synced(self, employee_id: str, fetch: Callable[[datetime.date, datetime.date], Awaitable[Any]]) -> Dict:
+        """
+        Sync ``employee_id`` if it is due and return its sync state.
+
+        ``fetch(from_date, to_date)`` returns the raw Zoho payload. If a
+        sync fails but older data exists, that data is served and the state
+        is flagged ``stale`` instead of failing the read.
+        """
+        lock = self._locks.setdefault(employee_id, asyncio.Lock())
+        async with lock:
+            state = await asyncio.to_thread(self.store.sync_state, employee_id)
+            now = time.time()
+            today = datetime.date.today()
+
+            if state is None or now - (state["last_full_sync"] or 0) > self.full_interval:
+                start, full = datetime.date(today.year, 1, 1), True
+                horizon = today + datetime.timedelta(days=self.full_horizon_days)
+            elif employee_id in self._dirty or now - state["last_sync"] > self.interval:
+                watermark = datetime.date.fromisoformat(state["watermark"])
+                start, full = watermark - datetime.timedelta(days=self.lookback_days), False
+                horizon = today + datetime.timedelta(days=self.horizon_days)
+                written = self._dirty.get(employee_id)
+                if written:
+                    start, horizon = min(start, written[0]), max(horizon, written[1])
+            else:
+                return state
+
+            # Taken before the fetch: a write landing while it runs marks the employee dirty again
+            dirty = self._dirty.pop(employee_id, _CLEAN)
+            try:
+                payload = await fetch(start, horizon)
+                if is_stale(payload):
+                    raise CircuitOpenError("leaves", 0)
+            except Exception as e:
+                if dirty is not _CLEAN:
+                    self._dirty[employee_id] = _widen(self._dirty.get(employee_id, dirty), dirty)
+                if state is None:
+                    raise
+                logger.warning(f"Leave sync for {employee_id} failed, serving local data: {e}")
+                return {**state, "stale": True}
+
+            records = list(leave_records(payload))
+            await asyncio.to_thread(
+                self.store.replace_window, employee_id, start.isoformat(), horizon.isoformat(), records,
+                today.isoformat(), full,
+            )
+            logger.info(
+                f"{'Full' if full else 'Incremental'} leave sync for {employee_id}: "
+                f"{len(records)} records from {start} to {horizon}"
+            )
+            return await asyncio.to_thread(self.store.sync_state, employee_id)
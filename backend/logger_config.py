@@ -1,17 +1,178 @@
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from dotenv import load_dotenv
+
+# Every backend module imports this one before reading its settings, so this
+# is the only place .env is parsed
+load_dotenv()
+
+LOG_FILE = os.getenv("LOG_FILE", os.path.join(os.path.dirname(__file__), "app.log"))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")            # "text" or "json"
+LOG_ROTATE = os.getenv("LOG_ROTATE", "size")            # "size", "time" or "none"
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "midnight")
+# Per-logger caps on INFO/DEBUG records, "name=records per second:burst";
+# warnings and errors always get through
+LOG_RATE_LIMITS = os.getenv("LOG_RATE_LIMITS", "oauth_store=2:20")
+
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket over a logger's INFO-and-below records. Dropped records are
+    counted and the count is attached to the next record that gets through.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.suppressed = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                self.suppressed += 1
+                return False
+            self.tokens -= 1
+            if self.suppressed:
+                record.suppressed = self.suppressed
+                record.msg = f"{record.msg} ({self.suppressed} similar messages suppressed)"
+                self.suppressed = 0
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the listener thread with only the cheap part done here:
+    the message is merged with its args and any traceback is rendered, but
+    timestamps, formatting and I/O happen off the caller's thread. The
+    listener is started by the first record, not when loggers are created.
+    """
+
+    def enqueue(self, record: logging.LogRecord):
+        if not _listener_started:
+            _start_listener()
+        super().enqueue(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _rate_limits() -> Dict[str, Tuple[float, float]]:
+    limits = {}
+    for item in filter(None, LOG_RATE_LIMITS.split(",")):
+        name, spec = item.split("=", 1)
+        rate, _, burst = spec.partition(":")
+        limits[name.strip()] = (float(rate), float(burst or rate))
+    return limits
+
+
+_lock = threading.Lock()
+_queue_handler: Optional[_QueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_listener_started = False
+
+
+def _file_handler() -> logging.Handler:
+    if LOG_ROTATE == "size":
+        return logging.handlers.RotatingFileHandler(
+            LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8", delay=True
+        )
+    if LOG_ROTATE == "time":
+        return logging.handlers.TimedRotatingFileHandler(
+            LOG_FILE, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT, encoding="utf-8", delay=True
+        )
+    # delay: the file is opened by the first record written, not at import
+    return logging.FileHandler(LOG_FILE, encoding="utf-8", delay=True)
+
+
+def _setup() -> _QueueHandler:
+    global _queue_handler, _listener
+    with _lock:
+        if _queue_handler is None:
+            formatter = JSONFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+            handlers = [_file_handler(), logging.StreamHandler()]
+            for handler in handlers:
+                handler.setFormatter(formatter)
+            log_queue = queue.SimpleQueue()
+            _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+            _queue_handler = _QueueHandler(log_queue)
+    return _queue_handler
+
+
+def _start_listener():
+    global _listener_started
+    with _lock:
+        if not _listener_started and _listener is not None:
+            _listener.start()
+            atexit.register(shutdown_logging)
+            _listener_started = True
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            if _listener_started:
+                _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            _listener = None
 
-LOG_FILE = os.path.join(os.path.dirname(__file__), "app.log")
 
 def get_logger(name: str) -> logging.Logger:
     logger = logging.getLogger(name)
     if not logger.handlers:
-        logger.setLevel(logging.INFO)
-        fh = logging.FileHandler(LOG_FILE)
-        ch = logging.StreamHandler()
-        formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(name)s - %(message)s")
-        fh.setFormatter(formatter)
-        ch.setFormatter(formatter)
-        logger.addHandler(fh)
-        logger.addHandler(ch)
+        logger.setLevel(LOG_LEVEL)
+        logger.addHandler(_setup())
+        limit = _rate_limits().get(name)
+        if limit:
+            logger.addFilter(RateLimitFilter(*limit))
+        # Records are written once, by the listener; don't hand them to root handlers too
+        logger.propagate = False
     return logger
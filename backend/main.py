@@ -1,45 +1,87 @@
-import os
+import asyncio
+import datetime
+import hashlib
 import json
+import os
+import time
 import httpx
-from fastapi import FastAPI, HTTPException
+from typing import Dict, List, Optional
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse, StreamingResponse
+from pydantic import BaseModel
 from logger_config import get_logger
 from oauth_store import (
     create_session,
     get_session,
     update_session,
     delete_session,
-    load_sessions,
+    iter_sessions,
+    session_count,
+    session_stats,
     save_sessions,
+    close_store,
+    SessionSweeper,
 )
-from zoho_client import fetch_user_info, get_leaves, apply_leave, delete_leave, get_attendance, get_user_report
-import logging
-from dotenv import load_dotenv
-load_dotenv()
-import sys
-logging.basicConfig(
-    level=logging.INFO,
-    stream=sys.stdout,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    encoding='utf-8' 
+import zoho_client
+import zoho_regions
+from zoho_client import (
+    exchange_code_for_token,
+    fetch_user_info,
+    get_leaves,
+    apply_leave,
+    delete_leave,
+    get_attendance,
+    get_user_report,
+    employee_to_user_info,
 )
+from token_refresher import TokenRefresher, TokenRefreshError
+from response_cache import ResponseCache
+from rate_limiter import RateLimitExceeded
+from circuit_breaker import CircuitOpenError, is_stale
+from attendance import attendance_records, fetch_windows, merge_payloads, month_windows
+from leave_store import LeaveStore, LeaveSync
+from leave_balance import LeaveBalances, WorkCalendar, policies_from_env
+from employee_directory import EmployeeDirectory
+from bulk_leave import IdempotencyStore, run_bulk, run_idempotent
+from jobs import TERMINAL, JobQueue
+from metrics import CONTENT_TYPE, REGISTRY, MetricsMiddleware, stats_gauge
+from responses import (CompressionMiddleware, FastJSONResponse, dumps, encoded_bodies, json_response,
+                       parse_fields, project_records)
 
 
-app = FastAPI()
 logger = get_logger("backend")
 
-# Load persistent sessions on startup
-sessions = load_sessions()
-
-@app.on_event("startup")
-async def startup_event():
-    logger.info("Backend starting up. Loaded sessions from disk.")
 
-@app.on_event("shutdown")
-async def shutdown_event():
-    save_sessions()
-    logger.info("Backend shutting down. Saved sessions to disk.")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pooled HTTP clients for Zoho calls (one per region), kept alive for the app's lifetime
+    app.state.zoho_pool = zoho_client.init_pool()
+    token_refresher.start()
+    employee_directory.start()
+    job_queue.start(eager=LEAVE_WRITES_ASYNC)
+    session_sweeper.start()
+    logger.info("Backend starting up.")
+    try:
+        yield
+    finally:
+        await session_sweeper.stop()
+        await token_refresher.stop()
+        await employee_directory.stop()
+        await job_queue.stop()
+        await zoho_client.close_pool()
+        if zoho_client.recorder is not None:
+            zoho_client.recorder.close()
+        leave_sync.store.close()
+        idempotency_store.close()
+        job_queue.close()
+        save_sessions()
+        close_store()
+        logger.info("Backend shutting down. Saved sessions to disk.")
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
 
 # Allow frontend access
 app.add_middleware(
@@ -48,11 +90,146 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# gzip/brotli for complete JSON and text responses above RESPONSE_COMPRESS_MIN_BYTES
+app.add_middleware(CompressionMiddleware)
+# Per-route request counts, status codes and latency for /metrics
+app.add_middleware(MetricsMiddleware)
 
 ZOHO_CLIENT_ID = os.getenv("ZOHO_CLIENT_ID")
 ZOHO_CLIENT_SECRET = os.getenv("ZOHO_CLIENT_SECRET")
 ZOHO_REDIRECT_URI = os.getenv("ZOHO_REDIRECT_URI")
-print (ZOHO_CLIENT_ID)
+
+token_refresher = TokenRefresher(
+    ZOHO_CLIENT_ID,
+    ZOHO_CLIENT_SECRET,
+    margin=float(os.getenv("ZOHO_TOKEN_REFRESH_MARGIN", "300")),
+    lease=float(os.getenv("ZOHO_TOKEN_REFRESH_LEASE", "60")),
+    concurrency=int(os.getenv("ZOHO_TOKEN_REFRESH_CONCURRENCY", "4")),
+)
+
+# Deletes sessions past SESSION_TTL / SESSION_IDLE_TTL in the background
+session_sweeper = SessionSweeper()
+
+
+# Read-through cache for /api/user/report and /api/attendance (TTLs in seconds)
+response_cache = ResponseCache(
+    ttls={
+        "report": float(os.getenv("CACHE_TTL_REPORT", "300")),
+        "attendance": float(os.getenv("CACHE_TTL_ATTENDANCE", "300")),
+        # Windows that ended before today never change
+        "attendance_past": float(os.getenv("CACHE_TTL_ATTENDANCE_PAST", "86400")),
+    },
+    stale_ttl=float(os.getenv("CACHE_STALE_TTL", "120")),
+    max_bytes=int(os.getenv("CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    # Don't pin circuit-breaker fallbacks in the cache
+    cacheable=lambda value: not is_stale(value),
+)
+
+
+# /api/leaves is served from a local store kept current by incremental syncs
+leave_sync = LeaveSync(
+    LeaveStore(os.getenv("LEAVE_DB", os.path.join(os.path.dirname(__file__), "leaves.db"))),
+    interval=float(os.getenv("LEAVE_SYNC_INTERVAL", "60")),
+    lookback_days=int(os.getenv("LEAVE_SYNC_LOOKBACK_DAYS", "7")),
+    horizon_days=int(os.getenv("LEAVE_SYNC_HORIZON_DAYS", "60")),
+    full_horizon_days=int(os.getenv("LEAVE_FULL_SYNC_HORIZON_DAYS", "365")),
+    full_interval=float(os.getenv("LEAVE_FULL_SYNC_INTERVAL", "86400")),
+)
+
+# Leave balances computed from the local leave store; Zoho's report is only
+# fetched now and then to reconcile against
+leave_balances = LeaveBalances(
+    leave_sync.store,
+    WorkCalendar.from_env(),
+    policies_from_env(),
+    reconcile_interval=float(os.getenv("LEAVE_BALANCE_RECONCILE_INTERVAL", "21600")),
+)
+_background_tasks = set()
+
+# Idempotency keys for leave writes share the leave database
+idempotency_store = IdempotencyStore(
+    leave_sync.store.path,
+    ttl=float(os.getenv("IDEMPOTENCY_TTL", "86400")),
+)
+BULK_LEAVE_CONCURRENCY = int(os.getenv("BULK_LEAVE_CONCURRENCY", "4"))
+BULK_LEAVE_MAX_ITEMS = int(os.getenv("BULK_LEAVE_MAX_ITEMS", "500"))
+
+
+def retryable_write(exc: BaseException) -> bool:
+    """Errors after which a queued write may safely run again (Zoho never processed it)."""
+    if isinstance(exc, (RateLimitExceeded, CircuitOpenError, httpx.ConnectError, httpx.ConnectTimeout,
+                        httpx.PoolTimeout)):
+        return True
+    return isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code in (429, 503)
+
+
+# Leave writes can be queued and answered with 202 instead of waiting on Zoho
+job_queue = JobQueue.from_env(os.path.join(os.path.dirname(__file__), "jobs.db"), retryable_write)
+LEAVE_WRITES_ASYNC = os.getenv("LEAVE_WRITES_ASYNC", "false").lower() in ("1", "true", "yes")
+
+# Local copy of P_EmployeeView so login enrichment and team/department
+# queries don't need Zoho. It syncs with the most recently logged-in session.
+_directory_session_id = None
+
+
+async def directory_credentials():
+    global _directory_session_id
+    if _directory_session_id is None or not get_session(_directory_session_id):
+        _directory_session_id = next((sid for sid, s in iter_sessions() if s.get("refresh_token")), None)
+        if _directory_session_id is None:
+            return None
+    token = await token_refresher.access_token(_directory_session_id)
+    return token_refresher.endpoints(_directory_session_id), token
+
+
+employee_directory = EmployeeDirectory(
+    directory_credentials,
+    interval=float(os.getenv("DIRECTORY_SYNC_INTERVAL", "900")),
+    full_interval=float(os.getenv("DIRECTORY_FULL_SYNC_INTERVAL", "86400")),
+)
+
+# Zoho roles (P_EmployeeView ROLE) that may list any department or team;
+# everyone else sees only their own department and their own direct reports
+DIRECTORY_ADMIN_ROLES = {r.strip().lower() for r in os.getenv("DIRECTORY_ADMIN_ROLES", "Admin").split(",") if r.strip()}
+
+
+def is_directory_admin(user_info: Dict) -> bool:
+    return (user_info.get("role") or "").strip().lower() in DIRECTORY_ADMIN_ROLES
+
+
+def caller_names(user_info: Dict) -> List[str]:
+    """The ways REPORTINGTO may name this user: employee ID, email or full name."""
+    return [v for v in (user_info.get("zoho_id"), user_info.get("email"), user_info.get("name")) if v]
+
+
+# Attendance ranges are fetched as monthly windows, this many at a time
+ATTENDANCE_WINDOW_CONCURRENCY = int(os.getenv("ATTENDANCE_WINDOW_CONCURRENCY", "4"))
+
+
+@app.exception_handler(TokenRefreshError)
+async def token_refresh_error_handler(request, exc: TokenRefreshError):
+    logger.error(f"Token refresh failed: {exc}")
+    return JSONResponse(status_code=401, content={"detail": "Session expired, please log in again"})
+
+
+@app.exception_handler(RateLimitExceeded)
+async def rate_limit_handler(request, exc: RateLimitExceeded):
+    logger.warning(f"Upstream rate limit: {exc}")
+    return JSONResponse(
+        status_code=429,
+        headers={"Retry-After": "5"},
+        content={"detail": "Zoho API rate limit reached, please retry shortly"},
+    )
+
+
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_handler(request, exc: CircuitOpenError):
+    logger.warning(str(exc))
+    return JSONResponse(
+        status_code=503,
+        headers={"Retry-After": str(max(1, int(exc.retry_after)))},
+        content={"detail": f"Zoho is unavailable ({exc.endpoint}), please retry later"},
+    )
 
 # ---------------- AUTH ----------------
 @app.get("/auth/zoho/login")
@@ -66,67 +243,50 @@ async def zoho_login():
         "ZohoPeople.forms.ALL"
     ])
     url = (
-        f"https://accounts.zoho.in/oauth/v2/auth?"
+        f"{zoho_regions.default().accounts}/oauth/v2/auth?"
         f"scope={scopes}&"
         f"client_id={ZOHO_CLIENT_ID}&response_type=code&access_type=offline&"
         f"redirect_uri={ZOHO_REDIRECT_URI}"
     )
     return {"auth_url": url}
 
-SESSION_FILE = "session.json"
-
 @app.get("/auth/zoho/callback")
-async def zoho_callback(code: str):
+async def zoho_callback(code: str, location: str = None,
+                        accounts_server: str = Query(None, alias="accounts-server")):
     logger.info("Exchanging Zoho auth code for access token...")
 
-    token_url = "https://accounts.zoho.in/oauth/v2/token"
-    params = {
-        "grant_type": "authorization_code",
-        "client_id": ZOHO_CLIENT_ID,
-        "client_secret": ZOHO_CLIENT_SECRET,
-        "redirect_uri": ZOHO_REDIRECT_URI,
-        "code": code,
-    }
-
-    # Step 1: Exchange code for tokens
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(token_url, params=params)
-        resp.raise_for_status()
-        token_data = resp.json()
+    # Step 1: Exchange code for tokens at the accounts server of the user's
+    # data centre (Zoho's redirect names it; ZOHO_REGION otherwise)
+    hint = zoho_regions.normalize(location) or zoho_regions.region_from_url(accounts_server)
+    token_data = await exchange_code_for_token(code, ZOHO_CLIENT_ID, ZOHO_CLIENT_SECRET, ZOHO_REDIRECT_URI,
+                                               endpoints=zoho_regions.for_region(hint))
 
     access_token = token_data["access_token"]
     refresh_token = token_data.get("refresh_token")
-    raw_api_domain = token_data.get("api_domain", "")
 
-    # Step 2: Determine API domain
-    if "zohoapis.in" in raw_api_domain:
-        api_domain = "https://people.zoho.in"
-    elif "zohoapis.com" in raw_api_domain:
-        api_domain = "https://people.zoho.com"
-    else:
-        api_domain = "https://people.zoho.in"
+    # Step 2: Resolve every Zoho base URL for this session once, from the token's api_domain
+    endpoints = zoho_regions.from_token(token_data, hint)
 
     # Step 3: Save session immediately
     session_data = {
         "access_token": access_token,
         "refresh_token": refresh_token,
         "scope": token_data.get("scope"),
-        "api_domain": api_domain,
+        "region": endpoints.region,
+        "api_domain": endpoints.people,
+        "expires_at": time.time() + int(token_data.get("expires_in", 3600)),
     }
     session_id = create_session(session_data)
+    token_refresher.track(session_id, session_data["expires_at"])
     logger.info(f"Session saved: {session_id}")
 
     # Step 4: Fetch user info (optional, doesn’t block session creation)
+    global _directory_session_id
+    _directory_session_id = session_id
     try:
-        user_info = await fetch_user_info(api_domain, access_token)
-        logger.info(f"User info fetched: {user_info}")
-        # Add user_info to existing session file
-        with open(SESSION_FILE, "r+", encoding="utf-8") as f:
-            sessions = json.load(f)
-            sessions[session_id]["user_info"] = user_info
-            f.seek(0)
-            json.dump(sessions, f, ensure_ascii=False, indent=2)
-            f.truncate()
+        user_info = await fetch_user_info(access_token, directory=employee_directory, endpoints=endpoints)
+        logger.info(f"User info fetched for employee {user_info.get('zoho_id')}")
+        update_session(session_id, {"user_info": user_info})
     except httpx.HTTPStatusError as e:
         logger.error(f"Failed to fetch user info: {e}")
         # Continue anyway, session already saved
@@ -139,6 +299,7 @@ async def zoho_callback(code: str):
 @app.get("/auth/zoho/logout")
 async def zoho_logout(session_id: str):
     """Logout current session."""
+    token_refresher.forget(session_id)
     if delete_session(session_id):
         logger.info(f"Session {session_id} logged out successfully.")
         return {"status": "ok", "message": "Session cleared successfully."}
@@ -146,10 +307,15 @@ async def zoho_logout(session_id: str):
 
 
 # ---------------- API ROUTES ----------------
-def get_employee_id_from_session(session_id: str) -> str:
-    s = get_session(session_id)
+def require_session(session_id: str) -> Dict:
+    s = get_session(session_id, touch=True)
     if not s:
         raise HTTPException(401, "Invalid session")
+    return s
+
+
+def get_employee_id_from_session(session_id: str) -> str:
+    s = require_session(session_id)
     user_info = s.get("user_info", {})
     emp_id = user_info.get("zoho_id")
     if not emp_id:
@@ -157,27 +323,125 @@ def get_employee_id_from_session(session_id: str) -> str:
     return emp_id
 
 
+def sync_leaves(session_id: str, emp_id: str):
+    return leave_sync.ensure_synced(
+        emp_id,
+        lambda start, end: token_refresher.call(session_id, get_leaves, emp_id, from_date=start, to_date=end),
+    )
+
+
+async def fetch_leaves(session_id: str, emp_id: str, from_date: str = None, to_date: str = None,
+                       status: str = None, limit: int = 100, offset: int = 0):
+    """Sync the employee's leaves if due, then answer from the local store."""
+    sync = await sync_leaves(session_id, emp_id)
+    result = await asyncio.to_thread(leave_sync.store.query, emp_id, from_date, to_date, status, limit, offset)
+    result["sync"] = sync
+    return result
+
+
+def fetch_user_report(session_id: str, emp_id: str):
+    return response_cache.get_or_fetch(
+        emp_id, "report", None,
+        lambda: token_refresher.call(session_id, get_user_report, emp_id),
+    )
+
+
+async def fetch_balances(session_id: str, emp_id: str):
+    """
+    Local leave balances, rebuilt only when the leave sync has moved on.
+    Reconciles against Zoho's report when one is due: inline the first time,
+    since leave types without a policy take their balance from it, and in
+    the background after that.
+    """
+    sync = await sync_leaves(session_id, emp_id)
+    if not leave_balances.is_current(emp_id, sync.get("last_sync")):
+        await asyncio.to_thread(leave_balances.rebuild, emp_id, sync.get("last_sync"))
+    if leave_balances.reconcile_due(emp_id):
+        reconcile = leave_balances.reconcile_with(
+            emp_id, lambda: token_refresher.call(session_id, get_user_report, emp_id),
+        )
+        if not leave_balances.has_report(emp_id):
+            await reconcile
+        else:
+            task = asyncio.create_task(reconcile)
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
+    return {"balances": leave_balances.balances(emp_id), "sync": sync}
+
+
+def fetch_attendance_window(session_id: str, user_info: Dict, sdate: str, edate: str, past: bool = False):
+    emp_id = user_info.get("zoho_id")
+    email = user_info.get("email")
+    return response_cache.get_or_fetch(
+        emp_id or email, "attendance_past" if past else "attendance", {"sdate": sdate, "edate": edate},
+        lambda: token_refresher.call(session_id, get_attendance, sdate, edate, empId=emp_id, emailId=email),
+    )
+
+
+def attendance_window_list(sdate: str, edate: str) -> List:
+    """The monthly windows [sdate, edate] is fetched in."""
+    try:
+        start, end = datetime.date.fromisoformat(sdate), datetime.date.fromisoformat(edate)
+    except ValueError:
+        # Not ISO dates: hand the range to Zoho unchanged as a single window
+        return [(sdate, edate)]
+    if start > end:
+        return [(sdate, edate)]
+    return month_windows(start, end)
+
+
+def attendance_windows(session_id: str, user_info: Dict, sdate: str, edate: str):
+    """
+    Async iterator of ((start, end), payload or exception) over monthly
+    windows of [sdate, edate], fetched in parallel and yielded in date order.
+    """
+    windows = attendance_window_list(sdate, edate)
+    today = datetime.date.today()
+
+    def fetch(window):
+        ws, we = window
+        past = isinstance(we, datetime.date) and we < today
+        return fetch_attendance_window(session_id, user_info, str(ws), str(we), past=past)
+
+    return fetch_windows(windows, fetch, ATTENDANCE_WINDOW_CONCURRENCY)
+
+
+async def fetch_attendance(session_id: str, user_info: Dict, sdate: str, edate: str):
+    payloads = []
+    async for _, payload in attendance_windows(session_id, user_info, sdate, edate):
+        if isinstance(payload, Exception):
+            raise payload
+        payloads.append(payload)
+    return merge_payloads(payloads)
+
+
 @app.get("/api/leaves")
-async def api_leaves(session_id: str):
+async def api_leaves(request: Request, session_id: str, from_date: str = None, to_date: str = None,
+                     status: str = None, limit: int = Query(100, ge=1, le=1000), offset: int = Query(0, ge=0),
+                     fields: str = None):
+    """
+    Leave records overlapping [from_date, to_date] (ISO dates), newest first.
+    ``fields`` (comma-separated) trims each record to those keys plus record_id.
+    """
     emp_id = get_employee_id_from_session(session_id)
-    s = get_session(session_id)
     try:
-        leaves_data = await get_leaves(s["access_token"], emp_id)
-        return leaves_data
+        leaves_data = await fetch_leaves(session_id, emp_id, from_date, to_date, status, limit, offset)
+        names = parse_fields(fields)
+        if names:
+            leaves_data["records"] = project_records(leaves_data["records"], ("record_id",) + names)
+        return json_response(request, leaves_data)
     except httpx.HTTPStatusError as e:
         logger.error(f"Error fetching leaves: {e}")
         raise HTTPException(status_code=e.response.status_code, detail=str(e))
+    except (TokenRefreshError, RateLimitExceeded, CircuitOpenError):
+        raise
     except Exception as e:
         logger.exception("Unexpected error fetching leaves")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
-@app.post("/api/leave/apply")
-async def api_apply_leave(session_id: str, leave_type: str, from_date: str, to_date: str, reason: str):
-    """Apply leave using structured input"""
-    emp_id = get_employee_id_from_session(session_id)
-    s = get_session(session_id)
-
+async def submit_leave(session_id: str, emp_id: str, leave_type: str, from_date: str, to_date: str,
+                       reason: str):
     input_data = {
         "employeeId": emp_id,
         "leaveType": leave_type,
@@ -186,26 +450,408 @@ async def api_apply_leave(session_id: str, leave_type: str, from_date: str, to_d
         "reason": reason
     }
 
-    return await apply_leave(s["access_token"], input_data)
+    result = await token_refresher.call(session_id, apply_leave, input_data)
+    leave_sync.mark_dirty(emp_id, from_date, to_date)
+    leave_balances.applied(emp_id, leave_type, from_date, to_date)
+    response_cache.invalidate(emp_id, ("report",))
+    return result
+
+
+async def cancel_leave(session_id: str, emp_id: str, record_id: str):
+    result = await token_refresher.call(session_id, delete_leave, record_id)
+    if emp_id:
+        await leave_sync.remove(emp_id, record_id)
+        leave_balances.removed(emp_id, record_id)
+        response_cache.invalidate(emp_id, ("report",))
+    return result
+
+
+job_queue.register(
+    "apply_leave",
+    lambda session_id, p: submit_leave(session_id, p["employee_id"], p["leave_type"], p["from_date"],
+                                       p["to_date"], p["reason"]),
+)
+job_queue.register(
+    "cancel_leave",
+    lambda session_id, p: cancel_leave(session_id, p["employee_id"], p["record_id"]),
+)
+
+
+async def enqueue_write(kind: str, session_id: str, payload: Dict, dedupe_key: str = None) -> JSONResponse:
+    """Queue a leave write and answer 202 with where to follow it."""
+    job_id = hashlib.sha256(dedupe_key.encode()).hexdigest()[:32] if dedupe_key else None
+    job = await job_queue.enqueue(kind, session_id, payload, job_id)
+    status_url = f"/api/jobs/{job['id']}"
+    return JSONResponse(
+        status_code=202,
+        headers={"Location": status_url},
+        content={
+            "job_id": job["id"],
+            "state": job["state"],
+            "status_url": status_url,
+            "events_url": f"{status_url}/events",
+        },
+    )
+
+
+@app.post("/api/leave/apply")
+async def api_apply_leave(session_id: str, leave_type: str, from_date: str, to_date: str, reason: str,
+                          idempotency_key: str = Header(None), async_mode: bool = None):
+    """Apply leave using structured input. In async mode, queue it and return 202 with a job ID."""
+    emp_id = get_employee_id_from_session(session_id)
+    if LEAVE_WRITES_ASYNC if async_mode is None else async_mode:
+        payload = {"employee_id": emp_id, "leave_type": leave_type, "from_date": from_date,
+                   "to_date": to_date, "reason": reason}
+        return await enqueue_write("apply_leave", session_id, payload,
+                                   idempotency_key and f"apply:{emp_id}:{idempotency_key}")
+    outcome, result = await run_idempotent(
+        idempotency_store, idempotency_key and f"apply:{emp_id}:{idempotency_key}",
+        lambda: submit_leave(session_id, emp_id, leave_type, from_date, to_date, reason),
+    )
+    if outcome == "in_progress":
+        raise HTTPException(409, "A request with this Idempotency-Key is still in progress")
+    return result
 
 
 @app.post("/api/leave/delete/{record_id}")
-async def api_delete_leave(session_id: str, record_id: str):
-    s = get_session(session_id)
-    return await delete_leave(s["access_token"], record_id)
+async def api_delete_leave(session_id: str, record_id: str, async_mode: bool = None):
+    s = require_session(session_id)
+    emp_id = s.get("user_info", {}).get("zoho_id")
+    if LEAVE_WRITES_ASYNC if async_mode is None else async_mode:
+        # One queued cancel per record is enough
+        return await enqueue_write("cancel_leave", session_id, {"employee_id": emp_id, "record_id": record_id},
+                                   f"cancel:{emp_id}:{record_id}")
+    return await cancel_leave(session_id, emp_id, record_id)
+
+
+async def get_job_for(session_id: str, job_id: str) -> Dict:
+    require_session(session_id)
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None or job.pop("session_id") != session_id:
+        raise HTTPException(404, "Job not found")
+    return job
+
+
+@app.get("/api/jobs/{job_id}")
+async def api_job_status(session_id: str, job_id: str):
+    return await get_job_for(session_id, job_id)
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def api_job_events(session_id: str, job_id: str):
+    """Server-sent events: one "status" event per state change, ending once the job succeeds or fails."""
+    job = await get_job_for(session_id, job_id)
+
+    async def events():
+        current = job
+        last = None
+        while True:
+            if (current["state"], current["attempts"]) != last:
+                last = (current["state"], current["attempts"])
+                yield f"event: status\ndata: {json.dumps(current, default=str)}\n\n"
+                if current["state"] in TERMINAL:
+                    return
+            else:
+                yield ": keep-alive\n\n"
+            await job_queue.wait_for_change(job_id, 1.0)
+            current = await asyncio.to_thread(job_queue.get, job_id)
+            if current is None:
+                return
+            current.pop("session_id")
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+def acting_for(user_info: Dict, employee_id: Optional[str]) -> str:
+    """
+    The employee a bulk item writes for: the caller by default, or one of
+    their direct reports (anyone, for DIRECTORY_ADMIN_ROLES).
+    """
+    own_id = user_info.get("zoho_id")
+    emp_id = employee_id or own_id
+    if not emp_id:
+        raise HTTPException(400, "employee_id missing")
+    if emp_id != own_id and not is_directory_admin(user_info) \
+            and not employee_directory.reports_to(emp_id, caller_names(user_info)):
+        raise HTTPException(403, f"Not allowed to manage leave for {emp_id}")
+    return emp_id
+
+
+class BulkApplyItem(BaseModel):
+    leave_type: str
+    from_date: str
+    to_date: str
+    reason: str = ""
+    employee_id: Optional[str] = None     # defaults to the logged-in employee
+    idempotency_key: Optional[str] = None
+
+
+class BulkApplyRequest(BaseModel):
+    items: List[BulkApplyItem]
+
+
+class BulkCancelItem(BaseModel):
+    record_id: str
+    employee_id: Optional[str] = None
+    idempotency_key: Optional[str] = None
+
+
+class BulkCancelRequest(BaseModel):
+    items: List[BulkCancelItem]
+
+
+def bulk_response(operation: str, actor: str, items: List, run):
+    """
+    Stream one NDJSON line per item as each finishes:
+    {"index", "idempotency_key", "status": ok|duplicate|in_progress|error, "result" | "error"}.
+    Idempotency keys are scoped to ``operation`` and ``actor``.
+    """
+    if len(items) > BULK_LEAVE_MAX_ITEMS:
+        raise HTTPException(413, f"At most {BULK_LEAVE_MAX_ITEMS} items per request")
+
+    async def one(index: int, item):
+        key = item.idempotency_key and f"{operation}:{actor}:{item.idempotency_key}"
+        line = {"index": index, "idempotency_key": item.idempotency_key}
+        try:
+            status, result = await run_idempotent(idempotency_store, key, lambda: run(item))
+            line.update(status=status, result=result)
+        except Exception as e:
+            line.update(status="error", error=_section(e)["error"])
+        return line
+
+    async def lines():
+        async for line in run_bulk(items, one, BULK_LEAVE_CONCURRENCY):
+            yield json.dumps(line, default=str) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.post("/api/leave/bulk/apply")
+async def api_bulk_apply_leave(session_id: str, body: BulkApplyRequest):
+    """Apply many leaves at once, BULK_LEAVE_CONCURRENCY at a time; see bulk_response for the output."""
+    user_info = require_session(session_id).get("user_info", {})
+    own_id = user_info.get("zoho_id")
+
+    def run(item: BulkApplyItem):
+        emp_id = acting_for(user_info, item.employee_id)
+        return submit_leave(session_id, emp_id, item.leave_type, item.from_date, item.to_date, item.reason)
+
+    return bulk_response("bulk_apply", own_id or session_id, body.items, run)
+
+
+@app.post("/api/leave/bulk/cancel")
+async def api_bulk_cancel_leave(session_id: str, body: BulkCancelRequest):
+    """Delete many leave records at once; see bulk_response for the output."""
+    user_info = require_session(session_id).get("user_info", {})
+    own_id = user_info.get("zoho_id")
+
+    def run(item: BulkCancelItem):
+        return cancel_leave(session_id, acting_for(user_info, item.employee_id), item.record_id)
+
+    return bulk_response("bulk_cancel", own_id or session_id, body.items, run)
 
 
 @app.get("/api/attendance")
-async def api_attendance(session_id: str, sdate: str, edate: str):
-    s = get_session(session_id)
+async def api_attendance(request: Request, session_id: str, sdate: str, edate: str, fields: str = None):
+    """Attendance for [sdate, edate]; ``fields`` (comma-separated) trims each day's record to those keys."""
+    s = require_session(session_id)
+    payload = await fetch_attendance(session_id, s.get("user_info", {}), sdate, edate)
+    names = parse_fields(fields)
+    if not names:
+        # A single window's payload is the response cache's own object, so its
+        # encoded body can be reused; a merged one is new on every request
+        reuse = len(attendance_window_list(sdate, edate)) == 1 and not is_stale(payload)
+        return json_response(request, payload, reuse=reuse)
+    if isinstance(payload, dict) and "result" in payload:
+        payload = {**payload, "result": project_records(payload["result"], names)}
+    else:
+        payload = project_records(payload, names)
+    return json_response(request, payload)
+
+
+@app.get("/api/attendance/stream")
+async def api_attendance_stream(session_id: str, sdate: str, edate: str):
+    """
+    Attendance as NDJSON, one {"date": ..., "record": ...} line per day in
+    date order. Lines for early windows are sent while later windows are
+    still being fetched; a window that fails produces one {"error": ...} line.
+    """
+    s = require_session(session_id)
     user_info = s.get("user_info", {})
-    emp_id = user_info.get("zoho_id")
-    email = user_info.get("email")
-    return await get_attendance(s["access_token"], sdate, edate, empId=emp_id, emailId=email)
+
+    async def lines():
+        async for (ws, we), payload in attendance_windows(session_id, user_info, sdate, edate):
+            if isinstance(payload, Exception):
+                error = _section(payload)["error"]
+                yield dumps({"sdate": str(ws), "edate": str(we), "error": error}) + b"\n"
+                continue
+            for day, record in attendance_records(payload):
+                yield dumps({"date": day, "record": record}) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.get("/api/leave/preview")
+async def api_leave_preview(session_id: str, leave_type: str, from_date: str, to_date: str):
+    """What applying ``leave_type`` over [from_date, to_date] would do to the balance; nothing is sent to Zoho."""
+    emp_id = get_employee_id_from_session(session_id)
+    await fetch_balances(session_id, emp_id)
+    try:
+        return leave_balances.preview(emp_id, leave_type, from_date, to_date)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
 
 
 @app.get("/api/user/report")
-async def api_user_report(session_id: str):
+async def api_user_report(request: Request, session_id: str, source: str = Query("local", pattern="^(local|zoho)$")):
+    """Leave balances per type, computed locally; ``source=zoho`` returns Zoho's own report instead."""
     emp_id = get_employee_id_from_session(session_id)
-    s = get_session(session_id)
-    return await get_user_report(s["access_token"], emp_id)
+    if source == "zoho":
+        return json_response(request, await fetch_user_report(session_id, emp_id), reuse=True)
+    return json_response(request, await fetch_balances(session_id, emp_id))
+
+
+def _section(result) -> Dict:
+    """Wrap one dashboard section's result or exception."""
+    if not isinstance(result, BaseException):
+        return {"ok": True, "data": result}
+    if isinstance(result, httpx.HTTPStatusError):
+        status, detail = result.response.status_code, str(result)
+    elif isinstance(result, TokenRefreshError):
+        status, detail = 401, "Session expired, please log in again"
+    elif isinstance(result, RateLimitExceeded):
+        status, detail = 429, "Zoho API rate limit reached, please retry shortly"
+    elif isinstance(result, CircuitOpenError):
+        status, detail = 503, f"Zoho is unavailable ({result.endpoint}), please retry later"
+    elif isinstance(result, HTTPException):
+        status, detail = result.status_code, result.detail
+    else:
+        logger.error(f"Dashboard section failed: {result!r}")
+        status, detail = 500, "Internal Server Error"
+    return {"ok": False, "error": {"status": status, "detail": detail}}
+
+
+@app.get("/api/dashboard")
+async def api_dashboard(request: Request, session_id: str, attendance_days: int = 7, sdate: str = None, edate: str = None):
+    """
+    Leaves, leave report and attendance in one round trip.
+
+    The session is resolved once and the three upstream reads run
+    concurrently; each section carries its own ok/error so one failing
+    Zoho call doesn't hide the others. Attendance covers the last
+    ``attendance_days`` days unless sdate/edate are given.
+    """
+    user_info = require_session(session_id).get("user_info", {})
+    emp_id = user_info.get("zoho_id")
+    if not emp_id:
+        raise HTTPException(500, "Employee ID missing in session")
+    if not (sdate and edate):
+        today = datetime.date.today()
+        sdate = (today - datetime.timedelta(days=max(attendance_days, 1) - 1)).isoformat()
+        edate = today.isoformat()
+
+    leaves, report, attendance = await asyncio.gather(
+        fetch_leaves(session_id, emp_id),
+        fetch_balances(session_id, emp_id),
+        fetch_attendance(session_id, user_info, sdate, edate),
+        return_exceptions=True,
+    )
+    return json_response(request, {
+        "employee": user_info,
+        "leaves": _section(leaves),
+        "report": _section(report),
+        "attendance": {"sdate": sdate, "edate": edate, **_section(attendance)},
+    })
+
+
+@app.get("/api/directory/status")
+async def api_directory_status(session_id: str):
+    require_session(session_id)
+    return employee_directory.freshness()
+
+
+@app.get("/api/directory/department/{name}")
+async def api_directory_department(session_id: str, name: str, fields: str = None):
+    """Members of a department: the caller's own, or any for DIRECTORY_ADMIN_ROLES."""
+    user_info = require_session(session_id).get("user_info", {})
+    own = (user_info.get("department") or "").strip().lower()
+    if not is_directory_admin(user_info) and (not own or name.strip().lower() != own):
+        raise HTTPException(403, "You can only list your own department")
+    members = [employee_to_user_info(emp) for emp in employee_directory.department(name)]
+    names = parse_fields(fields)
+    return project_records(members, names) if names else members
+
+
+@app.get("/api/directory/team")
+async def api_directory_team(session_id: str, manager: str = None, fields: str = None):
+    """
+    Direct reports of ``manager`` (defaults to the logged-in user). Only
+    DIRECTORY_ADMIN_ROLES may name a manager other than themselves.
+    """
+    user_info = require_session(session_id).get("user_info", {})
+    own = caller_names(user_info)
+    if manager and not is_directory_admin(user_info) and manager.strip().lower() not in {n.lower() for n in own}:
+        raise HTTPException(403, "You can only list your own team")
+    members = employee_directory.team(manager) if manager else next(
+        (team for team in (employee_directory.team(n) for n in own) if team), []
+    )
+    members = [employee_to_user_info(emp) for emp in members]
+    names = parse_fields(fields)
+    return project_records(members, names) if names else members
+
+
+# Scrape-time gauges over the stats the caches, pool and upstream guards already keep
+stats_gauge("response_cache", "Response cache counters", "field", response_cache.stats)
+REGISTRY.callback_gauge(
+    "zoho_pool", "Zoho HTTP pool counters per region", ("region", "field"),
+    lambda: {(region, key): float(value) for region, stats in zoho_client.pool_stats().items()
+             for key, value in stats.items() if isinstance(value, (int, float)) and not isinstance(value, bool)},
+)
+stats_gauge("zoho_coalescing", "Coalesced upstream reads", "field", zoho_client.inflight.stats)
+stats_gauge("leave_balances", "Local leave balance engine counters", "field", leave_balances.stats)
+stats_gauge("employee_directory", "Employee directory size and lookups", "field", employee_directory.freshness)
+stats_gauge("session_store", "Live, resident, expired and evicted sessions", "field", session_stats)
+
+
+def _rate_limit_rates():
+    stats = zoho_client.rate_limiter.stats()
+    rates = {(name,): bucket["rate"] for name, bucket in stats["endpoints"].items()}
+    rates[("org",)] = stats["org"]["rate"]
+    return rates
+
+
+REGISTRY.callback_gauge(
+    "zoho_rate_limit_rate", "Current allowed requests/second per rate-limit bucket", ("bucket",), _rate_limit_rates,
+)
+REGISTRY.callback_gauge(
+    "zoho_circuit_open", "1 while an endpoint's circuit breaker is not closed", ("endpoint",),
+    lambda: {(name,): float(b["state"] != "closed")
+             for name, b in zoho_client.breakers.stats()["breakers"].items()},
+)
+REGISTRY.callback_gauge(
+    "session_store_sessions", "Sessions in the store", (), lambda: {(): session_count()},
+)
+
+
+@app.get("/metrics")
+async def api_metrics():
+    """Prometheus text exposition of everything in metrics.REGISTRY."""
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/api/cache/stats")
+async def api_cache_stats():
+    return {**response_cache.stats(), "leave_balances": leave_balances.stats(), "sessions": session_stats(),
+            "encoded_bodies": encoded_bodies.stats()}
+
+
+@app.get("/api/upstream/stats")
+async def api_upstream_stats():
+    return {
+        "pools": zoho_client.pool_stats(),
+        "coalescing": zoho_client.inflight.stats(),
+        "rate_limiter": zoho_client.rate_limiter.stats(),
+        "circuit_breakers": zoho_client.breakers.stats(),
+        "jobs": job_queue.stats(),
+        "recording": zoho_client.recorder.stats() if zoho_client.recorder is not None else None,
+    }
@@ -0,0 +1,262 @@
+import bisect
+import functools
+import math
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Seconds; covers sub-millisecond local work up to Zoho's 30s timeout
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+STORE_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05, 0.25)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        # label values tuple -> child; looked up once and kept by hot paths
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+    _new_child = _Value
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_number(child.value)}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        # Non-cumulative per bucket; made cumulative only when scraped
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, doc, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _render_child(self, values, child):
+        lines = []
+        total = 0
+        for bound, count in zip(self.buckets + (math.inf,), child.counts):
+            total += count
+            le = _format_labels(self.labelnames, values, f'le="{_number(bound)}"')
+            lines.append(f"{self.name}_bucket{le} {total}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_number(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {total}")
+        return lines
+
+
+class CallbackGauge(_Metric):
+    """Gauge read at scrape time from ``fn() -> {label values tuple: value}``."""
+    kind = "gauge"
+
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str], fn: Callable[[], Dict[Tuple, float]]):
+        super().__init__(name, doc, labelnames)
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        for values, value in self.fn().items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {_number(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        # Re-registering a name (e.g. on module reload) keeps the first metric
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, doc: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, doc, labelnames))
+
+    def gauge(self, name: str, doc: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, doc, labelnames))
+
+    def histogram(self, name: str, doc: str, labelnames: Sequence[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, doc, labelnames, buckets))
+
+    def callback_gauge(self, name: str, doc: str, labelnames: Sequence[str],
+                       fn: Callable[[], Dict[Tuple, float]]) -> CallbackGauge:
+        metric = CallbackGauge(name, doc, labelnames, fn)
+        self._metrics[name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# ---------------- HTTP server ----------------
+HTTP_REQUESTS = REGISTRY.counter("http_requests_total", "Requests handled, by route and status", ("method", "route", "status"))
+HTTP_LATENCY = REGISTRY.histogram("http_request_duration_seconds", "Time to last response byte", ("method", "route"))
+HTTP_IN_FLIGHT = REGISTRY.gauge("http_requests_in_flight", "Requests being handled", ("method",))
+
+# ---------------- Zoho upstream ----------------
+ZOHO_REQUESTS = REGISTRY.counter(
+    "zoho_requests_total", "Upstream attempts by endpoint and outcome (HTTP status or error class)",
+    ("endpoint", "status"),
+)
+ZOHO_LATENCY = REGISTRY.histogram("zoho_request_duration_seconds", "Single upstream attempt latency", ("endpoint",))
+ZOHO_IN_FLIGHT = REGISTRY.gauge("zoho_requests_in_flight", "Upstream attempts awaiting a response", ("endpoint",))
+ZOHO_RETRIES = REGISTRY.counter("zoho_retries_total", "Upstream attempts that were retried", ("endpoint",))
+ZOHO_RATE_WAIT = REGISTRY.histogram(
+    "zoho_rate_limit_wait_seconds", "Time spent queued in the rate limiter per attempt", ("endpoint",)
+)
+ZOHO_CALLS = REGISTRY.histogram(
+    "zoho_client_call_duration_seconds", "zoho_client function latency as seen by callers "
+    "(retries, coalescing and fallbacks included)", ("function", "outcome"),
+)
+
+# ---------------- session store ----------------
+SESSION_STORE_OPS = REGISTRY.histogram(
+    "session_store_operation_seconds", "Session store operation latency", ("op",), STORE_BUCKETS
+)
+
+
+def timed_call(fn):
+    """Decorator for async zoho_client functions: record latency and ok/error per call."""
+    ok = ZOHO_CALLS.labels(fn.__name__, "ok")
+    error = ZOHO_CALLS.labels(fn.__name__, "error")
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = await fn(*args, **kwargs)
+        except BaseException:
+            error.observe(time.perf_counter() - start)
+            raise
+        ok.observe(time.perf_counter() - start)
+        return result
+
+    return wrapper
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route counts, status codes and latency.
+
+    The route label is the matched path template (``/api/jobs/{job_id}``),
+    read from the scope after routing, so label cardinality stays bounded.
+    Latency runs to the last body chunk, which matters for streamed
+    responses. In-flight requests are tracked per method, since the route
+    isn't known until the request has been routed.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        method = scope["method"]
+        in_flight = HTTP_IN_FLIGHT.labels(method)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            route = scope.get("route")
+            template = getattr(route, "path_format", None) or getattr(route, "path", None) or "<unmatched>"
+            HTTP_REQUESTS.labels(method, template, str(status)).inc()
+            HTTP_LATENCY.labels(method, template).observe(time.perf_counter() - start)
+
+
+def stats_gauge(name: str, doc: str, label: str, fn: Callable[[], Optional[Dict]]):
+    """Expose the numeric fields of a ``stats()`` dict as one gauge labelled by field name."""
+
+    def collect():
+        stats = fn() or {}
+        return {(key,): float(value) for key, value in stats.items()
+                if isinstance(value, (int, float)) and not isinstance(value, bool)}
+
+    return REGISTRY.callback_gauge(name, doc, (label,), collect)
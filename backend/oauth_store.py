@@ -1,98 +1,205 @@
-import json
+import asyncio
 import os
+import time
 import uuid
 from datetime import datetime
-from typing import Optional, Dict
+from typing import Optional, Dict, Iterator, List, Tuple
 from logger_config import get_logger
-import logging
-import sys
-from dotenv import load_dotenv
-load_dotenv()
-logging.basicConfig(
-    level=logging.INFO,
-    stream=sys.stdout,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    encoding='utf-8'  
-)
+from session_store import SessionStore, create_store
+from metrics import SESSION_STORE_OPS
 logger = get_logger("oauth_store")
 
 STORE_FILE = os.path.join(os.path.dirname(__file__), "sessions.json")
-_sessions: Dict[str, Dict] = {} # _sessions is populated from disk at startup
+DB_FILE = os.getenv("SESSION_DB", os.path.join(os.path.dirname(__file__), "sessions.db"))
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "sqlite")  # "sqlite" (default) or "json" for local dev
 
+# Seconds; 0 disables either limit
+SESSION_TTL = float(os.getenv("SESSION_TTL", str(30 * 86400)))          # since login
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", str(7 * 86400)))  # since the last API request
+# How stale last_seen may get before a request writes it back; bounds idle-tracking writes per session
+SESSION_TOUCH_INTERVAL = float(os.getenv("SESSION_TOUCH_INTERVAL", "600"))
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "300"))
+# Sessions kept in memory (sqlite backend); the rest are read from disk on demand
+SESSION_MAX_RESIDENT = int(os.getenv("SESSION_MAX_RESIDENT", "10000"))
 
+_store: SessionStore = create_store(SESSION_BACKEND, STORE_FILE, DB_FILE, SESSION_MAX_RESIDENT)
+# Identifies this process in refresh leases shared with other workers
+_LEASE_OWNER = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+_expired_count = 0
 
+# Histogram children bound once so timing a store call costs two perf_counter reads
+_TIMERS = {op: SESSION_STORE_OPS.labels(op) for op in ("get", "put", "update", "delete", "flush")}
 
-def load_sessions() -> Dict[str, Dict]:
-    global _sessions
-    if os.path.exists(STORE_FILE):
-        try:
-            with open(STORE_FILE, "r") as f:
-                _sessions = json.load(f)
-                logger.info(f"Loaded {len(_sessions)} sessions from disk")
-        except json.JSONDecodeError:
-            logger.error("Session file corrupted, starting fresh.")
-            _sessions = {}
-    else:
-        logger.info("No existing session file found. Starting fresh.")
-        _sessions = {}
-    return _sessions
 
-load_sessions()  
+def load_sessions() -> int:
+    """
+    Warm the store's in-memory cache. Optional: stores open on first use and
+    read sessions on demand, so nothing calls this at import or startup.
+    """
+    return _store.load()
+
 
 def save_sessions():
-    try:
-        with open(STORE_FILE, "w") as f:
-            json.dump(_sessions, f, indent=4)
-        logger.info(f"Saved {len(_sessions)} sessions to disk")
-    except Exception as e:
-        logger.exception(f"Failed to save sessions: {e}")
+    """Make sure every session mutation has reached disk (called on shutdown)."""
+    start = time.perf_counter()
+    _store.flush()
+    _TIMERS["flush"].observe(time.perf_counter() - start)
 
 
 def create_session(data: Dict) -> str:
-    global _sessions
     session_id = str(uuid.uuid4())
     data["created_at"] = datetime.utcnow().isoformat()
-    _sessions[session_id] = data
-    save_sessions()
+    data["last_seen"] = time.time()
+    start = time.perf_counter()
+    _store.put(session_id, data)
+    _TIMERS["put"].observe(time.perf_counter() - start)
     logger.info(f"Created session {session_id}")
     return session_id
 
 
-def get_session(session_id: str) -> Optional[Dict]:
-    s = _sessions.get(session_id)
-    if s:
-        logger.info(f"Loaded session {session_id}")
-    else:
+def _cutoffs(now: float) -> Tuple[Optional[float], Optional[float]]:
+    return (now - SESSION_TTL if SESSION_TTL else None), (now - SESSION_IDLE_TTL if SESSION_IDLE_TTL else None)
+
+
+def _expire(session_id: str):
+    global _expired_count
+    if _store.delete(session_id):
+        _expired_count += 1
+        logger.info(f"Expired session {session_id}")
+
+
+def get_session(session_id: str, touch: bool = False) -> Optional[Dict]:
+    """
+    Return a session's data, or None if it doesn't exist or has expired.
+
+    ``touch`` marks the session as used for the idle TTL; pass it for user
+    requests, not for background work such as token refreshes.
+    """
+    start = time.perf_counter()
+    rec = _store.get(session_id)
+    _TIMERS["get"].observe(time.perf_counter() - start)
+    if rec is None:
         logger.warning(f"Attempted to load non-existent session {session_id}")
+        return None
+    now = time.time()
+    if rec.older_than(*_cutoffs(now)):
+        _expire(session_id)
+        return None
+    s = rec.to_dict()
+    if touch and now - rec.last_seen > SESSION_TOUCH_INTERVAL:
+        s["last_seen"] = now
+        _store.update(session_id, {"last_seen": now})
+    logger.info(f"Loaded session {session_id}")
     return s
 
 
 def update_session(session_id: str, data: Dict):
-    global _sessions
-    if session_id in _sessions:
-        _sessions[session_id].update(data)
-        save_sessions()
+    start = time.perf_counter()
+    updated = _store.update(session_id, data)
+    _TIMERS["update"].observe(time.perf_counter() - start)
+    if updated:
         logger.info(f"Updated session {session_id}")
     else:
         logger.warning(f"Attempted to update missing session {session_id}")
 
 
 def delete_session(session_id: str) -> bool:
-    global _sessions
-    if session_id in _sessions:
-        del _sessions[session_id]
-        save_sessions()
+    start = time.perf_counter()
+    deleted = _store.delete(session_id)
+    _TIMERS["delete"].observe(time.perf_counter() - start)
+    if deleted:
         logger.info(f"Deleted session {session_id}")
         return True
     logger.warning(f"Attempted to delete missing session {session_id}")
     return False
 
 
+def iter_sessions() -> Iterator[Tuple[str, Dict]]:
+    """Iterate over (session_id, data) for every unexpired session."""
+    cutoffs = _cutoffs(time.time())
+    for session_id, rec in _store.items():
+        if not rec.older_than(*cutoffs):
+            yield session_id, rec.to_dict()
+
+
+def token_expiries() -> List[Tuple[str, float]]:
+    """(session_id, access token expiry) for every unexpired session, without loading them."""
+    return _store.token_expiries(*_cutoffs(time.time()))
+
+
+def claim_refresh(session_id: str, lease: float) -> bool:
+    """Whether this process may refresh the session's token now (blocking; see SessionStore.claim_refresh)."""
+    return _store.claim_refresh(session_id, _LEASE_OWNER, lease)
+
+
+def release_refresh(session_id: str):
+    _store.release_refresh(session_id, _LEASE_OWNER)
+
+
+def session_count() -> int:
+    return len(_store)
+
+
+def sweep_expired(ids: Optional[List[str]] = None) -> int:
+    """Delete every session past its absolute or idle TTL; returns how many went."""
+    if ids is None:
+        ids = _store.expired(*_cutoffs(time.time()))
+    before = _expired_count
+    for session_id in ids:
+        # Re-checked, since another worker may have used the session since the query
+        get_session(session_id)
+    if ids:
+        logger.info(f"Swept {_expired_count - before} expired sessions")
+    return _expired_count - before
+
+
+def session_stats() -> Dict:
+    return {
+        "live": len(_store),
+        "expired": _expired_count,
+        "ttl": SESSION_TTL,
+        "idle_ttl": SESSION_IDLE_TTL,
+        **_store.stats(),
+    }
+
+
+class SessionSweeper:
+    """Background task running sweep_expired every ``interval`` seconds."""
+
+    def __init__(self, interval: float = SESSION_SWEEP_INTERVAL):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.interval > 0 and (SESSION_TTL or SESSION_IDLE_TTL):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                # The expiry query reads the database; keep it off the event loop
+                sweep_expired(await asyncio.to_thread(_store.expired, *_cutoffs(time.time())))
+            except Exception:
+                logger.exception("Session sweep failed")
+            await asyncio.sleep(self.interval)
+
+
 def clear_all_sessions():
     """Delete all sessions from memory and disk immediately."""
-    global _sessions
-    _sessions.clear()
-    if os.path.exists(STORE_FILE):
-        os.remove(STORE_FILE)
-        logger.info("Deleted sessions.json file.")
+    _store.clear()
+    _store.flush()
     logger.info("Cleared all sessions from memory.")
+
+
+def close_store():
+    """Flush pending writes and stop the backend's writer (called on shutdown)."""
+    _store.close()
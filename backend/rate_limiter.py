@@ -0,0 +1,183 @@
+import asyncio
+import os
+import random
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+from logger_config import get_logger
+
+logger = get_logger("rate_limiter")
+
+
+class RateLimitExceeded(Exception):
+    """A call could not get an upstream slot before its deadline."""
+
+
+class TokenBucket:
+    """
+    Async token bucket whose rate adapts to upstream throttling.
+
+    Callers queue in FIFO order (asyncio.Lock is fair) and wait for a token
+    instead of failing, unless the wait would run past their deadline. A
+    throttling response halves the rate and pauses the bucket for any
+    Retry-After; each success adds back a little rate up to ``max_rate``
+    (additive increase, multiplicative decrease).
+    """
+
+    def __init__(self, name: str, rate: float, burst: float, min_rate: float = 0.1,
+                 increase: float = 0.05, decrease: float = 0.5):
+        self.name = name
+        self.rate = rate
+        self.max_rate = rate
+        self.min_rate = min_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.throttled = 0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, deadline: float):
+        async with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(0.0, self.paused_until - now)
+            if self.tokens < 1:
+                wait = max(wait, (1 - self.tokens) / self.rate)
+            if wait:
+                if now + wait > deadline:
+                    raise RateLimitExceeded(f"Rate limit '{self.name}' would delay this call {wait:.1f}s past its deadline")
+                await asyncio.sleep(wait)
+                self._refill(time.monotonic())
+            self.tokens -= 1
+
+    def release(self):
+        """Give back a token taken for a call that never went out."""
+        self.tokens = min(self.burst, self.tokens + 1)
+
+    def on_success(self):
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after: Optional[float]):
+        self.throttled += 1
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        self.tokens = min(self.tokens, 0)
+        if retry_after:
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+        logger.warning(f"Zoho throttled '{self.name}', rate now {self.rate:.2f}/s")
+
+    def stats(self) -> Dict:
+        return {
+            "rate": round(self.rate, 3),
+            "max_rate": self.max_rate,
+            "tokens": round(self.tokens, 2),
+            "throttled": self.throttled,
+        }
+
+
+class ZohoRateLimiter:
+    """One org-wide bucket shared by every call plus one bucket per endpoint."""
+
+    def __init__(self, org_rate: float, org_burst: float, endpoint_rate: float, endpoint_burst: float,
+                 endpoint_overrides: Optional[Dict[str, Tuple[float, float]]] = None, max_wait: float = 10.0):
+        self.org = TokenBucket("org", org_rate, org_burst)
+        self.endpoint_rate = endpoint_rate
+        self.endpoint_burst = endpoint_burst
+        self.endpoint_overrides = endpoint_overrides or {}
+        self.max_wait = max_wait
+        self._endpoints: Dict[str, TokenBucket] = {}
+
+    @classmethod
+    def from_env(cls) -> "ZohoRateLimiter":
+        # ZOHO_RATE_ENDPOINTS="leaves=2:5,attendance=1:3" (rate per second : burst)
+        overrides = {}
+        for item in filter(None, os.getenv("ZOHO_RATE_ENDPOINTS", "").split(",")):
+            name, spec = item.split("=", 1)
+            rate, _, burst = spec.partition(":")
+            overrides[name.strip()] = (float(rate), float(burst or rate))
+        return cls(
+            org_rate=float(os.getenv("ZOHO_RATE_ORG", "10")),
+            org_burst=float(os.getenv("ZOHO_RATE_ORG_BURST", "20")),
+            endpoint_rate=float(os.getenv("ZOHO_RATE_ENDPOINT", "5")),
+            endpoint_burst=float(os.getenv("ZOHO_RATE_ENDPOINT_BURST", "10")),
+            endpoint_overrides=overrides,
+            max_wait=float(os.getenv("ZOHO_RATE_MAX_WAIT", "10")),
+        )
+
+    def bucket(self, endpoint: str) -> TokenBucket:
+        b = self._endpoints.get(endpoint)
+        if b is None:
+            rate, burst = self.endpoint_overrides.get(endpoint, (self.endpoint_rate, self.endpoint_burst))
+            b = self._endpoints[endpoint] = TokenBucket(endpoint, rate, burst)
+        return b
+
+    def deadline(self) -> float:
+        return time.monotonic() + self.max_wait
+
+    async def acquire(self, endpoint: str, deadline: float):
+        bucket = self.bucket(endpoint)
+        await bucket.acquire(deadline)
+        try:
+            await self.org.acquire(deadline)
+        except RateLimitExceeded:
+            bucket.release()
+            raise
+
+    def on_response(self, endpoint: str, status_code: int, retry_after: Optional[float]):
+        bucket = self.bucket(endpoint)
+        if status_code == 429:
+            bucket.on_throttle(retry_after)
+            self.org.on_throttle(retry_after)
+        elif status_code < 500:
+            bucket.on_success()
+            self.org.on_success()
+
+    def stats(self) -> Dict:
+        return {
+            "org": self.org.stats(),
+            "endpoints": {name: b.stats() for name, b in self._endpoints.items()},
+        }
+
+
+@dataclass
+class RetryPolicy:
+    """Jittered exponential backoff for throttled and transient upstream failures."""
+    max_attempts: int = 4
+    base_delay: float = 0.5
+    max_delay: float = 10.0
+    retry_statuses: Tuple[int, ...] = (429, 500, 502, 503, 504)
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        return cls(
+            max_attempts=int(os.getenv("ZOHO_RETRY_ATTEMPTS", cls.max_attempts)),
+            base_delay=float(os.getenv("ZOHO_RETRY_BASE_DELAY", cls.base_delay)),
+            max_delay=float(os.getenv("ZOHO_RETRY_MAX_DELAY", cls.max_delay)),
+        )
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter delay before retry number ``attempt`` (0-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After as seconds; accepts both delta-seconds and HTTP-date forms."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,219 @@
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import queue
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import httpx
+
+from logger_config import get_logger
+
+logger = get_logger("recording")
+
+REDACTED = "<redacted>"
+
+# Parameters and fields that carry credentials; always blanked
+SECRET_KEYS = {"access_token", "refresh_token", "id_token", "client_secret", "client_id", "code", "password"}
+# Substrings of field names that hold personal data; values are replaced by
+# stable pseudonyms so the same person lines up across records
+PII_KEY_PARTS = ("email", "mail", "phone", "mobile", "address", "birth", "fullname", "firstname",
+                 "first_name", "lastname", "last_name", "employeename", "photo", "aadhaar", "pan_number")
+PII_KEYS = {"name", "searchvalue", "emailid"}
+EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+KEPT_HEADERS = {"content-type", "retry-after"}
+
+
+class Redactor:
+    """
+    Blanks credentials and pseudonymises personal data in recorded traffic.
+
+    Pseudonyms are a salted hash of the original value, so one employee's
+    email is the same string in the user/info response, the employee search
+    and every record that mentions it; a replay can follow those links.
+    """
+
+    def __init__(self, salt: str, extra_keys: Tuple[str, ...] = ()):
+        self.salt = salt
+        self.extra_keys = {k.lower() for k in extra_keys}
+
+    def pseudonym(self, value: str) -> str:
+        digest = hashlib.sha256(f"{self.salt}:{value}".encode()).hexdigest()[:10]
+        if EMAIL_RE.fullmatch(value):
+            return f"user-{digest}@example.invalid"
+        return f"anon-{digest}"
+
+    def _is_pii(self, key: str) -> bool:
+        key = key.lower()
+        return key in PII_KEYS or key in self.extra_keys or any(part in key for part in PII_KEY_PARTS)
+
+    def value(self, key: str, value: Any) -> Any:
+        if key.lower() in SECRET_KEYS:
+            return REDACTED
+        if isinstance(value, (dict, list)):
+            return self.tree(value)
+        if isinstance(value, str):
+            if value and self._is_pii(key):
+                return self.pseudonym(value)
+            return EMAIL_RE.sub(lambda m: self.pseudonym(m.group(0)), value)
+        return value
+
+    def tree(self, node: Any) -> Any:
+        if isinstance(node, dict):
+            return {k: self.value(str(k), v) for k, v in node.items()}
+        if isinstance(node, list):
+            return [self.tree(v) if isinstance(v, (dict, list)) else self.value("", v) for v in node]
+        return node
+
+    def params(self, query: str) -> List[Tuple[str, str]]:
+        pairs = []
+        for key, value in parse_qsl(query, keep_blank_values=True):
+            if key == "inputData":
+                # apply_leave sends its form as a JSON string
+                try:
+                    value = json.dumps(self.tree(json.loads(value)))
+                except ValueError:
+                    value = REDACTED
+            else:
+                value = self.value(key, value)
+            pairs.append((key, value))
+        return pairs
+
+    def body(self, content: bytes) -> Any:
+        """JSON bodies come back as redacted JSON; anything else as redacted text."""
+        text = content.decode("utf-8", errors="replace")
+        try:
+            return {"json": self.tree(json.loads(text))}
+        except ValueError:
+            return {"text": EMAIL_RE.sub(lambda m: self.pseudonym(m.group(0)), text)}
+
+
+class Recorder:
+    """
+    Appends redacted upstream request/response pairs to a JSONL file.
+
+    ``record`` only queues the raw exchange; redaction, serialisation and
+    the write happen on a background thread so a large attendance payload
+    doesn't stall the event loop.
+    """
+
+    def __init__(self, path: str, redactor: Redactor):
+        self.path = path
+        self.redactor = redactor
+        self.recorded = 0
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._write_loop, name="upstream-recorder", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_env(cls) -> Optional["Recorder"]:
+        path = os.getenv("ZOHO_RECORD_PATH")
+        if not path:
+            return None
+        salt = os.getenv("ZOHO_RECORD_SALT") or os.urandom(8).hex()
+        extra = tuple(k.strip() for k in os.getenv("ZOHO_RECORD_REDACT_KEYS", "").split(",") if k.strip())
+        logger.info(f"Recording upstream traffic to {path}")
+        return cls(path, Redactor(salt, extra))
+
+    def record(self, endpoint: str, response: httpx.Response, elapsed: float):
+        request = response.request
+        self._queue.put((endpoint, request.method, str(request.url), request.content, response.status_code,
+                         dict(response.headers), response.content, elapsed, time.time()))
+
+    def _entry(self, item) -> Dict:
+        endpoint, method, url, request_body, status, headers, content, elapsed, ts = item
+        parts = urlsplit(url)
+        return {
+            "ts": ts,
+            "endpoint": endpoint,
+            "method": method,
+            "path": parts.path,
+            "params": self.redactor.params(parts.query),
+            "request_body": self.redactor.body(request_body) if request_body else None,
+            "status": status,
+            "headers": {k: v for k, v in headers.items() if k.lower() in KEPT_HEADERS},
+            "response": self.redactor.body(content),
+            "response_bytes": len(content),
+            "elapsed": round(elapsed, 4),
+        }
+
+    def _write_loop(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                try:
+                    f.write(json.dumps(self._entry(item), ensure_ascii=False) + "\n")
+                    f.flush()
+                    self.recorded += 1
+                except Exception:
+                    logger.exception("Failed to record upstream exchange")
+
+    def stats(self) -> Dict:
+        return {"path": self.path, "recorded": self.recorded, "pending": self._queue.qsize()}
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=10)
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport that answers from a recorded JSONL corpus, no network.
+
+    Requests match on method, path and the non-secret query parameters;
+    when nothing matches exactly (dates move on between recording and
+    replay), any recording of the same method and path is used. Matching
+    recordings are served round-robin. Each response waits its recorded
+    latency times ``speed`` (0 serves immediately).
+    """
+
+    def __init__(self, path: str, speed: float = 1.0):
+        self.speed = speed
+        self.served = 0
+        self.misses = 0
+        exact: Dict[Tuple, List[Dict]] = {}
+        by_path: Dict[Tuple, List[Dict]] = {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    exact.setdefault(self._key(entry["method"], entry["path"], entry["params"]), []).append(entry)
+                    by_path.setdefault((entry["method"], entry["path"]), []).append(entry)
+        self._exact = {k: itertools.cycle(v) for k, v in exact.items()}
+        self._by_path = {k: itertools.cycle(v) for k, v in by_path.items()}
+        self.entries = sum(len(v) for v in by_path.values())
+
+    @classmethod
+    def from_env(cls) -> Optional["ReplayTransport"]:
+        path = os.getenv("ZOHO_REPLAY_PATH")
+        if not path:
+            return None
+        transport = cls(path, speed=float(os.getenv("ZOHO_REPLAY_SPEED", "1")))
+        logger.info(f"Replaying upstream traffic from {path} ({transport.entries} recordings)")
+        return transport
+
+    @staticmethod
+    def _key(method: str, path: str, params) -> Tuple:
+        return method, path, tuple(sorted((k, v) for k, v in params if k.lower() not in SECRET_KEYS))
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        params = parse_qsl(request.url.query.decode(), keep_blank_values=True)
+        source = self._exact.get(self._key(request.method, request.url.path, params)) \
+            or self._by_path.get((request.method, request.url.path))
+        if source is None:
+            self.misses += 1
+            return httpx.Response(404, json={"error": "no recording for this request"}, request=request)
+        entry = next(source)
+        if self.speed:
+            await asyncio.sleep(entry["elapsed"] * self.speed)
+        self.served += 1
+        body = entry["response"]
+        content = json.dumps(body["json"]).encode() if "json" in body else body["text"].encode()
+        return httpx.Response(entry["status"], headers=entry["headers"], content=content, request=request)
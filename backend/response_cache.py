@@ -0,0 +1,163 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from logger_config import get_logger
+from responses import dumps
+
+logger = get_logger("response_cache")
+
+CacheKey = Tuple[str, str, Tuple]
+
+
+def _size(value: Any) -> int:
+    """Encoded size of a payload, the cache's measure of its weight."""
+    return len(dumps(value))
+
+
+class _Entry:
+    __slots__ = ("value", "size", "fresh_until", "stale_until")
+
+    def __init__(self, value: Any, size: int, fresh_until: float, stale_until: float):
+        self.value = value
+        self.size = size
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+
+class ResponseCache:
+    """
+    In-process cache for upstream read responses.
+
+    Entries are keyed by (employee, endpoint, params). Each endpoint has its
+    own TTL; after it passes, the entry is still served for ``stale_ttl``
+    seconds while one background task re-fetches it (stale-while-revalidate).
+    Entries are evicted least-recently-used once their estimated serialized
+    size exceeds ``max_bytes``. Fetched payloads are measured off the event
+    loop, so a large one doesn't stall other requests on a cache miss.
+    """
+
+    def __init__(self, ttls: Dict[str, float], default_ttl: float = 60, stale_ttl: float = 120,
+                 max_bytes: int = 32 * 1024 * 1024, cacheable: Optional[Callable[[Any], bool]] = None):
+        self.ttls = ttls
+        self.cacheable = cacheable
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        self._by_employee: Dict[str, Set[CacheKey]] = {}
+        self._refreshing: Set[CacheKey] = set()
+        # Bumped on invalidation so a fetch that started before a write can't
+        # repopulate the cache with pre-write data
+        self._generation: Dict[str, int] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self.bytes = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(employee: str, endpoint: str, params: Optional[Dict] = None) -> CacheKey:
+        return (employee, endpoint, tuple(sorted((params or {}).items())))
+
+    async def get_or_fetch(self, employee: str, endpoint: str, params: Optional[Dict],
+                           fetch: Callable[[], Awaitable[Any]]) -> Any:
+        key = self.key(employee, endpoint, params)
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None:
+            if now < entry.fresh_until:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry.value
+            if now < entry.stale_until:
+                self.stale_hits += 1
+                self._entries.move_to_end(key)
+                self._revalidate(key, fetch)
+                return entry.value
+
+        self.misses += 1
+        generation = self._generation.get(employee, 0)
+        value = await fetch()
+        await self._store(key, value, generation)
+        return value
+
+    async def _store(self, key: CacheKey, value: Any, generation: int):
+        if self.cacheable is not None and not self.cacheable(value):
+            return
+        self.set(key, value, generation, await asyncio.to_thread(_size, value))
+
+    def _revalidate(self, key: CacheKey, fetch: Callable[[], Awaitable[Any]]):
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        generation = self._generation.get(key[0], 0)
+
+        async def refresh():
+            try:
+                await self._store(key, await fetch(), generation)
+            except Exception as e:
+                logger.warning(f"Background refresh of {key[1]} for {key[0]} failed: {e}")
+            finally:
+                self._refreshing.discard(key)
+
+        task = asyncio.create_task(refresh())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def set(self, key: CacheKey, value: Any, generation: Optional[int] = None, size: Optional[int] = None):
+        if generation is not None and generation != self._generation.get(key[0], 0):
+            return
+        if self.cacheable is not None and not self.cacheable(value):
+            return
+        if size is None:
+            size = _size(value)
+        if size > self.max_bytes:
+            return
+        self._remove(key)
+        ttl = self.ttls.get(key[1], self.default_ttl)
+        now = time.monotonic()
+        self._entries[key] = _Entry(value, size, now + ttl, now + ttl + self.stale_ttl)
+        self._by_employee.setdefault(key[0], set()).add(key)
+        self.bytes += size
+        while self.bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: CacheKey):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.bytes -= entry.size
+        keys = self._by_employee.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_employee[key[0]]
+
+    def invalidate(self, employee: str, endpoints: Optional[Iterable[str]] = None) -> int:
+        """Drop an employee's entries, optionally only for the given endpoints."""
+        endpoints = set(endpoints) if endpoints is not None else None
+        self._generation[employee] = self._generation.get(employee, 0) + 1
+        doomed = [k for k in self._by_employee.get(employee, ()) if endpoints is None or k[1] in endpoints]
+        for key in doomed:
+            self._remove(key)
+        if doomed:
+            logger.info(f"Invalidated {len(doomed)} cached responses for {employee}")
+        return len(doomed)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+        }
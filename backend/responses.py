@@ -0,0 +1,219 @@
+import gzip
+import json
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from fastapi.responses import JSONResponse, Response
+from starlette.datastructures import MutableHeaders
+
+from logger_config import get_logger
+
+try:
+    import orjson
+except ImportError:  # plain json fallback, several times slower on large payloads
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = get_logger("responses")
+
+# Bodies smaller than this go out uncompressed; compressing them costs more than it saves
+COMPRESS_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "5"))
+BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", "4"))
+COMPRESSIBLE = (b"application/json", b"text/", b"application/x-ndjson")
+
+
+def _default(obj):
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    return str(obj)
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# ---------------- projection ----------------
+def parse_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """``"a,b, c"`` -> ("a", "b", "c"); None or blank means no projection."""
+    if not fields:
+        return None
+    names = tuple(f.strip() for f in fields.split(",") if f.strip())
+    return names or None
+
+
+def project(record: Any, fields: Iterable[str]) -> Any:
+    if not isinstance(record, dict):
+        return record
+    return {f: record[f] for f in fields if f in record}
+
+
+def project_records(records: Any, fields: Iterable[str]) -> Any:
+    """Project every record of a list, or every value of a dict keyed by id or date."""
+    if isinstance(records, list):
+        return [project(r, fields) for r in records]
+    if isinstance(records, dict):
+        return {key: project(r, fields) for key, r in records.items()}
+    return records
+
+
+# ---------------- encoding ----------------
+def accepted_encoding(accept_encoding: str) -> Optional[str]:
+    """Best encoding we can produce for an Accept-Encoding header: br, then gzip."""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip().lower())
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class _EncodedBodies:
+    """
+    Encoded (and compressed) bodies of payloads that are served repeatedly
+    as the same object, e.g. straight out of the response cache, so a cache
+    hit is answered without walking and re-encoding the payload.
+
+    Keyed by object identity; the payload itself is kept alongside so its id
+    can't be reused while the entry exists.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, Tuple[Any, Dict[str, bytes]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, content: Any, encoding: Optional[str]) -> bytes:
+        key = encoding or "identity"
+        entry = self._entries.get(id(content))
+        if entry is not None and entry[0] is content:
+            self._entries.move_to_end(id(content))
+            bodies = entry[1]
+            if key in bodies:
+                self.hits += 1
+                return bodies[key]
+        else:
+            bodies = {}
+            self._entries[id(content)] = (content, bodies)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        self.misses += 1
+        if "identity" not in bodies:
+            bodies["identity"] = dumps(content)
+        if key != "identity":
+            bodies[key] = compress(bodies["identity"], key)
+        return bodies[key]
+
+    def stats(self) -> Dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+encoded_bodies = _EncodedBodies()
+
+
+def json_response(request, content: Any, reuse: bool = False, status_code: int = 200) -> Response:
+    """
+    Encode ``content`` straight to a compressed-if-worthwhile response,
+    skipping FastAPI's jsonable_encoder pass. ``reuse`` memoises the encoded
+    bytes for payloads that are served again as the same object.
+    """
+    encoding = accepted_encoding(request.headers.get("accept-encoding", ""))
+    if reuse:
+        body = encoded_bodies.get(content, None)
+        if encoding and len(body) >= COMPRESS_MIN_BYTES:
+            body = encoded_bodies.get(content, encoding)
+        else:
+            encoding = None
+    else:
+        body = dumps(content)
+        if encoding and len(body) >= COMPRESS_MIN_BYTES:
+            body = compress(body, encoding)
+        else:
+            encoding = None
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(body, status_code=status_code, media_type="application/json", headers=headers)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing complete JSON/text responses above
+    COMPRESS_MIN_BYTES with brotli or gzip, whichever the client accepts.
+
+    Streamed responses (NDJSON, server-sent events) and responses that are
+    already encoded pass through untouched, so streaming stays incremental.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        accept = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = accepted_encoding(accept)
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+
+        async def send_wrapper(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                content_type = headers.get("content-type", "").encode("latin-1")
+                if "content-encoding" in headers or not content_type.startswith(COMPRESSIBLE):
+                    await send(message)
+                else:
+                    # Held until the first body chunk shows whether this is a complete response
+                    start = message
+                return
+            if start is None:
+                await send(message)
+                return
+            held, start = start, None
+            body = message.get("body", b"")
+            if message.get("more_body") or len(body) < COMPRESS_MIN_BYTES:
+                await send(held)
+                await send(message)
+                return
+            body = compress(body, encoding)
+            headers = MutableHeaders(raw=held["headers"])
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await send(held)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
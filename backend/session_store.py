@@ -0,0 +1,639 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+from logger_config import get_logger
+
+logger = get_logger("session_store")
+
+
+def _epoch(iso: str) -> float:
+    # created_at is written as a naive UTC ISO timestamp
+    return datetime.fromisoformat(iso).replace(tzinfo=timezone.utc).timestamp()
+
+
+class SessionRecord:
+    """
+    One session as held in memory.
+
+    Slots keep a resident session to a fixed set of attributes instead of a
+    per-session dict; keys outside the known fields go in ``extra``.
+    ``created`` and ``last_seen`` are epoch seconds so expiry checks are
+    two float comparisons.
+    """
+
+    FIELDS = ("access_token", "refresh_token", "scope", "region", "api_domain", "expires_at", "user_info")
+    __slots__ = FIELDS + ("created", "last_seen", "extra")
+
+    @classmethod
+    def from_dict(cls, data: Dict, last_seen: Optional[float] = None) -> "SessionRecord":
+        rec = cls.__new__(cls)
+        data = dict(data)
+        for name in cls.FIELDS:
+            setattr(rec, name, data.pop(name, None))
+        created_at = data.pop("created_at", None)
+        rec.created = _epoch(created_at) if created_at else time.time()
+        rec.last_seen = data.pop("last_seen", None) or last_seen or rec.created
+        rec.extra = data or None
+        return rec
+
+    def to_dict(self) -> Dict:
+        data = {name: getattr(self, name) for name in self.FIELDS if getattr(self, name) is not None}
+        data["created_at"] = datetime.fromtimestamp(self.created, timezone.utc).replace(tzinfo=None).isoformat()
+        data["last_seen"] = self.last_seen
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def older_than(self, created_before: Optional[float], seen_before: Optional[float]) -> bool:
+        return (created_before is not None and self.created < created_before) or \
+            (seen_before is not None and self.last_seen < seen_before)
+
+
+class SessionStore:
+    """
+    Interface for session persistence backends used by oauth_store.
+
+    Backends serve reads from memory wherever they can; only mutations are
+    persisted.
+    """
+
+    def load(self) -> int:
+        """Open the store and warm the in-memory cache; returns sessions loaded."""
+        raise NotImplementedError
+
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        raise NotImplementedError
+
+    def put(self, session_id: str, data: Dict):
+        raise NotImplementedError
+
+    def update(self, session_id: str, data: Dict) -> bool:
+        raise NotImplementedError
+
+    def delete(self, session_id: str) -> bool:
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def items(self) -> Iterator[Tuple[str, SessionRecord]]:
+        """Iterate over (session_id, record) for every stored session."""
+        raise NotImplementedError
+
+    def expired(self, created_before: Optional[float], seen_before: Optional[float]) -> List[str]:
+        """Ids of sessions created before ``created_before`` or last seen before ``seen_before``."""
+        return [sid for sid, rec in self.items() if rec.older_than(created_before, seen_before)]
+
+    def token_expiries(self, created_before: Optional[float], seen_before: Optional[float]) -> List[Tuple[str, float]]:
+        """(session_id, expires_at) for sessions not past either cutoff."""
+        return [(sid, rec.expires_at) for sid, rec in self.items()
+                if not rec.older_than(created_before, seen_before)]
+
+    def claim_refresh(self, session_id: str, owner: str, lease: float) -> bool:
+        """
+        Take the right to refresh ``session_id``'s access token for ``lease``
+        seconds. False while another owner holds it. Stores only one process
+        can open need no coordination, so this default always grants it.
+        """
+        return True
+
+    def release_refresh(self, session_id: str, owner: str):
+        """Give a refresh lease back early (e.g. after a failed refresh)."""
+
+    def stats(self) -> Dict:
+        return {}
+
+    def flush(self):
+        """Block until every accepted mutation is durable."""
+
+    def close(self):
+        self.flush()
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+# ---------------- JSON file (dev) ----------------
+class JSONFileStore(SessionStore):
+    """
+    The original dict-plus-JSON store, kept for local development.
+
+    The file is read on first use rather than at import. Every mutation rewrites the whole file, so it is O(total sessions); the
+    rewrite goes through a temp file and os.replace so a crash never leaves
+    a half-written sessions.json behind.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._loaded = False
+        self._sessions: Dict[str, SessionRecord] = {}
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def load(self) -> int:
+        self._loaded = True
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    self._sessions = {sid: SessionRecord.from_dict(data) for sid, data in json.load(f).items()}
+                    logger.info(f"Loaded {len(self._sessions)} sessions from disk")
+            except json.JSONDecodeError:
+                logger.error("Session file corrupted, starting fresh.")
+                self._sessions = {}
+        else:
+            logger.info("No existing session file found. Starting fresh.")
+            self._sessions = {}
+        return len(self._sessions)
+
+    def _save(self):
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump({sid: rec.to_dict() for sid, rec in self._sessions.items()}, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            logger.info(f"Saved {len(self._sessions)} sessions to disk")
+        except Exception as e:
+            logger.exception(f"Failed to save sessions: {e}")
+
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        self._ensure_loaded()
+        return self._sessions.get(session_id)
+
+    def put(self, session_id: str, data: Dict):
+        self._ensure_loaded()
+        self._sessions[session_id] = SessionRecord.from_dict(data)
+        self._save()
+
+    def update(self, session_id: str, data: Dict) -> bool:
+        self._ensure_loaded()
+        rec = self._sessions.get(session_id)
+        if rec is None:
+            return False
+        merged = rec.to_dict()
+        merged.update(data)
+        self._sessions[session_id] = SessionRecord.from_dict(merged)
+        self._save()
+        return True
+
+    def delete(self, session_id: str) -> bool:
+        self._ensure_loaded()
+        if session_id not in self._sessions:
+            return False
+        del self._sessions[session_id]
+        self._save()
+        return True
+
+    def items(self) -> Iterator[Tuple[str, SessionRecord]]:
+        self._ensure_loaded()
+        return iter(list(self._sessions.items()))
+
+    def stats(self) -> Dict:
+        # Everything is resident; the file always holds the full set
+        return {"resident": len(self._sessions), "evicted": 0}
+
+    def clear(self):
+        self._loaded = True
+        self._sessions.clear()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+            logger.info("Deleted sessions.json file.")
+
+    def flush(self):
+        if self._loaded:
+            self._save()
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._sessions)
+
+
+# ---------------- SQLite (default) ----------------
+_FLUSH = object()
+# Change-log rows kept for processes that haven't caught up yet; one further behind drops its whole cache
+_CHANGE_LOG_KEEP = 10000
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions persisted one row per session in a WAL-mode SQLite database.
+
+    Mutations enqueue a single-row write, so they cost O(1) on the event
+    loop. A background writer thread drains the queue, commits everything
+    pending in one transaction and lets SQLite do the fsync; a crash can only
+    lose the last uncommitted batch, never corrupt what is already on disk.
+
+    The database file can be shared by several uvicorn workers. Each process
+    keeps a local read cache validated against ``PRAGMA data_version``, which
+    changes whenever another connection commits. Every session write also
+    appends its id to ``session_changes``, so when the version moves get()
+    evicts only the sessions written since it last looked and stays a dict
+    lookup for the rest. Writes this process has queued but not committed yet
+    are served from a pending overlay so they are visible immediately.
+
+    update() queues just the changed fields; the writer merges them into the
+    committed row inside its transaction, so concurrent updates from different
+    workers to different fields of one session all survive.
+
+    The read cache is an LRU bounded by ``max_resident``; sessions that fall
+    out of it stay on disk and are read back on their next request. Startup
+    only warms it with the most recently seen sessions.
+    """
+
+    def __init__(self, path: str, batch_window: float = 0.005, legacy_json: Optional[str] = None,
+                 max_resident: int = 0):
+        self.path = path
+        self.batch_window = batch_window
+        self.legacy_json = legacy_json
+        self.max_resident = max_resident
+        self.evicted = 0
+        self._cache: "OrderedDict[str, SessionRecord]" = OrderedDict()
+        # session_id -> (seq, record or None for a pending delete)
+        self._pending: Dict[str, Tuple[int, Optional[SessionRecord]]] = {}
+        self._pending_lock = threading.Lock()
+        self._seq = 0
+        self._reader: Optional[sqlite3.Connection] = None
+        self._reader_lock = threading.Lock()
+        self._data_version: Optional[int] = None
+        # Last session_changes rev applied to the cache
+        self._rev = 0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._closed = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " created REAL,"
+            " last_seen REAL)"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        # Ids of written sessions, in commit order; a NULL id means every session
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_changes ("
+            " rev INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " session_id TEXT)"
+        )
+        # Which process may refresh a session's token, so workers sharing the file don't all do it
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS refresh_leases ("
+            " session_id TEXT PRIMARY KEY,"
+            " owner TEXT NOT NULL,"
+            " expires REAL NOT NULL)"
+        )
+        return conn
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection):
+        """Add the expiry columns to databases created before they existed."""
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+            if "last_seen" not in columns:
+                conn.execute("ALTER TABLE sessions ADD COLUMN created REAL")
+                conn.execute("ALTER TABLE sessions ADD COLUMN last_seen REAL")
+                # Best guess for old rows: their last write
+                conn.execute("UPDATE sessions SET created = updated_at, last_seen = updated_at")
+                logger.info("Added expiry columns to the sessions table")
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen)")
+
+    def _import_legacy_json(self, conn: sqlite3.Connection):
+        """One-time import of an existing sessions.json into the database."""
+        if not self.legacy_json or not os.path.exists(self.legacy_json):
+            return
+        try:
+            with open(self.legacy_json, "r") as f:
+                legacy = json.load(f)
+        except json.JSONDecodeError:
+            logger.error("Legacy session file corrupted, skipping import.")
+            legacy = {}
+        now = time.time()
+        records = {sid: SessionRecord.from_dict(data) for sid, data in legacy.items()}
+        with conn:
+            # Checked inside the write lock so concurrently starting workers import once
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_json_imported'").fetchone():
+                return
+            conn.executemany(
+                "INSERT OR IGNORE INTO sessions (session_id, data, updated_at, created, last_seen) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(sid, json.dumps(rec.to_dict()), now, rec.created, rec.last_seen) for sid, rec in records.items()],
+            )
+            conn.execute("INSERT INTO meta (key, value) VALUES ('legacy_json_imported', ?)", (str(now),))
+            conn.execute("INSERT INTO session_changes (session_id) VALUES (NULL)")
+        logger.info(f"Imported {len(legacy)} sessions from {self.legacy_json}")
+
+    def _open(self):
+        if self._reader is not None:
+            return
+        self._reader = self._connect()
+        self._migrate(self._reader)
+        self._import_legacy_json(self._reader)
+        self._writer = threading.Thread(target=self._write_loop, name="session-writer", daemon=True)
+        self._writer.start()
+
+    def load(self) -> int:
+        self._open()
+        with self._reader_lock:
+            self._data_version = self._reader.execute("PRAGMA data_version").fetchone()[0]
+            self._rev = self._reader.execute("SELECT COALESCE(MAX(rev), 0) FROM session_changes").fetchone()[0]
+            rows = self._reader.execute(
+                "SELECT session_id, data, last_seen FROM sessions ORDER BY last_seen DESC LIMIT ?",
+                (self.max_resident or -1,),
+            ).fetchall()
+            self._cache.clear()
+            # Oldest first, so the most recently seen end up least likely to be evicted
+            for sid, data, last_seen in reversed(rows):
+                self._cache[sid] = SessionRecord.from_dict(json.loads(data), last_seen)
+        logger.info(f"Loaded {len(self._cache)} sessions from {self.path}")
+        return len(self._cache)
+
+    def _remember(self, session_id: str, rec: SessionRecord):
+        # Caller holds _reader_lock
+        self._cache[session_id] = rec
+        if self.max_resident and len(self._cache) > self.max_resident:
+            self._cache.popitem(last=False)
+            self.evicted += 1
+
+    def _apply_changes(self):
+        """Evict sessions other connections (our writer included) wrote since the last look."""
+        # Caller holds _reader_lock
+        changes = self._reader.execute(
+            "SELECT rev, session_id FROM session_changes WHERE rev > ? ORDER BY rev", (self._rev,)
+        ).fetchall()
+        if not changes:
+            return
+        if changes[0][0] != self._rev + 1 or any(sid is None for _, sid in changes):
+            # Fell behind the pruned log, or a clear/import touched everything
+            self._cache.clear()
+        else:
+            for _, sid in changes:
+                self._cache.pop(sid, None)
+        self._rev = changes[-1][0]
+
+    # -- writer thread --
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            ops = [self._queue.get()]
+            # Give concurrent mutations a moment to join this transaction
+            time.sleep(self.batch_window)
+            while True:
+                try:
+                    ops.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            waiters = [op[1] for op in ops if op[0] is _FLUSH]
+            writes = [op for op in ops if op[0] is not _FLUSH]
+            if writes:
+                try:
+                    self._commit(conn, writes)
+                    self._settle(writes)
+                except Exception as e:
+                    # The overlay keeps serving these in this process until the
+                    # session is written again.
+                    logger.exception(f"Failed to persist {len(writes)} session writes: {e}")
+            for done in waiters:
+                done.set()
+            if self._closed and self._queue.empty():
+                break
+        conn.close()
+
+    @staticmethod
+    def _commit(conn: sqlite3.Connection, writes):
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for op in writes:
+                if op[0] == "put":
+                    conn.execute(
+                        "INSERT INTO sessions (session_id, data, updated_at, created, last_seen) "
+                        "VALUES (?, ?, ?, ?, ?) "
+                        "ON CONFLICT(session_id) DO UPDATE SET data = excluded.data, "
+                        "updated_at = excluded.updated_at, created = excluded.created, last_seen = excluded.last_seen",
+                        (op[1], op[3], time.time(), op[4], op[5]),
+                    )
+                elif op[0] == "update":
+                    # Merge into the committed row, not our cached copy, so other workers' changes survive
+                    row = conn.execute("SELECT data FROM sessions WHERE session_id = ?", (op[1],)).fetchone()
+                    if row is None:
+                        # Deleted since; don't resurrect a partial session
+                        continue
+                    merged = json.loads(row[0])
+                    merged.update(json.loads(op[3]))
+                    rec = SessionRecord.from_dict(merged)
+                    conn.execute(
+                        "UPDATE sessions SET data = ?, updated_at = ?, created = ?, last_seen = ? WHERE session_id = ?",
+                        (json.dumps(rec.to_dict()), time.time(), rec.created, rec.last_seen, op[1]),
+                    )
+                else:
+                    conn.execute("DELETE FROM sessions WHERE session_id = ?", (op[1],))
+                conn.execute("INSERT INTO session_changes (session_id) VALUES (?)", (op[1],))
+            conn.execute("DELETE FROM session_changes WHERE rev <= last_insert_rowid() - ?", (_CHANGE_LOG_KEEP,))
+
+    def _settle(self, writes):
+        """Drop overlay entries whose latest write is now committed."""
+        with self._pending_lock:
+            for op in writes:
+                pending = self._pending.get(op[1])
+                if pending is not None and pending[0] == op[2]:
+                    del self._pending[op[1]]
+
+    def _enqueue(self, kind: str, session_id: str, rec: Optional[SessionRecord], patch: Optional[Dict] = None):
+        with self._pending_lock:
+            self._seq += 1
+            self._pending[session_id] = (self._seq, rec)
+            if rec is None:
+                self._queue.put((kind, session_id, self._seq, None, None, None))
+            elif patch is not None:
+                # Only the changed fields; the writer merges them into the committed row
+                self._queue.put((kind, session_id, self._seq, json.dumps(patch), None, None))
+            else:
+                # Serialize now so later in-memory changes can't leak into this write
+                self._queue.put((kind, session_id, self._seq, json.dumps(rec.to_dict()), rec.created, rec.last_seen))
+        if rec is None:
+            with self._reader_lock:
+                self._cache.pop(session_id, None)
+
+    # -- SessionStore --
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        with self._pending_lock:
+            pending = self._pending.get(session_id)
+        if pending is not None:
+            return pending[1]
+
+        self._open()
+        with self._reader_lock:
+            version = self._reader.execute("PRAGMA data_version").fetchone()[0]
+            if version != self._data_version:
+                # Another connection committed since we last looked
+                self._data_version = version
+                self._apply_changes()
+            s = self._cache.get(session_id)
+            if s is not None:
+                self._cache.move_to_end(session_id)
+            else:
+                row = self._reader.execute(
+                    "SELECT data, last_seen FROM sessions WHERE session_id = ?", (session_id,)
+                ).fetchone()
+                if row:
+                    s = SessionRecord.from_dict(json.loads(row[0]), row[1])
+                    self._remember(session_id, s)
+        return s
+
+    def put(self, session_id: str, data: Dict):
+        self._open()
+        self._enqueue("put", session_id, SessionRecord.from_dict(data))
+
+    def update(self, session_id: str, data: Dict) -> bool:
+        s = self.get(session_id)
+        if s is None:
+            return False
+        merged = s.to_dict()
+        merged.update(data)
+        # The overlay shows this process the merged view right away
+        self._enqueue("update", session_id, SessionRecord.from_dict(merged), patch=data)
+        return True
+
+    def delete(self, session_id: str) -> bool:
+        if self.get(session_id) is None:
+            return False
+        self._enqueue("delete", session_id, None)
+        return True
+
+    def clear(self):
+        self.flush()
+        self._open()
+        with self._reader_lock, self._reader:
+            self._reader.execute("BEGIN IMMEDIATE")
+            self._reader.execute("DELETE FROM sessions")
+            self._reader.execute("INSERT INTO session_changes (session_id) VALUES (NULL)")
+            self._cache.clear()
+        with self._pending_lock:
+            self._pending.clear()
+
+    def items(self) -> Iterator[Tuple[str, SessionRecord]]:
+        self._open()
+        with self._reader_lock:
+            rows = self._reader.execute("SELECT session_id, data, last_seen FROM sessions").fetchall()
+        with self._pending_lock:
+            pending = dict(self._pending)
+        for sid, data, last_seen in rows:
+            if sid not in pending:
+                yield sid, SessionRecord.from_dict(json.loads(data), last_seen)
+        for sid, (_, rec) in pending.items():
+            if rec is not None:
+                yield sid, rec
+
+    def expired(self, created_before: Optional[float], seen_before: Optional[float]) -> List[str]:
+        # Only the indexed float columns are read; no session JSON is parsed
+        clauses, params = [], []
+        if created_before is not None:
+            clauses.append("created < ?")
+            params.append(created_before)
+        if seen_before is not None:
+            clauses.append("last_seen < ?")
+            params.append(seen_before)
+        if not clauses:
+            return []
+        self._open()
+        with self._reader_lock:
+            rows = self._reader.execute(
+                f"SELECT session_id FROM sessions WHERE {' OR '.join(clauses)}", params
+            ).fetchall()
+        with self._pending_lock:
+            pending = dict(self._pending)
+        ids = [sid for (sid,) in rows if sid not in pending]
+        ids.extend(sid for sid, (_, rec) in pending.items()
+                   if rec is not None and rec.older_than(created_before, seen_before))
+        return ids
+
+    def token_expiries(self, created_before: Optional[float], seen_before: Optional[float]) -> List[Tuple[str, float]]:
+        # json_extract pulls one field without handing every row to json.loads
+        self._open()
+        try:
+            with self._reader_lock:
+                rows = self._reader.execute(
+                    "SELECT session_id, json_extract(data, '$.expires_at') FROM sessions "
+                    "WHERE created >= ? AND last_seen >= ?",
+                    (created_before if created_before is not None else float("-inf"),
+                     seen_before if seen_before is not None else float("-inf")),
+                ).fetchall()
+        except sqlite3.OperationalError:
+            # SQLite built without JSON support
+            return super().token_expiries(created_before, seen_before)
+        with self._pending_lock:
+            pending = dict(self._pending)
+        result = [(sid, expires_at) for sid, expires_at in rows if sid not in pending]
+        result.extend((sid, rec.expires_at) for sid, (_, rec) in pending.items()
+                      if rec is not None and not rec.older_than(created_before, seen_before))
+        return result
+
+    def claim_refresh(self, session_id: str, owner: str, lease: float) -> bool:
+        """One BEGIN IMMEDIATE transaction, so two workers can't both win a lease."""
+        self._open()
+        now = time.time()
+        with self._reader_lock, self._reader:
+            self._reader.execute("BEGIN IMMEDIATE")
+            self._reader.execute(
+                "INSERT INTO refresh_leases VALUES (?, ?, ?) ON CONFLICT(session_id) DO UPDATE "
+                "SET owner = excluded.owner, expires = excluded.expires "
+                "WHERE refresh_leases.expires < ? OR refresh_leases.owner = excluded.owner",
+                (session_id, owner, now + lease, now),
+            )
+            row = self._reader.execute("SELECT owner FROM refresh_leases WHERE session_id = ?",
+                                       (session_id,)).fetchone()
+        return row is not None and row[0] == owner
+
+    def release_refresh(self, session_id: str, owner: str):
+        self._open()
+        with self._reader_lock, self._reader:
+            self._reader.execute("DELETE FROM refresh_leases WHERE session_id = ? AND owner = ?", (session_id, owner))
+
+    def stats(self) -> Dict:
+        with self._pending_lock:
+            pending = len(self._pending)
+        return {"resident": len(self._cache), "max_resident": self.max_resident, "evicted": self.evicted,
+                "pending_writes": pending}
+
+    def flush(self, timeout: Optional[float] = 10):
+        if self._writer is None or not self._writer.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        if not done.wait(timeout):
+            logger.error("Timed out waiting for session writes to flush")
+
+    def close(self):
+        self._closed = True
+        self.flush()
+
+    def __len__(self) -> int:
+        self._open()
+        with self._reader_lock:
+            return self._reader.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def create_store(backend: str, json_path: str, db_path: str, max_resident: int = 0) -> SessionStore:
+    """Build the session backend named by SESSION_BACKEND ("sqlite" or "json")."""
+    backend = (backend or "sqlite").lower()
+    if backend == "json":
+        return JSONFileStore(json_path)
+    if backend == "sqlite":
+        return SQLiteSessionStore(db_path, legacy_json=json_path, max_resident=max_resident)
+    raise ValueError(f"Unknown session backend: {backend}")
@@ -0,0 +1,72 @@
+import time
+
+from session_store import SQLiteSessionStore
+
+
+def _session(token: str) -> dict:
+    return {"access_token": token, "refresh_token": "r", "expires_at": time.time() + 3600,
+            "user_info": {"email": "a@example.com"}}
+
+
+def _stores(tmp_path, n=2):
+    path = str(tmp_path / "sessions.db")
+    stores = [SQLiteSessionStore(path) for _ in range(n)]
+    for store in stores:
+        store.load()
+    return stores
+
+
+def test_concurrent_updates_from_two_workers_both_survive(tmp_path):
+    a, b = _stores(tmp_path)
+    a.put("s1", _session("t0"))
+    a.flush()
+    assert b.get("s1").access_token == "t0"
+
+    # A refreshes the token while B, still holding the t0 copy, touches last_seen
+    a.update("s1", {"access_token": "t1"})
+    b.update("s1", {"last_seen": 1234567890.0})
+    a.flush()
+    b.flush()
+
+    for store in (a, b):
+        rec = store.get("s1")
+        assert rec.access_token == "t1"
+        assert rec.last_seen == 1234567890.0
+    a.close()
+    b.close()
+
+
+def test_update_does_not_resurrect_a_deleted_session(tmp_path):
+    a, b = _stores(tmp_path)
+    a.put("s1", _session("t0"))
+    a.flush()
+    assert b.get("s1") is not None
+
+    a.delete("s1")
+    b.update("s1", {"access_token": "t1"})
+    a.flush()
+    b.flush()
+
+    assert a.get("s1") is None
+    assert b.get("s1") is None
+    a.close()
+    b.close()
+
+
+def test_writes_evict_only_the_sessions_written(tmp_path):
+    a, b = _stores(tmp_path)
+    for sid in ("s1", "s2", "s3"):
+        a.put(sid, _session("t0"))
+    a.flush()
+    for store in (a, b):
+        for sid in ("s1", "s2", "s3"):
+            store.get(sid)
+
+    a.update("s1", {"access_token": "t1"})
+    a.flush()
+
+    for store in (a, b):
+        assert store.get("s1").access_token == "t1"
+        assert set(store._cache) == {"s1", "s2", "s3"}
+    a.close()
+    b.close()
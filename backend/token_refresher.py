@@ -0,0 +1,226 @@
+import asyncio
+import heapq
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from logger_config import get_logger
+from oauth_store import claim_refresh, get_session, release_refresh, update_session, token_expiries
+import zoho_regions
+from zoho_client import refresh_access_token
+
+logger = get_logger("token_refresher")
+
+
+class TokenRefreshError(Exception):
+    """Zoho would not issue a new access token for a session."""
+
+
+class TokenRefresher:
+    """
+    Keeps session access tokens fresh.
+
+    A background task refreshes each session ``margin`` seconds before its
+    ``expires_at``; ``call()`` also refreshes once on a 401 from Zoho. All
+    refreshes for one session go through a per-session asyncio.Lock, so any
+    number of concurrent requests at token rollover trigger a single refresh
+    and then retry with the new token.
+
+    Across processes sharing the session store, a refresh first claims the
+    session's lease in the store (held ``lease`` seconds, released early on
+    failure), so each token is refreshed by one worker. The others skip a
+    proactive refresh, or on a 401 wait for the winner's new token.
+
+    At most ``concurrency`` proactive refreshes run at once, so a batch of
+    tokens expiring together is paced through the org rate limit instead
+    of draining it ahead of user requests.
+    """
+
+    def __init__(self, client_id: str, client_secret: str, margin: float = 300, interval: float = 30,
+                 lease: float = 60, concurrency: int = 4):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.margin = margin
+        self.interval = interval
+        self.lease = lease
+        self._proactive = asyncio.Semaphore(concurrency)
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # (expires_at, session_id) min-heap; stale entries are skipped lazily
+        self._schedule: List[Tuple[float, str]] = []
+        self._expiry: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    # ---------------- scheduling ----------------
+    def track(self, session_id: str, expires_at: Optional[float]):
+        """Schedule a proactive refresh for a session's current token."""
+        if not expires_at:
+            return
+        self._expiry[session_id] = expires_at
+        heapq.heappush(self._schedule, (expires_at, session_id))
+
+    def forget(self, session_id: str):
+        self._expiry.pop(session_id, None)
+        self._locks.pop(session_id, None)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def _track_stored(self):
+        # Reading every stored session is O(sessions), so it runs in a thread
+        # after startup instead of delaying it
+        expiries = await asyncio.to_thread(token_expiries)
+        for session_id, expires_at in expiries:
+            # Sessions tracked since the scan started already have a newer expiry
+            if session_id not in self._expiry:
+                self.track(session_id, expires_at)
+        logger.info(f"Token refresher tracking {len(self._expiry)} sessions")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        try:
+            await self._track_stored()
+        except Exception:
+            logger.exception("Failed to load stored sessions for proactive refresh")
+        while True:
+            try:
+                await self.refresh_due()
+            except Exception:
+                logger.exception("Background token refresh pass failed")
+            await asyncio.sleep(self.interval)
+
+    async def refresh_due(self):
+        deadline = time.time() + self.margin
+        due = []
+        while self._schedule and self._schedule[0][0] <= deadline:
+            expires_at, session_id = heapq.heappop(self._schedule)
+            if self._expiry.get(session_id) == expires_at:
+                due.append((session_id, expires_at))
+        if not due:
+            return
+        logger.info(f"Proactively refreshing {len(due)} access tokens")
+        results = await asyncio.gather(
+            *(self._refresh_paced(session_id) for session_id, _ in due),
+            return_exceptions=True,
+        )
+        now = time.time()
+        for (session_id, expires_at), result in zip(due, results):
+            if isinstance(result, Exception):
+                logger.error(f"Proactive refresh failed for session {session_id}: {result}")
+                # Keep retrying until the token has actually expired
+                if expires_at > now and session_id in self._expiry:
+                    self.track(session_id, min(expires_at, now + self.interval + self.margin))
+
+    async def _refresh_paced(self, session_id: str):
+        async with self._proactive:
+            await self._refresh_if_due(session_id)
+
+    async def _refresh_if_due(self, session_id: str):
+        s = get_session(session_id)
+        if not s:
+            self.forget(session_id)
+            return
+        # Another worker sharing the session store may have refreshed already
+        expires_at = s.get("expires_at")
+        if expires_at and expires_at - time.time() > self.margin:
+            self.track(session_id, expires_at)
+            return
+        token = await self.refresh(session_id, stale_token=s.get("access_token"), wait=False)
+        if token is None:
+            # Another worker holds the lease; by the next pass it has refreshed (or given up)
+            self.track(session_id, expires_at)
+
+    # ---------------- refresh ----------------
+    async def refresh(self, session_id: str, stale_token: Optional[str] = None, wait: bool = True) -> Optional[str]:
+        """
+        Refresh a session's access token and persist it via update_session.
+
+        If ``stale_token`` is given and the session already holds a different
+        token, someone else refreshed while we waited for the lock and that
+        token is returned without another round trip. When another process
+        holds the session's refresh lease, waits for its token, or with
+        ``wait=False`` returns None.
+        """
+        lock = self._locks.setdefault(session_id, asyncio.Lock())
+        async with lock:
+            s = get_session(session_id)
+            if not s:
+                raise TokenRefreshError(f"Session {session_id} no longer exists")
+            if stale_token is not None and s.get("access_token") != stale_token:
+                return s["access_token"]
+            refresh_token = s.get("refresh_token")
+            if not refresh_token:
+                raise TokenRefreshError(f"Session {session_id} has no refresh token")
+
+            if not await asyncio.to_thread(claim_refresh, session_id, self.lease):
+                if not wait:
+                    return None
+                return await self._await_peer(session_id, s["access_token"])
+            try:
+                data = await refresh_access_token(refresh_token, self.client_id, self.client_secret,
+                                                  endpoints=zoho_regions.for_session(s))
+                # Zoho reports refresh errors as 200 with an "error" field
+                if "access_token" not in data:
+                    raise TokenRefreshError(f"Token refresh rejected: {data.get('error', 'unknown error')}")
+            except BaseException:
+                # Let another worker try straight away
+                await asyncio.shield(asyncio.to_thread(release_refresh, session_id))
+                raise
+
+            expires_at = time.time() + int(data.get("expires_in", 3600))
+            update_session(session_id, {"access_token": data["access_token"], "expires_at": expires_at})
+            self.track(session_id, expires_at)
+            logger.info(f"Refreshed access token for session {session_id}")
+            return data["access_token"]
+
+    async def _await_peer(self, session_id: str, old_token: str, poll: float = 0.25) -> str:
+        """The token another worker is refreshing, once it lands in the shared store."""
+        deadline = time.monotonic() + self.lease
+        while time.monotonic() < deadline:
+            await asyncio.sleep(poll)
+            s = get_session(session_id)
+            if not s:
+                raise TokenRefreshError(f"Session {session_id} no longer exists")
+            if s.get("access_token") != old_token:
+                self.track(session_id, s.get("expires_at"))
+                return s["access_token"]
+        raise TokenRefreshError(f"Timed out waiting for another worker to refresh session {session_id}")
+
+    async def access_token(self, session_id: str) -> str:
+        """Current token for a session, refreshed first if it is about to expire."""
+        s = get_session(session_id)
+        if not s:
+            raise TokenRefreshError(f"Session {session_id} no longer exists")
+        token = s["access_token"]
+        expires_at = s.get("expires_at")
+        if expires_at and expires_at - time.time() <= 0 and s.get("refresh_token"):
+            token = await self.refresh(session_id, stale_token=token)
+        return token
+
+    def endpoints(self, session_id: str) -> zoho_regions.Endpoints:
+        """Zoho base URLs of a session's data centre."""
+        return zoho_regions.for_session(get_session(session_id))
+
+    async def call(self, session_id: str, fn, *args, **kwargs):
+        """
+        Run ``fn(access_token, *args, **kwargs)`` for a session, refreshing the
+        token and retrying once if Zoho answers 401. ``fn`` is a zoho_client
+        call; it is sent to the session's region unless ``endpoints=`` is given.
+        """
+        token = await self.access_token(session_id)
+        kwargs.setdefault("endpoints", self.endpoints(session_id))
+        try:
+            return await fn(token, *args, **kwargs)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != 401:
+                raise
+            logger.warning(f"Zoho returned 401 for session {session_id}, refreshing token")
+            new_token = await self.refresh(session_id, stale_token=token)
+            return await fn(new_token, *args, **kwargs)
@@ -1,21 +1,189 @@
+import asyncio
+import time
 import httpx
+from typing import Dict, Optional, Tuple
+from http_pool import HTTPPool, PoolConfig
+from singleflight import SingleFlight, coalesce
+from rate_limiter import RetryPolicy, ZohoRateLimiter, parse_retry_after
+from circuit_breaker import BreakerConfig, BreakerRegistry, last_known_good
+from recording import Recorder, ReplayTransport
+from metrics import (ZOHO_IN_FLIGHT, ZOHO_LATENCY, ZOHO_RATE_WAIT, ZOHO_REQUESTS, ZOHO_RETRIES,
+                     timed_call)
+import zoho_regions
+from zoho_regions import Endpoints
 from logger_config import get_logger
-from dotenv import load_dotenv
-load_dotenv()
 logger = get_logger("zoho_client")
 
-import logging
-import sys
-logging.basicConfig(
-    level=logging.INFO,
-    stream=sys.stdout,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    encoding='utf-8'  # 
-)
+# ---------------- HTTP pools ----------------
+# One pool per Zoho region (see zoho_regions.py), so a slow or saturated
+# data centre can't take connections from another. Created and closed by the
+# FastAPI lifespan in main.py; other regions' pools open on first use with
+# the same settings. Every function below also accepts an explicit ``pool=``
+# so callers (tests, benchmarks, scripts) can inject their own.
+_pools: Dict[str, HTTPPool] = {}
+_pool_settings: Optional[Tuple[Optional[PoolConfig], Optional[httpx.AsyncBaseTransport]]] = None
+
+
+def _open_pool(region: str) -> HTTPPool:
+    config, transport = _pool_settings
+    pool = _pools[region] = HTTPPool(config, transport=transport)
+    logger.info(
+        f"Zoho HTTP pool for region {region} ready (max_connections={pool.config.max_connections}, "
+        f"per_host={pool.config.max_connections_per_host}, http2={pool.http2})"
+    )
+    return pool
+
+
+def init_pool(config: Optional[PoolConfig] = None, transport: Optional[httpx.AsyncBaseTransport] = None) -> HTTPPool:
+    """Open the default region's upstream pool (serving ZOHO_REPLAY_PATH when set)."""
+    global _pool_settings
+    if transport is None:
+        transport = ReplayTransport.from_env()
+    _pool_settings = (config, transport)
+    return _open_pool(zoho_regions.default().region)
+
+
+async def close_pool():
+    """Close every region's pool and drop their keep-alive connections."""
+    for region, pool in list(_pools.items()):
+        await pool.aclose()
+        logger.info(f"Zoho HTTP pool for region {region} closed")
+    _pools.clear()
+
+
+def get_pool(region: Optional[str] = None) -> HTTPPool:
+    """Return a region's pool (default ZOHO_REGION), creating it lazily."""
+    if _pool_settings is None:
+        init_pool()
+    region = region or zoho_regions.default().region
+    pool = _pools.get(region)
+    if pool is None or pool.closed:
+        return _open_pool(region)
+    return pool
+
+
+def pool_stats() -> Dict[str, Dict]:
+    return {region: pool.stats() for region, pool in _pools.items()}
+
+
+# Identical concurrent reads (same function, token and arguments) share one
+# upstream request; see singleflight.py.
+inflight = SingleFlight()
+
+
+# Every call waits for an org-wide and a per-endpoint token before it goes
+# out, and throttled/transient failures are retried with jittered backoff.
+rate_limiter = ZohoRateLimiter.from_env()
+retry_policy = RetryPolicy.from_env()
+
+# Per-endpoint circuit breakers; reads fall back to their last good payload
+# while a breaker is open, writes fail fast with CircuitOpenError.
+breakers = BreakerRegistry(BreakerConfig.from_env())
+
+# Opt-in capture of upstream traffic (ZOHO_RECORD_PATH) as a redacted JSONL
+# corpus that ReplayTransport can serve back; see recording.py.
+recorder = Recorder.from_env()
+
+# Failures where the request never reached Zoho, so even writes can be retried
+_NOT_SENT = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+async def _send(method: str, url: str, pool: Optional[HTTPPool] = None, endpoint: str = "zoho",
+                idempotent: Optional[bool] = None, region: Optional[str] = None, **kwargs) -> httpx.Response:
+    """
+    Send one upstream request through the rate limiter with retries.
+
+    Non-idempotent calls are only retried when Zoho cannot have processed
+    them (429 or a connection that never opened). The last response is
+    returned as-is so callers keep their own status handling. Without an
+    explicit ``pool`` it goes out on ``region``'s pool.
+    """
+    pool = pool or get_pool(region)
+    if idempotent is None:
+        idempotent = method == "GET"
+    deadline = rate_limiter.deadline()
+    breaker = breakers.get(endpoint)
+    labels = (endpoint,)
+    in_flight = ZOHO_IN_FLIGHT.labels(*labels)
+
+    for attempt in range(retry_policy.max_attempts):
+        last = attempt == retry_policy.max_attempts - 1
+        if attempt:
+            ZOHO_RETRIES.labels(*labels).inc()
+        queued = time.monotonic()
+        try:
+            await rate_limiter.acquire(endpoint, deadline)
+            probe = breaker.allow()
+        except Exception as e:
+            ZOHO_REQUESTS.labels(endpoint, e.__class__.__name__).inc()
+            raise
+        start = time.monotonic()
+        ZOHO_RATE_WAIT.labels(*labels).observe(start - queued)
+        in_flight.inc()
+        try:
+            r = await pool.request(method, url, **kwargs)
+        except httpx.TransportError as e:
+            ZOHO_LATENCY.labels(*labels).observe(time.monotonic() - start)
+            ZOHO_REQUESTS.labels(endpoint, e.__class__.__name__).inc()
+            breaker.record(False, time.monotonic() - start)
+            if last or not (idempotent or isinstance(e, _NOT_SENT)):
+                raise
+            delay = retry_policy.backoff(attempt)
+            logger.warning(f"{endpoint}: {e.__class__.__name__}, retry {attempt + 1} in {delay:.2f}s")
+        except asyncio.CancelledError:
+            # Abandoned, not answered: says nothing about Zoho's health
+            breaker.release(probe)
+            raise
+        except Exception as e:
+            ZOHO_REQUESTS.labels(endpoint, e.__class__.__name__).inc()
+            breaker.record(False, time.monotonic() - start)
+            raise
+        else:
+            ZOHO_LATENCY.labels(*labels).observe(time.monotonic() - start)
+            ZOHO_REQUESTS.labels(endpoint, str(r.status_code)).inc()
+            if recorder is not None:
+                recorder.record(endpoint, r, time.monotonic() - start)
+            breaker.record(r.status_code < 500, time.monotonic() - start)
+            retry_after = parse_retry_after(r.headers.get("Retry-After"))
+            rate_limiter.on_response(endpoint, r.status_code, retry_after)
+            retryable = r.status_code in retry_policy.retry_statuses and (idempotent or r.status_code == 429)
+            if last or not retryable:
+                return r
+            delay = retry_after if retry_after is not None else retry_policy.backoff(attempt)
+            if time.monotonic() + delay > deadline:
+                return r
+            logger.warning(f"{endpoint}: Zoho returned {r.status_code}, retry {attempt + 1} in {delay:.2f}s")
+        finally:
+            # Also on cancellation and unexpected errors, so the gauge can't drift upwards
+            in_flight.dec()
+        await asyncio.sleep(delay)
+
+
 # ---------------- OAuth ----------------
-async def refresh_access_token(refresh_token, client_id, client_secret):
+@timed_call
+async def exchange_code_for_token(code, client_id, client_secret, redirect_uri, endpoints: Optional[Endpoints] = None,
+                                  pool: Optional[HTTPPool] = None):
+    """Exchange an OAuth authorization code for access/refresh tokens at the user's accounts server."""
+    ep = endpoints or zoho_regions.default()
+    url = f"{ep.accounts}/oauth/v2/token"
+    params = {
+        "grant_type": "authorization_code",
+        "client_id": client_id,
+        "client_secret": client_secret,
+        "redirect_uri": redirect_uri,
+        "code": code,
+    }
+    r = await _send("POST", url, pool, endpoint="oauth_token", region=ep.region, params=params)
+    r.raise_for_status()
+    return r.json()
+
+
+@timed_call
+async def refresh_access_token(refresh_token, client_id, client_secret, endpoints: Optional[Endpoints] = None,
+                               pool: Optional[HTTPPool] = None):
     """Refresh Zoho OAuth access token."""
-    url = "https://accounts.zoho.com/oauth/v2/token"
+    ep = endpoints or zoho_regions.default()
+    url = f"{ep.accounts}/oauth/v2/token"
     params = {
         "refresh_token": refresh_token,
         "client_id": client_id,
@@ -23,84 +191,134 @@ async def refresh_access_token(refresh_token, client_id, client_secret):
         "grant_type": "refresh_token",
     }
     logger.info("🔁 Refreshing Zoho access token...")
-    async with httpx.AsyncClient() as client:
-        r = await client.post(url, params=params)
-        r.raise_for_status()
-        logger.info("Access token refreshed successfully")
-        return r.json()
+    r = await _send("POST", url, pool, endpoint="oauth_token", region=ep.region, params=params)
+    r.raise_for_status()
+    logger.info("Access token refreshed successfully")
+    return r.json()
 
 
 # ---------------- Zoho People API ----------------
-async def fetch_user_info(api_domain: str, access_token: str):
-    """
-    Fetch employee info from Zoho People using /people/api/forms/P_EmployeeView/records
-    """
-    headers = {"Authorization": f"Zoho-oauthtoken {access_token}"}
+def employee_to_user_info(emp: dict, email: str = None) -> dict:
+    """Map a P_EmployeeView record to the user_info stored on a session."""
+    return {
+        "zoho_id": emp.get("EMPLOYEEID"),
+        "name": emp.get("FULLNAME"),
+        "email": email or emp.get("EMPLOYEEMAILALIAS") or emp.get("EMAILID"),
+        "department": emp.get("DEPARTMENTNAME"),
+        "designation": emp.get("DESIGNATION"),
+        "role": emp.get("ROLE"),
+        "location": emp.get("LOCATION"),
+        "date_of_joining": emp.get("DATEOFJOIN"),
+        "status": emp.get("EMPLOYEESTATUS")
+    }
 
-    # 1️⃣ Get current user info from Zoho Accounts (this still works to get email)
-    info_url = "https://accounts.zoho.in/oauth/user/info"
-    async with httpx.AsyncClient(timeout=20) as client:
-        r = await client.get(info_url, headers=headers)
-        if r.status_code != 200:
-            logger.error(f"Failed to fetch user info: {r.status_code} - {r.text}")
-            r.raise_for_status()
-        data = r.json()
+
+@timed_call
+async def fetch_account_email(access_token: str, endpoints: Optional[Endpoints] = None,
+                              pool: Optional[HTTPPool] = None) -> str:
+    """Email of the logged-in user from Zoho Accounts."""
+    ep = endpoints or zoho_regions.default()
+    headers = {"Authorization": f"Zoho-oauthtoken {access_token}"}
+    info_url = f"{ep.accounts}/oauth/user/info"
+    r = await _send("GET", info_url, pool, endpoint="user_info", region=ep.region, headers=headers, timeout=20)
+    if r.status_code != 200:
+        logger.error(f"Failed to fetch user info: {r.status_code} - {r.text}")
+        r.raise_for_status()
+    data = r.json()
     email = data.get("Email") or data.get("email") or data.get("useremail")
     if not email:
         raise Exception("Email not found in Zoho user info response")
+    return email
 
-    logger.info(f"📧 Logged-in email: {email}")
 
-    # 2️⃣ Query Zoho People employee view using that email
-    employee_url = f"{api_domain}/people/api/forms/P_EmployeeView/records"
+@timed_call
+async def find_employee(access_token: str, email: str, endpoints: Optional[Endpoints] = None,
+                        pool: Optional[HTTPPool] = None):
+    """Search P_EmployeeView for one employee by email; returns the raw record or None."""
+    ep = endpoints or zoho_regions.default()
+    headers = {"Authorization": f"Zoho-oauthtoken {access_token}"}
+    employee_url = f"{ep.people}/people/api/forms/P_EmployeeView/records"
     params = {
         "searchColumn": "EMPLOYEEMAILALIASs",
         "searchValue": email
     }
 
-    async with httpx.AsyncClient(timeout=20) as client:
-        r = await client.get(employee_url, headers=headers, params=params)
-        if r.status_code != 200:
-            logger.error(f"Failed to fetch employee record: {r.status_code} - {r.text}")
-            r.raise_for_status()
-        data = r.json()
+    r = await _send("GET", employee_url, pool, endpoint="employee_view", region=ep.region, headers=headers, params=params, timeout=20)
+    if r.status_code != 200:
+        logger.error(f"Failed to fetch employee record: {r.status_code} - {r.text}")
+        r.raise_for_status()
+    records = r.json().get("data", [])
+    return records[0] if records else None
 
-    records = data.get("data", [])
-    if not records:
-        raise Exception(f"No employee record found for {email}")
 
-    emp = records[0]
-    user_info = {
-        "zoho_id": emp.get("EMPLOYEEID"),
-        "name": emp.get("FULLNAME"),
-        "email": email,
-        "department": emp.get("DEPARTMENTNAME"),
-        "designation": emp.get("DESIGNATION"),
-        "role": emp.get("ROLE"),
-        "location": emp.get("LOCATION"),
-        "date_of_joining": emp.get("DATEOFJOIN"),
-        "status": emp.get("EMPLOYEESTATUS")
-    }
+@timed_call
+async def list_employees(access_token: str, s_index: int = 1, limit: int = 200, modified_since_ms: int = None,
+                         endpoints: Optional[Endpoints] = None, pool: Optional[HTTPPool] = None) -> list:
+    """One page of P_EmployeeView records, optionally only those modified since a timestamp (ms)."""
+    ep = endpoints or zoho_regions.default()
+    headers = {"Authorization": f"Zoho-oauthtoken {access_token}"}
+    url = f"{ep.people}/people/api/forms/P_EmployeeView/records"
+    params = {"sIndex": s_index, "limit": limit}
+    if modified_since_ms:
+        params["modifiedtime"] = modified_since_ms
+
+    r = await _send("GET", url, pool, endpoint="employee_view", region=ep.region, headers=headers, params=params)
+    if r.status_code != 200:
+        logger.error(f"Failed to list employees: {r.status_code} - {r.text}")
+        r.raise_for_status()
+    return r.json().get("data", [])
+
+
+@timed_call
+@coalesce(inflight)
+async def fetch_user_info(access_token: str, directory=None, endpoints: Optional[Endpoints] = None,
+                          pool: Optional[HTTPPool] = None):
+    """
+    Fetch employee info for the logged-in user.
+
+    The email comes from Zoho Accounts; the employee record is looked up in
+    ``directory`` (see employee_directory.py) when given, falling back to a
+    P_EmployeeView search on a miss.
+    """
+    # 1️⃣ Get current user info from Zoho Accounts (this still works to get email)
+    email = await fetch_account_email(access_token, endpoints=endpoints, pool=pool)
+    logger.info(f"📧 Logged-in email: {email}")
 
-    logger.info(f" Employee info fetched successfully: {user_info}")
+    # 2️⃣ Local directory first, then query Zoho People employee view using that email
+    emp = directory.by_email(email) if directory is not None else None
+    if emp is None:
+        emp = await find_employee(access_token, email, endpoints=endpoints, pool=pool)
+        if emp is None:
+            raise Exception(f"No employee record found for {email}")
+        if directory is not None:
+            directory.upsert(emp)
+
+    user_info = employee_to_user_info(emp, email)
+    logger.info(f"Employee info fetched for {user_info.get('zoho_id')}")
     return user_info
 
 
 
-    
+
 import datetime
 
 
-async def get_leaves(access_token: str, emp_id: str = None):
-    """Fetch leave records from Zoho People within a valid date range."""
-    url = "https://people.zoho.com/api/v2/leavetracker/leaves/records"
+@timed_call
+@coalesce(inflight)
+@last_known_good(breakers)
+async def get_leaves(access_token: str, emp_id: str = None, from_date: datetime.date = None,
+                     to_date: datetime.date = None, endpoints: Optional[Endpoints] = None,
+                     pool: Optional[HTTPPool] = None):
+    """Fetch leave records from Zoho People within a valid date range (default: this year to date)."""
+    ep = endpoints or zoho_regions.default()
+    url = f"{ep.leavetracker}/api/v2/leavetracker/leaves/records"
 
     today = datetime.date.today()
     start_of_year = datetime.date(today.year, 1, 1)
 
     params = {
-        "from": start_of_year.strftime("%Y-%m-%d"),
-        "to": today.strftime("%Y-%m-%d"),
+        "from": (from_date or start_of_year).strftime("%Y-%m-%d"),
+        "to": (to_date or today).strftime("%Y-%m-%d"),
     }
     if emp_id:
         params["employeeId"] = emp_id
@@ -111,18 +329,20 @@ async def get_leaves(access_token: str, emp_id: str = None):
 
     logger.info(f"Fetching leave records from {params['from']} to {params['to']}")
 
-    async with httpx.AsyncClient() as client:
-        r = await client.get(url, headers=headers, params=params)
-        if r.status_code != 200:
-            logger.error(f"Failed to fetch leaves: {r.status_code} - {r.text}")
-            r.raise_for_status()
-        return r.json()
+    r = await _send("GET", url, pool, endpoint="leaves", region=ep.region, headers=headers, params=params)
+    if r.status_code != 200:
+        logger.error(f"Failed to fetch leaves: {r.status_code} - {r.text}")
+        r.raise_for_status()
+    return r.json()
 
 
 
-async def apply_leave(access_token: str, input_data: dict):
+@timed_call
+async def apply_leave(access_token: str, input_data: dict, endpoints: Optional[Endpoints] = None,
+                      pool: Optional[HTTPPool] = None):
     """Apply leave using Zoho People Leave form API."""
-    url = "https://people.zoho.com/people/api/forms/json/Leave/insertRecord"
+    ep = endpoints or zoho_regions.default()
+    url = f"{ep.leavetracker}/people/api/forms/json/Leave/insertRecord"
     headers = {"Authorization": f"Zoho-oauthtoken {access_token}"}
     # Zoho expects JSON string in "inputData" param
     import json
@@ -130,32 +350,38 @@ async def apply_leave(access_token: str, input_data: dict):
 
     logger.info(f"📝 Applying leave for employee {input_data.get('employeeId')}")
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        r = await client.post(url, headers=headers, params=params)
-        if r.status_code != 200:
-            logger.error(f"Leave apply failed: {r.status_code} - {r.text}")
-            r.raise_for_status()
-        return r.json()
+    r = await _send("POST", url, pool, endpoint="apply_leave", region=ep.region, headers=headers, params=params)
+    if r.status_code != 200:
+        logger.error(f"Leave apply failed: {r.status_code} - {r.text}")
+        r.raise_for_status()
+    return r.json()
 
 
 
-async def delete_leave(access_token: str, record_id: str):
+@timed_call
+async def delete_leave(access_token: str, record_id: str, endpoints: Optional[Endpoints] = None,
+                       pool: Optional[HTTPPool] = None):
     """Cancel a leave record."""
-    url = f"https://people.zoho.com/people/api/v2/leavetracker/leaves/records/cancel/{record_id}"
+    ep = endpoints or zoho_regions.default()
+    url = f"{ep.leavetracker}/people/api/v2/leavetracker/leaves/records/cancel/{record_id}"
     headers = {"Authorization": f"Zoho-oauthtoken {access_token}"}
     logger.info(f"Deleting leave record {record_id}")
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        r = await client.post(url, headers=headers)
-        if r.status_code != 200:
-            logger.error(f"Failed to delete leave: {r.status_code} - {r.text}")
-            r.raise_for_status()
-        return r.json()
+    r = await _send("POST", url, pool, endpoint="delete_leave", region=ep.region, headers=headers)
+    if r.status_code != 200:
+        logger.error(f"Failed to delete leave: {r.status_code} - {r.text}")
+        r.raise_for_status()
+    return r.json()
 
 
-async def get_attendance(access_token, sdate, edate, empId=None, emailId=None):
+@timed_call
+@coalesce(inflight)
+@last_known_good(breakers)
+async def get_attendance(access_token, sdate, edate, empId=None, emailId=None, endpoints: Optional[Endpoints] = None,
+                         pool: Optional[HTTPPool] = None):
     """Fetch user attendance report."""
-    url = f"https://people.zoho.com/people/api/attendance/getUserReport?sdate={sdate}&edate={edate}"
+    ep = endpoints or zoho_regions.default()
+    url = f"{ep.attendance}/people/api/attendance/getUserReport?sdate={sdate}&edate={edate}"
     if empId:
         url += f"&empId={empId}"
     if emailId:
@@ -164,17 +390,21 @@ async def get_attendance(access_token, sdate, edate, empId=None, emailId=None):
     headers = {"Authorization": f"Zoho-oauthtoken {access_token}"}
     logger.info(f"Fetching attendance from {sdate} to {edate}")
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        r = await client.get(url, headers=headers)
-        if r.status_code != 200:
-            logger.error(f"Attendance fetch failed: {r.status_code} - {r.text}")
-            r.raise_for_status()
-        return r.json()
+    r = await _send("GET", url, pool, endpoint="attendance", region=ep.region, headers=headers)
+    if r.status_code != 200:
+        logger.error(f"Attendance fetch failed: {r.status_code} - {r.text}")
+        r.raise_for_status()
+    return r.json()
 
 
-async def get_user_report(access_token: str, employee: str):
+@timed_call
+@coalesce(inflight)
+@last_known_good(breakers)
+async def get_user_report(access_token: str, employee: str, endpoints: Optional[Endpoints] = None,
+                          pool: Optional[HTTPPool] = None):
     """Fetch detailed user leave report (available/taken days per leave type)."""
-    url = "https://people.zoho.com/people/api/v2/leavetracker/reports/user"
+    ep = endpoints or zoho_regions.default()
+    url = f"{ep.leavetracker}/people/api/v2/leavetracker/reports/user"
     headers = {
         "Authorization": f"Zoho-oauthtoken {access_token}",
         "Content-Type": "application/json",
@@ -182,11 +412,10 @@ async def get_user_report(access_token: str, employee: str):
     params = {"employee": employee}
     logger.info(f"FETCHING user leave report for {employee}")
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        r = await client.get(url, headers=headers, params=params)
-        if r.status_code != 200:
-            logger.error(f"User report fetch failed {r.status_code}: {r.text}")
-            r.raise_for_status()
-        data = r.json()
-        logger.info(f"User report received for {data.get('employeeName')}")
-        return data
+    r = await _send("GET", url, pool, endpoint="user_report", region=ep.region, headers=headers, params=params)
+    if r.status_code != 200:
+        logger.error(f"User report fetch failed {r.status_code}: {r.text}")
+        r.raise_for_status()
+    data = r.json()
+    logger.info(f"User report received for {data.get('employeeName')}")
+    return data
@@ -0,0 +1,121 @@
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from logger_config import get_logger
+
+logger = get_logger("zoho_regions")
+
+# Zoho data centre -> the domain its services live under
+# (accounts.<domain>, people.<domain>, www.zohoapis.<tld>)
+DOMAINS = {
+    "in": "zoho.in",
+    "us": "zoho.com",
+    "eu": "zoho.eu",
+    "au": "zoho.com.au",
+    "jp": "zoho.jp",
+    "ca": "zohocloud.ca",
+    "sa": "zoho.sa",
+    "uk": "zoho.uk",
+    "cn": "zoho.com.cn",
+}
+# Other spellings seen in ZOHO_REGION, the callback's ``location`` and the TLDs
+ALIASES = {"com": "us", "com.au": "au", "com.cn": "cn", "gb": "uk"}
+
+# Region used for logins and for sessions that don't record one; our tenant is in the .in DC
+DEFAULT_REGION = os.getenv("ZOHO_REGION", "in").strip().lower()
+
+
+@dataclass(frozen=True)
+class Endpoints:
+    """Base URLs of every Zoho service one session talks to, all in its data centre."""
+
+    region: str
+    accounts: str
+    people: str
+    leavetracker: str
+    attendance: str
+
+
+def normalize(region: Optional[str]) -> Optional[str]:
+    """Canonical region code for ``region`` (``"com"`` -> ``"us"``), or None if unknown."""
+    if not region:
+        return None
+    region = region.strip().lower().lstrip(".")
+    region = ALIASES.get(region, region)
+    return region if region in DOMAINS else None
+
+
+def region_from_url(url: Optional[str]) -> Optional[str]:
+    """
+    Region of any Zoho URL or host: ``https://www.zohoapis.in``,
+    ``https://accounts.zoho.eu``, ``people.zohocloud.ca``... None when the
+    host isn't a Zoho one.
+    """
+    if not url:
+        return None
+    host = urlsplit(url if "//" in url else f"//{url}").hostname or ""
+    labels = host.split(".")
+    for i, label in enumerate(labels):
+        if label in ("zoho", "zohoapis", "zohocloud"):
+            tld = ".".join(labels[i + 1:])
+            return "ca" if label == "zohocloud" and tld == "ca" else normalize(tld)
+    return None
+
+
+def _override(name: str) -> Optional[str]:
+    value = os.getenv(name)
+    return value.rstrip("/") if value else None
+
+
+@lru_cache(maxsize=None)
+def for_region(region: Optional[str] = None) -> Endpoints:
+    """
+    Endpoints of a region (default ZOHO_REGION), built once and shared by
+    every session in it.
+
+    ZOHO_ACCOUNTS_URL / ZOHO_PEOPLE_URL / ZOHO_LEAVETRACKER_URL /
+    ZOHO_ATTENDANCE_URL replace the matching base URL in every region; they
+    exist to point the app at a local mock (bench/zoho_mock.py) or a proxy.
+    """
+    code = normalize(region) or normalize(DEFAULT_REGION)
+    if code is None:
+        logger.warning(f"Unknown Zoho region {region or DEFAULT_REGION!r}, using 'in'")
+        code = "in"
+    domain = DOMAINS[code]
+    people = _override("ZOHO_PEOPLE_URL") or f"https://people.{domain}"
+    endpoints = Endpoints(
+        region=code,
+        accounts=_override("ZOHO_ACCOUNTS_URL") or f"https://accounts.{domain}",
+        people=people,
+        leavetracker=_override("ZOHO_LEAVETRACKER_URL") or people,
+        attendance=_override("ZOHO_ATTENDANCE_URL") or people,
+    )
+    logger.info(f"Zoho endpoints for region {code}: accounts={endpoints.accounts} people={endpoints.people}")
+    return endpoints
+
+
+def default() -> Endpoints:
+    return for_region(DEFAULT_REGION)
+
+
+def from_token(token_data: Dict, hint: Optional[str] = None) -> Endpoints:
+    """
+    Endpoints for a freshly issued token. The token's ``api_domain``
+    (``https://www.zohoapis.<tld>``) names the user's data centre; ``hint``
+    (the callback's ``location`` / ``accounts-server``) and ZOHO_REGION are
+    the fallbacks.
+    """
+    return for_region(region_from_url(token_data.get("api_domain")) or normalize(hint) or region_from_url(hint))
+
+
+def for_session(session: Optional[Dict]) -> Endpoints:
+    """
+    Endpoints of a stored session: its ``region``, or for sessions saved
+    before regions were recorded, the region of its ``api_domain``.
+    """
+    if not session:
+        return default()
+    return for_region(normalize(session.get("region")) or region_from_url(session.get("api_domain")))
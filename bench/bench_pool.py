@@ -0,0 +1,95 @@
+"""
+Compare the old client-per-call pattern with the shared HTTPPool.
+
+    python bench/bench_pool.py --requests 2000 --concurrency 50
+
+Starts a local stub server (see stub_server.py) and reports throughput and
+latency percentiles for both modes.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from http_pool import HTTPPool, PoolConfig  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+
+async def per_call(url):
+    async with httpx.AsyncClient(timeout=30) as client:
+        r = await client.get(url)
+        r.raise_for_status()
+        return r.json()
+
+
+def pooled(pool):
+    async def call(url):
+        r = await pool.request("GET", url)
+        r.raise_for_status()
+        return r.json()
+    return call
+
+
+async def run(call, url, total, concurrency):
+    latencies = []
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with sem:
+            start = time.perf_counter()
+            await call(url)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    q = statistics.quantiles(latencies, n=100)
+    return {
+        "rps": total / elapsed,
+        "p50": q[49],
+        "p95": q[94],
+        "p99": q[98],
+    }
+
+
+def report(name, result, connections):
+    print(
+        f"{name:<10} {result['rps']:>9.1f} req/s   p50 {result['p50']:>7.2f} ms   "
+        f"p95 {result['p95']:>7.2f} ms   p99 {result['p99']:>7.2f} ms   connections {connections}"
+    )
+
+
+async def main(args):
+    server = StubServer(latency_ms=args.latency_ms, handshake_ms=args.handshake_ms)
+    url = await server.start() + "/people/api/forms/P_EmployeeView/records"
+
+    before = await run(per_call, url, args.requests, args.concurrency)
+    report("per-call", before, server.connections)
+
+    server.connections = 0
+    pool = HTTPPool(PoolConfig(max_connections_per_host=args.concurrency, max_keepalive_connections=args.concurrency))
+    try:
+        after = await run(pooled(pool), url, args.requests, args.concurrency)
+    finally:
+        await pool.aclose()
+    report("pooled", after, server.connections)
+
+    print(f"speedup: {after['rps'] / before['rps']:.2f}x throughput, p99 {before['p99'] / after['p99']:.2f}x lower")
+    await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--handshake-ms", type=float, default=40.0)
+    asyncio.run(main(parser.parse_args()))
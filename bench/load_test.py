@@ -0,0 +1,285 @@
+"""
+Load-test the backend against the local Zoho mock and save the results.
+
+    python bench/load_test.py --concurrency 1,10,50 --requests 500
+    python bench/load_test.py --baseline bench/results/load-20260101-120000.json
+
+Starts zoho_mock.py and the backend (uvicorn) as subprocesses with the
+backend's Zoho base URLs and databases pointed at the mock and a temp
+directory, logs in ``--users`` employees through /auth/zoho/callback, then
+drives each endpoint at each concurrency level. Throughput and
+p50/p95/p99 latency are printed and written as JSON. With ``--baseline``
+the run is compared against an earlier result and the exit status is 1
+when any scenario regressed by more than ``--max-regression``.
+
+Pass ``--backend-url`` to drive an already-running backend instead (it
+must already be configured to talk to the mock).
+
+``--record corpus.jsonl`` has the backend record its (redacted) upstream
+traffic during the run; ``--replay corpus.jsonl`` runs without the mock,
+serving upstream calls from such a corpus (recorded against the mock or
+production) at ``--replay-speed`` times the recorded latency.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from zoho_mock import add_arguments, config_from_args  # noqa: E402
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SCENARIOS = ("callback", "leaves", "attendance", "report")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank
+    index = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def wait_until_up(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def start_processes(args, workdir: str):
+    mock_port = free_port()
+    # Replayed runs never reach this URL; the replay transport answers first
+    mock_url = f"http://127.0.0.1:{mock_port}"
+    mock_cmd = [
+        sys.executable, os.path.join(ROOT, "bench", "zoho_mock.py"), "--port", str(mock_port),
+        "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+        "--error-rate", str(args.error_rate), "--throttle-rate", str(args.throttle_rate),
+        "--records", str(args.records), "--padding-bytes", str(args.padding_bytes),
+    ]
+    backend_port = free_port()
+    env = dict(os.environ)
+    env.update(
+        ZOHO_ACCOUNTS_URL=mock_url,
+        ZOHO_PEOPLE_URL=mock_url,
+        ZOHO_CLIENT_ID=env.get("ZOHO_CLIENT_ID", "bench-client"),
+        ZOHO_CLIENT_SECRET=env.get("ZOHO_CLIENT_SECRET", "bench-secret"),
+        SESSION_DB=os.path.join(workdir, "sessions.db"),
+        LEAVE_DB=os.path.join(workdir, "leaves.db"),
+        JOBS_DB=os.path.join(workdir, "jobs.db"),
+        LOG_FILE=os.path.join(workdir, "app.log"),
+    )
+    # Measure the stack, not the production rate limits (override from the environment if wanted)
+    env.setdefault("ZOHO_RATE_ORG", "10000")
+    env.setdefault("ZOHO_RATE_ORG_BURST", "10000")
+    env.setdefault("ZOHO_RATE_ENDPOINT", "10000")
+    env.setdefault("ZOHO_RATE_ENDPOINT_BURST", "10000")
+    if args.record:
+        env["ZOHO_RECORD_PATH"] = os.path.abspath(args.record)
+    if args.replay:
+        env.update(ZOHO_REPLAY_PATH=os.path.abspath(args.replay), ZOHO_REPLAY_SPEED=str(args.replay_speed))
+    backend_cmd = [
+        sys.executable, "-m", "uvicorn", "main:app", "--port", str(backend_port),
+        "--log-level", "warning", "--no-access-log",
+    ]
+    quiet = {"stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL} if not args.verbose else {}
+    mock = None if args.replay else subprocess.Popen(mock_cmd, **quiet)
+    backend = subprocess.Popen(backend_cmd, cwd=os.path.join(ROOT, "backend"), env=env, **quiet)
+    return mock, mock_url, backend, f"http://127.0.0.1:{backend_port}"
+
+
+async def run_scenario(client: httpx.AsyncClient, name: str, sessions: List[str], total: int,
+                       concurrency: int, args, login_offset: int) -> Dict:
+    today = datetime.date.today()
+    sdate = (today - datetime.timedelta(days=args.attendance_days - 1)).isoformat()
+
+    def request(i: int):
+        session_id = sessions[i % len(sessions)] if sessions else None
+        if name == "callback":
+            return client.get("/auth/zoho/callback", params={"code": f"user{login_offset + i}"})
+        if name == "leaves":
+            return client.get("/api/leaves", params={"session_id": session_id})
+        if name == "attendance":
+            return client.get("/api/attendance", params={"session_id": session_id, "sdate": sdate,
+                                                         "edate": today.isoformat()})
+        return client.get("/api/user/report", params={"session_id": session_id})
+
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                r = await request(i)
+                status = str(r.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    ok = sum(n for s, n in statuses.items() if s.startswith(("2", "3")))
+    return {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": total,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+        "error_rate": round(1 - ok / total, 4) if total else 0.0,
+        "statuses": statuses,
+    }
+
+
+async def login(client: httpx.AsyncClient, users: int) -> List[str]:
+    sessions = []
+    for i in range(1, users + 1):
+        r = await client.get("/auth/zoho/callback", params={"code": f"user{i}"})
+        location = r.headers.get("location", "")
+        if "session_id=" not in location:
+            raise RuntimeError(f"Login for user{i} failed: {r.status_code} {r.text[:200]}")
+        sessions.append(location.split("session_id=", 1)[1])
+    return sessions
+
+
+def compare(results: List[Dict], baseline: Dict, threshold: float) -> int:
+    """Print changes against ``baseline`` and return how many scenarios regressed."""
+    previous = {(r["scenario"], r["concurrency"]): r for r in baseline["results"]}
+    regressions = 0
+    print(f"\nvs baseline {baseline['meta'].get('git_revision')} ({baseline['meta'].get('timestamp')}):")
+    for r in results:
+        base = previous.get((r["scenario"], r["concurrency"]))
+        if base is None:
+            continue
+        rps_change = r["rps"] / base["rps"] - 1 if base["rps"] else 0.0
+        p95_change = r["p95_ms"] / base["p95_ms"] - 1 if base["p95_ms"] else 0.0
+        regressed = rps_change < -threshold or p95_change > threshold
+        regressions += regressed
+        print(f"  {r['scenario']:<11} c={r['concurrency']:<4} rps {rps_change:+7.1%}   p95 {p95_change:+7.1%}"
+              f"{'   REGRESSION' if regressed else ''}")
+    return regressions
+
+
+async def main(args) -> int:
+    levels = [int(c) for c in args.concurrency.split(",")]
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    mock = backend = None
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            if args.backend_url:
+                backend_url = args.backend_url
+            else:
+                mock, mock_url, backend, backend_url = start_processes(args, workdir)
+                if mock is not None:
+                    await wait_until_up(f"{mock_url}/mock/config")
+            await wait_until_up(f"{backend_url}/metrics")
+
+            limits = httpx.Limits(max_connections=max(levels) * 2, max_keepalive_connections=max(levels) * 2)
+            async with httpx.AsyncClient(base_url=backend_url, timeout=60, limits=limits) as client:
+                sessions = await login(client, args.users)
+                results = []
+                login_offset = args.users
+                for name in scenarios:
+                    for concurrency in levels:
+                        result = await run_scenario(client, name, sessions, args.requests, concurrency, args,
+                                                    login_offset)
+                        login_offset += args.requests
+                        results.append(result)
+                        print(f"{name:<11} c={concurrency:<4} {result['rps']:>9.1f} req/s   "
+                              f"p50 {result['p50_ms']:>8.2f} ms   p95 {result['p95_ms']:>8.2f} ms   "
+                              f"p99 {result['p99_ms']:>8.2f} ms   errors {result['error_rate']:.2%}")
+        finally:
+            for proc in (backend, mock):
+                if proc is not None:
+                    proc.terminate()
+                    try:
+                        proc.wait(timeout=10)
+                    except subprocess.TimeoutExpired:
+                        proc.kill()
+
+    output = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "users": args.users,
+            "mock": None if args.replay else vars(config_from_args(args)),
+            "replay": {"corpus": args.replay, "speed": args.replay_speed} if args.replay else None,
+        },
+        "results": results,
+    }
+    path = args.output or os.path.join(
+        ROOT, "bench", "results", f"load-{datetime.datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(output, f, indent=2)
+    print(f"\nresults written to {path}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        if regressions:
+            print(f"{regressions} scenario(s) regressed by more than {args.max_regression:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma-separated subset of {SCENARIOS}")
+    parser.add_argument("--concurrency", default="1,10,50", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario and level")
+    parser.add_argument("--users", type=int, default=20, help="employees logged in before the run")
+    parser.add_argument("--attendance-days", type=int, default=31)
+    parser.add_argument("--backend-url", help="drive this backend instead of starting one")
+    parser.add_argument("--output", help="results JSON path (default bench/results/load-<timestamp>.json)")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="allowed relative drop in rps or rise in p95 before failing")
+    parser.add_argument("--record", help="have the backend record its upstream traffic to this JSONL file")
+    parser.add_argument("--replay", help="serve upstream calls from this recorded JSONL corpus instead of the mock")
+    parser.add_argument("--replay-speed", type=float, default=1.0,
+                        help="multiplier on recorded upstream latency when replaying (0 = no delay)")
+    parser.add_argument("--verbose", action="store_true", help="show mock and backend output")
+    add_arguments(parser)
+    sys.exit(asyncio.run(main(parser.parse_args())))
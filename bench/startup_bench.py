@@ -0,0 +1,148 @@
+"""
+Measure backend cold start against session stores of increasing size.
+
+    python bench/startup_bench.py --sessions 1,1000,10000,100000 --repeat 5
+
+For each size a temp SQLite session database is filled with that many
+sessions, then a fresh interpreter imports main.py, runs the FastAPI
+lifespan startup and reads one session, timing each step. Medians are
+printed and written to bench/results/startup-<timestamp>.json. Startup
+should not grow with the session count; with ``--max-growth`` the exit
+status is 1 when the largest store's median start exceeds the smallest's
+by more than that factor.
+"""
+import argparse
+import datetime
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+BACKEND = os.path.join(ROOT, "backend")
+
+# Runs in the child: everything from the first import to the first session read
+CHILD = """
+import asyncio, json, os, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+
+async def run():
+    async with main.app.router.lifespan_context(main.app):
+        t2 = time.perf_counter()
+        main.get_session(os.environ["BENCH_SESSION_ID"])
+        t3 = time.perf_counter()
+    return t2, t3
+
+t2, t3 = asyncio.run(run())
+print(json.dumps({"import_ms": (t1 - t0) * 1000, "lifespan_ms": (t2 - t1) * 1000,
+                  "first_session_ms": (t3 - t2) * 1000}))
+"""
+
+
+def seed(path: str, count: int) -> str:
+    """Fill a session database with ``count`` sessions; returns one of their ids."""
+    # Importing backend modules sets up logging; keep this process out of app.log
+    os.environ.setdefault("LOG_FILE", os.devnull)
+    os.environ.setdefault("LOG_ROTATE", "none")
+    sys.path.insert(0, BACKEND)
+    from session_store import SQLiteSessionStore
+
+    store = SQLiteSessionStore(path)
+    store._open()
+    conn = store._reader
+    now = time.time()
+    created_at = datetime.datetime.utcnow().isoformat()
+    session_id = str(uuid.uuid4())
+    batch = []
+    with conn:
+        conn.execute("BEGIN")
+        for i in range(count):
+            sid = session_id if i == 0 else str(uuid.uuid4())
+            data = {
+                "access_token": f"1000.{uuid.uuid4().hex}",
+                "refresh_token": f"1000.{uuid.uuid4().hex}",
+                "api_domain": "https://people.zoho.in",
+                "expires_at": now + 3600,
+                "created_at": created_at,
+                "user_info": {"zoho_id": f"E{i}", "email": f"user{i}@example.com", "name": f"User {i}"},
+            }
+            batch.append((sid, json.dumps(data), now, now, now))
+            if len(batch) >= 10000:
+                conn.executemany("INSERT INTO sessions (session_id, data, updated_at, created, last_seen) "
+                                 "VALUES (?, ?, ?, ?, ?)", batch)
+                batch.clear()
+        conn.executemany("INSERT INTO sessions (session_id, data, updated_at, created, last_seen) "
+                         "VALUES (?, ?, ?, ?, ?)", batch)
+    store.close()
+    conn.close()
+    return session_id
+
+
+def measure(workdir: str, session_id: str) -> dict:
+    env = dict(os.environ)
+    env.update(
+        SESSION_BACKEND="sqlite",
+        SESSION_DB=os.path.join(workdir, "sessions.db"),
+        LEAVE_DB=os.path.join(workdir, "leaves.db"),
+        JOBS_DB=os.path.join(workdir, "jobs.db"),
+        LOG_FILE=os.path.join(workdir, "app.log"),
+        BENCH_SESSION_ID=session_id,
+    )
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", CHILD], cwd=BACKEND, env=env, capture_output=True, text=True)
+    wall = (time.perf_counter() - start) * 1000
+    if out.returncode:
+        raise RuntimeError(out.stderr[-2000:])
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    result["process_ms"] = wall
+    return result
+
+
+def main(args) -> int:
+    sizes = [max(int(n), 1) for n in args.sessions.split(",")]
+    results = []
+    for count in sizes:
+        with tempfile.TemporaryDirectory() as workdir:
+            session_id = seed(os.path.join(workdir, "sessions.db"), count)
+            measure(workdir, session_id)  # warm the OS page cache and .pyc files
+            runs = [measure(workdir, session_id) for _ in range(args.repeat)]
+        row = {"sessions": count, "runs": args.repeat}
+        for key in ("import_ms", "lifespan_ms", "first_session_ms", "process_ms"):
+            row[key] = round(statistics.median(r[key] for r in runs), 2)
+        results.append(row)
+        print(f"{count:>8} sessions   import {row['import_ms']:>8.1f} ms   lifespan {row['lifespan_ms']:>6.1f} ms   "
+              f"first session {row['first_session_ms']:>6.2f} ms   process {row['process_ms']:>8.1f} ms")
+
+    path = args.output or os.path.join(
+        ROOT, "bench", "results", f"startup-{datetime.datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"meta": {"timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+                            "python": sys.version.split()[0]}, "results": results}, f, indent=2)
+    print(f"\nresults written to {path}")
+
+    if args.max_growth and len(results) > 1:
+        first = results[0]["import_ms"] + results[0]["lifespan_ms"]
+        last = results[-1]["import_ms"] + results[-1]["lifespan_ms"]
+        growth = last / first if first else 1.0
+        print(f"startup at {results[-1]['sessions']} sessions is {growth:.2f}x the {results[0]['sessions']} baseline")
+        if growth > args.max_growth:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", default="1,1000,10000,100000", help="comma-separated session counts")
+    parser.add_argument("--repeat", type=int, default=5, help="cold starts per size (median reported)")
+    parser.add_argument("--output", help="results JSON path (default bench/results/startup-<timestamp>.json)")
+    parser.add_argument("--max-growth", type=float, default=0.0,
+                        help="fail if startup at the largest size exceeds the smallest by this factor")
+    sys.exit(main(parser.parse_args()))
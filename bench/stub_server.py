@@ -0,0 +1,74 @@
+"""
+Minimal keep-alive HTTP/1.1 stub used by the pool benchmark.
+
+Every new TCP connection pays ``handshake_ms`` before its first response to
+stand in for the TCP+TLS setup we pay against Zoho; every request pays
+``latency_ms`` of server think time.
+"""
+import argparse
+import asyncio
+import json
+
+BODY = json.dumps({"data": [{"EMPLOYEEID": "E1", "FULLNAME": "Stub User"}]}).encode()
+
+
+class StubServer:
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=5.0, handshake_ms=40.0):
+        self.host = host
+        self.port = port
+        self.latency = latency_ms / 1000
+        self.handshake = handshake_ms / 1000
+        self.connections = 0
+        self.requests = 0
+        self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        first = True
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                if length:
+                    await reader.readexactly(length)
+                delay = self.latency + (self.handshake if first else 0)
+                first = False
+                await asyncio.sleep(delay)
+                self.requests += 1
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\ncontent-type: application/json\r\n"
+                    b"content-length: " + str(len(BODY)).encode() + b"\r\n\r\n" + BODY
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self) -> str:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return f"http://{self.host}:{self.port}"
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+
+async def _main(args):
+    server = StubServer(args.host, args.port, args.latency_ms, args.handshake_ms)
+    url = await server.start()
+    print(f"Stub server listening on {url}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--handshake-ms", type=float, default=40.0)
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,225 @@
+"""
+Local stand-in for the Zoho Accounts and People endpoints zoho_client calls.
+
+Point the backend at it with
+
+    ZOHO_ACCOUNTS_URL=http://127.0.0.1:9100 ZOHO_PEOPLE_URL=http://127.0.0.1:9100
+
+Each response waits ``latency_ms`` (+/- ``jitter_ms``). A share of requests
+can be turned into 500s (``error_rate``) or 429s with Retry-After
+(``throttle_rate``). ``records`` and ``padding_bytes`` scale the payloads.
+Settings can be changed while running with POST /mock/config and request
+counts read from GET /mock/stats.
+
+The authorization code picks the user: ``code=user42`` logs in as
+user42@example.com (employee E42), so load tests can log in many users.
+"""
+import argparse
+import asyncio
+import datetime
+import random
+import zlib
+from collections import Counter
+from dataclasses import asdict, dataclass, fields
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+@dataclass
+class MockConfig:
+    latency_ms: float = 50.0
+    jitter_ms: float = 10.0
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    retry_after: float = 1.0
+    records: int = 20              # leave records per employee, employees in the directory
+    padding_bytes: int = 0         # extra bytes per record, to test large payloads
+    seed: int = 0
+
+
+def create_app(config: MockConfig = None) -> FastAPI:
+    config = config or MockConfig()
+    rng = random.Random(config.seed)
+    hits = Counter()
+    app = FastAPI(title="Zoho mock")
+
+    @app.middleware("http")
+    async def behave(request: Request, call_next):
+        if request.url.path.startswith("/mock/"):
+            return await call_next(request)
+        hits[request.url.path.split("/")[-1] or "/"] += 1
+        delay = config.latency_ms + rng.uniform(-config.jitter_ms, config.jitter_ms)
+        await asyncio.sleep(max(0.0, delay) / 1000)
+        roll = rng.random()
+        if roll < config.throttle_rate:
+            hits["429"] += 1
+            return JSONResponse({"errors": {"code": 7073, "message": "Too many requests"}}, status_code=429,
+                                headers={"Retry-After": str(config.retry_after)})
+        if roll < config.throttle_rate + config.error_rate:
+            hits["500"] += 1
+            return JSONResponse({"errors": {"message": "Internal error"}}, status_code=500)
+        return await call_next(request)
+
+    def padding():
+        return "x" * config.padding_bytes if config.padding_bytes else None
+
+    def user_from_token(request: Request) -> int:
+        token = request.headers.get("Authorization", "").rsplit("-", 1)[-1]
+        return int(token) if token.isdigit() else 1
+
+    def employee(n: int) -> dict:
+        return {
+            "EMPLOYEEID": f"E{n}",
+            "FULLNAME": f"Mock User {n}",
+            "EMPLOYEEMAILALIAS": f"user{n}@example.com",
+            "DEPARTMENTNAME": ("Engineering", "Operations", "Sales")[n % 3],
+            "DESIGNATION": "Engineer",
+            "REPORTINGTO": f"E{n // 10}",
+            "EMPLOYEESTATUS": "Active",
+            "padding": padding(),
+        }
+
+    # ---------------- Accounts ----------------
+    @app.post("/oauth/v2/token")
+    async def token(request: Request):
+        params = request.query_params
+        code = params.get("code") or params.get("refresh_token") or "user1"
+        n = int("".join(ch for ch in code if ch.isdigit()) or 1)
+        return {
+            "access_token": f"mock-access-{n}",
+            "refresh_token": f"mock-refresh-{n}",
+            "api_domain": "https://www.zohoapis.in",
+            "token_type": "Bearer",
+            "expires_in": 3600,
+        }
+
+    @app.get("/oauth/user/info")
+    async def user_info(request: Request):
+        n = user_from_token(request)
+        return {"Email": f"user{n}@example.com", "First_Name": "Mock", "Last_Name": f"User {n}"}
+
+    # ---------------- People ----------------
+    @app.get("/people/api/forms/P_EmployeeView/records")
+    async def employee_view(request: Request):
+        params = request.query_params
+        if params.get("searchValue"):
+            email = params["searchValue"]
+            n = int("".join(ch for ch in email.split("@")[0] if ch.isdigit()) or 1)
+            return {"data": [employee(n)]}
+        start = int(params.get("sIndex", 1))
+        limit = int(params.get("limit", 200))
+        return {"data": [employee(n) for n in range(start, min(start + limit, config.records + 1))]}
+
+    @app.get("/api/v2/leavetracker/leaves/records")
+    async def leaves(request: Request):
+        params = request.query_params
+        emp = params.get("employeeId", "E1")
+        start = datetime.date.fromisoformat(params.get("from", f"{datetime.date.today().year}-01-01"))
+        end = datetime.date.fromisoformat(params.get("to", datetime.date.today().isoformat()))
+        span = max((end - start).days, 1)
+        records = {}
+        for i in range(config.records):
+            # Stable per employee and index, so repeated syncs see the same records
+            day = start + datetime.timedelta(days=zlib.crc32(f"{emp}:{i}".encode()) % span)
+            records[f"{emp}-{i}"] = {
+                "Employee_ID": emp,
+                "Leavetype": ("Casual Leave", "Sick Leave")[i % 2],
+                "From": day.strftime("%d-%b-%Y"),
+                "To": day.strftime("%d-%b-%Y"),
+                "Days": 1,
+                "ApprovalStatus": ("Approved", "Pending")[i % 3 == 0],
+                "padding": padding(),
+            }
+        return {"records": records}
+
+    @app.post("/people/api/forms/json/Leave/insertRecord")
+    async def insert_leave():
+        return {"response": {"result": {"pkId": str(rng.randrange(10 ** 12)), "message": "Data added successfully"},
+                             "status": 0}}
+
+    @app.post("/people/api/v2/leavetracker/leaves/records/cancel/{record_id}")
+    async def cancel_leave(record_id: str):
+        return {"response": {"result": {"pkId": record_id, "message": "Leave cancelled"}, "status": 0}}
+
+    @app.get("/people/api/attendance/getUserReport")
+    async def attendance(sdate: str, edate: str):
+        start, end = datetime.date.fromisoformat(sdate), datetime.date.fromisoformat(edate)
+        result = {}
+        day = start
+        while day <= end:
+            result[day.isoformat()] = {
+                "status": "Weekend" if day.weekday() >= 5 else "Present",
+                "firstIn": "09:30",
+                "lastOut": "18:00",
+                "totalHours": "08:30",
+                "padding": padding(),
+            }
+            day += datetime.timedelta(days=1)
+        return {"result": result}
+
+    @app.get("/people/api/v2/leavetracker/reports/user")
+    async def user_report(employee: str = "E1"):
+        return {
+            "employeeName": f"Mock User {employee.lstrip('E')}",
+            "report": [
+                {"leavetype": "Casual Leave", "balance": 8, "booked": 4},
+                {"leavetype": "Sick Leave", "balance": 5, "booked": 1},
+            ],
+        }
+
+    # ---------------- control ----------------
+    @app.get("/mock/config")
+    async def get_config():
+        return asdict(config)
+
+    @app.post("/mock/config")
+    async def set_config(request: Request):
+        names = {f.name for f in fields(config)}
+        for key, value in (await request.json()).items():
+            if key in names:
+                setattr(config, key, type(getattr(config, key))(value))
+        return asdict(config)
+
+    @app.get("/mock/stats")
+    async def stats():
+        return dict(hits)
+
+    @app.post("/mock/reset")
+    async def reset():
+        hits.clear()
+        return {}
+
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    defaults = MockConfig()
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms)
+    parser.add_argument("--jitter-ms", type=float, default=defaults.jitter_ms)
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate)
+    parser.add_argument("--throttle-rate", type=float, default=defaults.throttle_rate)
+    parser.add_argument("--records", type=int, default=defaults.records)
+    parser.add_argument("--padding-bytes", type=int, default=defaults.padding_bytes)
+
+
+def config_from_args(args) -> MockConfig:
+    return MockConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        records=args.records,
+        padding_bytes=args.padding_bytes,
+    )
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
@@ -1,7 +1,8 @@
 import streamlit as st
-import requests
 
-BACKEND = "http://localhost:8002"
+import data
+from data import BackendError
+
 st.set_page_config(page_title="Zoho Leave Manager", layout="centered")
 st.title("Zoho Leave Management")
 
@@ -18,8 +19,7 @@ if "session_id" not in st.session_state:
 if not st.session_state.session_id:
     st.write("### Please log in with Zoho")
     if st.button("🔐 Login with Zoho"):
-        r = requests.get(f"{BACKEND}/auth/zoho/login")
-        auth_url = r.json().get("auth_url", "")
+        auth_url = data.login_url()
         st.markdown(f"[Click here to authenticate Zoho →]({auth_url})", unsafe_allow_html=True)
     st.stop()
 
@@ -28,7 +28,7 @@ st.success("✅ Logged in successfully!")
 # --- Sign Out ---
 if st.button("🚪 Sign Out"):
     try:
-        requests.get(f"{BACKEND}/auth/zoho/logout", params={"session_id": st.session_state.session_id})
+        data.logout(st.session_state.session_id)
         st.success("You have been signed out.")
     except Exception as e:
         st.error(f"Error signing out: {e}")
@@ -40,13 +40,40 @@ if st.button("🚪 Sign Out"):
 # --- Menu ---
 choice = st.radio(
     "Choose an action",
-    ["View Leaves", "Apply Leave", "Delete Leave", "Check Attendance", "User Report"]
+    ["Dashboard", "View Leaves", "Apply Leave", "Delete Leave", "Check Attendance", "User Report"]
 )
 
+session_id = st.session_state.session_id
+gen = data.generation()
+
+
+def show(fetch, *args):
+    """Render a cached read, or the backend's error."""
+    try:
+        st.json(fetch(*args))
+    except BackendError as e:
+        st.error(e.detail)
+
+
 # --- Features ---
-if choice == "View Leaves":
-    r = requests.get(f"{BACKEND}/api/leaves", params={"session_id": st.session_state.session_id})
-    st.json(r.json())
+if choice == "Dashboard":
+    # One /api/dashboard round trip; each section carries its own ok/error
+    days = st.slider("Attendance window (days)", 1, 31, 7)
+    try:
+        board = data.dashboard(session_id, days, gen)
+    except BackendError as e:
+        st.error(e.detail)
+        st.stop()
+    for title, key in [("Leave Report", "report"), ("Leaves", "leaves"), ("Attendance", "attendance")]:
+        st.subheader(title)
+        section = board[key]
+        if section.get("ok"):
+            st.json(section["data"])
+        else:
+            st.error(section["error"]["detail"])
+
+elif choice == "View Leaves":
+    show(data.leaves, session_id, gen)
 
 elif choice == "Apply Leave":
     st.subheader("Apply for Leave")
@@ -56,41 +83,25 @@ elif choice == "Apply Leave":
     reason = st.text_area("Reason for leave")
 
     if st.button("Submit Leave"):
-        r = requests.post(
-            f"{BACKEND}/api/leave/apply",
-            params={"session_id": st.session_state.session_id},
-            json={
-                "leave_type": leave_type,
-                "from_date": str(from_date),
-                "to_date": str(to_date),
-                "reason": reason
-            }
-        )
-        st.json(r.json())
+        try:
+            st.json(data.apply_leave(session_id, leave_type, str(from_date), str(to_date), reason))
+        except BackendError as e:
+            st.error(e.detail)
 
 
 elif choice == "Delete Leave":
     record_id = st.text_input("Enter Record ID to Delete")
     if st.button("Delete"):
-        r = requests.post(
-            f"{BACKEND}/api/leave/delete/{record_id}",
-            params={"session_id": st.session_state.session_id}
-        )
-        st.json(r.json())
+        try:
+            st.json(data.delete_leave(session_id, record_id))
+        except BackendError as e:
+            st.error(e.detail)
 
 elif choice == "Check Attendance":
     sdate = st.date_input("Start Date")
     edate = st.date_input("End Date")
     if st.button("Fetch Attendance"):
-        r = requests.get(
-            f"{BACKEND}/api/attendance",
-            params={"session_id": st.session_state.session_id, "sdate": sdate, "edate": edate}
-        )
-        st.json(r.json())
+        show(data.attendance, session_id, str(sdate), str(edate), gen)
 
 elif choice == "User Report":
-    r = requests.get(
-        f"{BACKEND}/api/user/report",
-        params={"session_id": st.session_state.session_id}
-    )
-    st.json(r.json())
+    show(data.user_report, session_id, gen)
@@ -0,0 +1,111 @@
+"""
+Backend access for the Streamlit app.
+
+All users of one Streamlit server share a single pooled keep-alive
+``requests.Session`` (``st.cache_resource``). Reads are cached with
+``st.cache_data`` keyed on their arguments: the session_id, the query
+parameters and a per-user generation number that apply/delete bump, so a
+write refetches that user's data without clearing anyone else's.
+"""
+import os
+from typing import Any, Dict
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+
+BACKEND = os.getenv("BACKEND_URL", "http://localhost:8002")
+POOL_SIZE = int(os.getenv("FRONTEND_POOL_SIZE", "32"))
+TIMEOUT = float(os.getenv("FRONTEND_TIMEOUT", "30"))
+# Seconds a read is reused across reruns before it is fetched again
+READ_TTL = int(os.getenv("FRONTEND_CACHE_TTL", "60"))
+ATTENDANCE_TTL = int(os.getenv("FRONTEND_ATTENDANCE_CACHE_TTL", "300"))
+
+
+class BackendError(Exception):
+    def __init__(self, status: int, detail: Any):
+        super().__init__(f"{status}: {detail}")
+        self.status = status
+        self.detail = detail
+
+
+@st.cache_resource
+def http() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _request(method: str, path: str, **kwargs) -> Any:
+    r = http().request(method, f"{BACKEND}{path}", timeout=TIMEOUT, **kwargs)
+    try:
+        body = r.json()
+    except ValueError:
+        body = {"detail": r.text}
+    if r.status_code >= 400:
+        # Raised, not returned, so st.cache_data never keeps an error
+        raise BackendError(r.status_code, body.get("detail", body) if isinstance(body, dict) else body)
+    return body
+
+
+# ---------------- per-user invalidation ----------------
+def generation() -> int:
+    """This user's data generation; part of every cached read's key."""
+    return st.session_state.setdefault("data_generation", 0)
+
+
+def invalidate():
+    """Make this user's next reads go to the backend (after a write or sign-out)."""
+    st.session_state["data_generation"] = generation() + 1
+
+
+# ---------------- reads (cached) ----------------
+@st.cache_data(ttl=READ_TTL, show_spinner=False)
+def dashboard(session_id: str, attendance_days: int = 7, generation: int = 0) -> Dict:
+    """Leaves, leave report and recent attendance in one /api/dashboard round trip."""
+    return _request("GET", "/api/dashboard", params={"session_id": session_id, "attendance_days": attendance_days})
+
+
+@st.cache_data(ttl=READ_TTL, show_spinner=False)
+def leaves(session_id: str, generation: int = 0) -> Dict:
+    return _request("GET", "/api/leaves", params={"session_id": session_id})
+
+
+@st.cache_data(ttl=READ_TTL, show_spinner=False)
+def user_report(session_id: str, generation: int = 0) -> Dict:
+    return _request("GET", "/api/user/report", params={"session_id": session_id})
+
+
+@st.cache_data(ttl=ATTENDANCE_TTL, show_spinner=False)
+def attendance(session_id: str, sdate: str, edate: str, generation: int = 0) -> Dict:
+    return _request("GET", "/api/attendance", params={"session_id": session_id, "sdate": sdate, "edate": edate})
+
+
+# ---------------- writes and auth ----------------
+def login_url() -> str:
+    return _request("GET", "/auth/zoho/login").get("auth_url", "")
+
+
+def logout(session_id: str) -> Dict:
+    invalidate()
+    return _request("GET", "/auth/zoho/logout", params={"session_id": session_id})
+
+
+def apply_leave(session_id: str, leave_type: str, from_date: str, to_date: str, reason: str) -> Dict:
+    result = _request("POST", "/api/leave/apply", params={
+        "session_id": session_id,
+        "leave_type": leave_type,
+        "from_date": from_date,
+        "to_date": to_date,
+        "reason": reason,
+    })
+    invalidate()
+    return result
+
+
+def delete_leave(session_id: str, record_id: str) -> Dict:
+    result = _request("POST", f"/api/leave/delete/{record_id}", params={"session_id": session_id})
+    invalidate()
+    return result